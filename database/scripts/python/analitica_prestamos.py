@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Analítica de préstamos con NumPy (Reporte 10: Distribuciones de Préstamos)
+- Trae FechaPrestamo, FechaVencimiento, FechaDevolucion y las fechas de pago
+  de multas en bloque, como arreglos datetime64 tipados
+- Calcula de forma vectorizada, sin recorrer fila por fila:
+    * duración de los préstamos devueltos (días)
+    * días de atraso (devueltos tarde y abiertos ya vencidos)
+    * días entre la devolución y el pago de la multa (FechaCobro se
+      actualiza al pagar)
+- Para cada métrica: media, p50/p90/p99, histograma y desglose por rol
+
+Se usa desde generar_reportes (sección "distribuciones_prestamos"):
+    python generar_reportes.py --only distribuciones_prestamos --months 12
+"""
+
+from datetime import datetime, timedelta
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Filas por fetchmany al construir los arreglos
+TAMANO_LOTE = 10000
+
+# Bordes de los histogramas (días); el último intervalo queda abierto
+BORDES_HISTOGRAMA = (0, 1, 3, 7, 14, 21, 30, 60, 90, 180, 365)
+
+PERCENTILES = (50, 90, 99)
+
+
+def leer_columnas(cursor, tipos, tamano_lote=TAMANO_LOTE):
+    """Leer el resultado por lotes y devolver un arreglo NumPy tipado por columna"""
+    partes = [[] for _ in tipos]
+    while True:
+        lote = cursor.fetchmany(tamano_lote)
+        if not lote:
+            break
+        for i, columna in enumerate(zip(*lote)):
+            partes[i].append(np.array(columna, dtype=tipos[i]))
+    return [
+        np.concatenate(parte) if parte else np.array([], dtype=tipo)
+        for parte, tipo in zip(partes, tipos)
+    ]
+
+
+def en_dias(delta):
+    """timedelta64 -> días en punto flotante"""
+    return delta / np.timedelta64(1, 'D')
+
+
+def estadisticas(valores):
+    """Media y percentiles de un arreglo de días"""
+    if valores.size == 0:
+        return {'n': 0}
+    percentiles = np.percentile(valores, PERCENTILES)
+    resumen = {'n': int(valores.size), 'media': round(float(valores.mean()), 2)}
+    for p, valor in zip(PERCENTILES, percentiles):
+        resumen[f'p{p}'] = round(float(valor), 2)
+    return resumen
+
+
+def histograma(valores):
+    """Conteos por intervalo de días ("0-1", "1-3", ..., "365+")"""
+    bordes = np.array(BORDES_HISTOGRAMA + (np.inf,), dtype=float)
+    conteos, _ = np.histogram(valores, bins=bordes)
+    etiquetas = [f"{a}-{b}" for a, b in zip(BORDES_HISTOGRAMA, BORDES_HISTOGRAMA[1:])]
+    etiquetas.append(f"{BORDES_HISTOGRAMA[-1]}+")
+    return dict(zip(etiquetas, (int(c) for c in conteos)))
+
+
+def resumir(valores, roles):
+    """Estadísticas, histograma y desglose por rol de una métrica"""
+    resumen = estadisticas(valores)
+    resumen['histograma'] = histograma(valores)
+    resumen['por_rol'] = {str(rol): estadisticas(valores[roles == rol]) for rol in np.unique(roles)}
+    return resumen
+
+
+def reporte_distribuciones_prestamos(conn, meses=6):
+    """Reporte 10: Distribuciones de Préstamos (duración, atraso y pago de multas)"""
+    if np is None:
+        raise RuntimeError("El reporte distribuciones_prestamos requiere numpy (pip install numpy)")
+
+    # generar_reportes importa este módulo: el import va aquí para no hacerlo circular
+    from generar_reportes import columnas_prestamos
+
+    fecha_inicio = datetime.now() - timedelta(days=meses*30)
+    ahora = np.datetime64(datetime.now().replace(microsecond=0), 's')
+    cursor = conn.cursor()
+
+    # Estructura nueva: el usuario está en la reserva; antigua: Prestamos.UsuarioID
+    if 'ReservaID' in columnas_prestamos(conn):
+        usuario, join = "r.UsuarioID", "INNER JOIN Reservas r ON p.ReservaID = r.ReservaID"
+    else:
+        usuario, join = "p.UsuarioID", ""
+
+    # Préstamos del período con el rol de su usuario (una sola consulta)
+    cursor.execute(f"""
+        SELECT p.FechaPrestamo, p.FechaVencimiento, p.FechaDevolucion, COALESCE(u.Rol, 'Sin rol')
+        FROM Prestamos p
+        {join}
+        INNER JOIN Usuarios u ON {usuario} = u.UsuarioID
+        WHERE p.FechaPrestamo >= ?
+    """, fecha_inicio)
+    prestamo, vencimiento, devolucion, roles_prestamo = leer_columnas(
+        cursor, ('datetime64[s]', 'datetime64[s]', 'datetime64[s]', 'U20')
+    )
+
+    # Duración: solo préstamos devueltos
+    devueltos = ~np.isnat(prestamo) & ~np.isnat(devolucion)
+    duracion = en_dias(devolucion[devueltos] - prestamo[devueltos])
+
+    # Atraso: hasta la devolución o, si sigue abierto, hasta ahora
+    fin = np.where(np.isnat(devolucion), ahora, devolucion)
+    atraso = en_dias(fin - vencimiento)
+    atrasados = ~np.isnat(vencimiento) & (atraso > 0)
+
+    # Multas pagadas: días desde la devolución (o el vencimiento) hasta el pago
+    cursor.execute("""
+        SELECT m.FechaCobro, COALESCE(p.FechaDevolucion, p.FechaVencimiento), COALESCE(u.Rol, 'Sin rol')
+        FROM Multas m
+        INNER JOIN Prestamos p ON m.PrestamoID = p.PrestamoID
+        INNER JOIN Usuarios u ON m.UsuarioID = u.UsuarioID
+        WHERE m.Estado = 'Pagada' AND m.FechaCobro >= ?
+    """, fecha_inicio)
+    cobro, base_multa, roles_multa = leer_columnas(cursor, ('datetime64[s]', 'datetime64[s]', 'U20'))
+    validas = ~np.isnat(cobro) & ~np.isnat(base_multa)
+    # Una multa pagada antes de registrar la devolución cuenta como pago inmediato
+    dias_pago = np.clip(en_dias(cobro[validas] - base_multa[validas]), 0, None)
+
+    return {
+        'periodo': f'{meses} meses',
+        'fecha_inicio': str(fecha_inicio.date()),
+        'fecha_fin': str(datetime.now().date()),
+        'duracion_prestamo_dias': resumir(duracion, roles_prestamo[devueltos]),
+        'dias_atraso': resumir(atraso[atrasados], roles_prestamo[atrasados]),
+        'dias_para_pagar_multa': resumir(dias_pago, roles_multa[validas]),
+    }
+
+
+def imprimir_distribuciones_prestamos(datos):
+    """Imprimir Reporte 10: Distribuciones de Préstamos"""
+    print("\n" + "="*60)
+    print("[REPORTE 10] DISTRIBUCIONES DE PRESTAMOS")
+    print("="*60)
+    print(f"  Período:                  {datos['periodo']} ({datos['fecha_inicio']} a {datos['fecha_fin']})")
+
+    titulos = (
+        ('duracion_prestamo_dias', 'Duración de préstamos (días)'),
+        ('dias_atraso', 'Días de atraso'),
+        ('dias_para_pagar_multa', 'Días para pagar una multa'),
+    )
+    for clave, titulo in titulos:
+        metrica = datos[clave]
+        print(f"\n  {titulo}")
+        if metrica['n'] == 0:
+            print("    Sin datos en el período")
+            continue
+        print(f"    n={metrica['n']:,}  media={metrica['media']:.1f}  "
+              f"p50={metrica['p50']:.1f}  p90={metrica['p90']:.1f}  p99={metrica['p99']:.1f}")
+        maximo = max(metrica['histograma'].values())
+        for intervalo, cantidad in metrica['histograma'].items():
+            barra = "█" * int(cantidad / maximo * 30) if maximo > 0 else ""
+            print(f"    {intervalo:>7s}: {cantidad:5d} {barra}")
+        for rol, resumen in metrica['por_rol'].items():
+            if resumen['n']:
+                print(f"    {rol:15s} n={resumen['n']:5d}  p50={resumen['p50']:.1f}  p90={resumen['p90']:.1f}")
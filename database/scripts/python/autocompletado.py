@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Índice de autocompletado del catálogo (archivo estático para el front-end)
+- Entradas: títulos, autores y signaturas LCC, con el peso de su popularidad
+  (préstamos del libro; un autor suma los de sus libros)
+- Claves normalizadas como el índice de búsqueda (minúsculas, sin tildes);
+  un título también se encuentra desde cualquiera de sus palabras
+  ("matematica" completa "LOGICA MATEMATICA  un enfoque axiomatico")
+- Arreglo ordenado de claves: el front-end busca el prefijo con búsqueda
+  binaria y recorre hacia adelante mientras la clave empiece con él
+- "populares": las mejores entradas de cada prefijo de 1-2 letras ya
+  calculadas (son los prefijos que más claves recorren)
+- Se publica autocompletado.json y su versión .json.gz para servirlo desde
+  una caché o CDN sin comprimir en cada petición
+- Refresco incremental: una huella por libro (título, signatura, autores y
+  préstamos) calculada en SQL; solo se leen los libros cuya huella cambió y,
+  si ninguno cambió, el archivo publicado no se toca
+
+Formato (autocompletado.json):
+    {"version", "generado",
+     "entradas": [[texto, tipo ('t' título, 'a' autor, 's' signatura), LibroID o 0, peso], ...],
+     "claves": [clave normalizada, ...],        ordenadas
+     "indices": [entrada de cada clave, ...],
+     "populares": {"pr": [entradas], ...}}
+
+Uso:
+    python autocompletado.py                 # refresco incremental
+    python autocompletado.py --completo      # releer todo el catálogo
+    python autocompletado.py --probar "calc"
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import sys
+import time
+from bisect import bisect_left
+from datetime import datetime
+
+import pyodbc
+
+from indice_busqueda import normalizar_texto
+
+DIRECTORIO_SALIDA = os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'autocompletado')
+ARCHIVO_AUTOCOMPLETADO = 'autocompletado.json'
+ARCHIVO_ESTADO = 'autocompletado_estado.json'
+
+SUGERENCIAS = 8
+LARGO_POPULARES = 2
+# Libros por consulta al releer los que cambiaron
+TAMANO_BLOQUE = 500
+
+CONSULTA_HUELLAS = """
+    SELECT l.LibroID,
+           CHECKSUM(l.Titulo, l.SignaturaLCC, au.Huella, ISNULL(pr.Prestamos, 0))
+    FROM Libros l
+    LEFT JOIN (
+        SELECT la.LibroID, CHECKSUM_AGG(CHECKSUM(a.Nombre)) AS Huella
+        FROM LibroAutores la
+        INNER JOIN Autores a ON la.AutorID = a.AutorID
+        GROUP BY la.LibroID
+    ) au ON au.LibroID = l.LibroID
+    LEFT JOIN (
+        SELECT r.LibroID, COUNT(*) AS Prestamos
+        FROM Prestamos p
+        INNER JOIN Reservas r ON p.ReservaID = r.ReservaID
+        GROUP BY r.LibroID
+    ) pr ON pr.LibroID = l.LibroID
+"""
+
+
+def leer_huellas(conn):
+    cursor = conn.cursor()
+    cursor.execute(CONSULTA_HUELLAS)
+    return {libro_id: huella for libro_id, huella in cursor.fetchall()}
+
+
+def leer_libros(conn, libro_ids):
+    """{LibroID: {'titulo', 'signatura', 'autores', 'prestamos'}} de los libros pedidos"""
+    cursor = conn.cursor()
+    libros = {}
+    for i in range(0, len(libro_ids), TAMANO_BLOQUE):
+        bloque = libro_ids[i:i + TAMANO_BLOQUE]
+        marcadores = ', '.join('?' * len(bloque))
+        cursor.execute(f"""
+            SELECT l.LibroID, l.Titulo, l.SignaturaLCC,
+                   (SELECT COUNT(*) FROM Prestamos p
+                    INNER JOIN Reservas r ON p.ReservaID = r.ReservaID
+                    WHERE r.LibroID = l.LibroID)
+            FROM Libros l
+            WHERE l.LibroID IN ({marcadores})
+        """, *bloque)
+        for libro_id, titulo, signatura, prestamos in cursor.fetchall():
+            libros[libro_id] = {'titulo': titulo, 'signatura': signatura, 'autores': [], 'prestamos': prestamos}
+        cursor.execute(f"""
+            SELECT la.LibroID, a.Nombre
+            FROM LibroAutores la
+            INNER JOIN Autores a ON la.AutorID = a.AutorID
+            WHERE la.LibroID IN ({marcadores})
+            ORDER BY la.LibroID, ISNULL(la.OrdenAutor, 999)
+        """, *bloque)
+        for libro_id, nombre in cursor.fetchall():
+            if libro_id in libros:
+                libros[libro_id]['autores'].append(nombre)
+    return libros
+
+
+def construir_autocompletado(libros):
+    """Entradas, claves ordenadas y populares a partir del estado por libro"""
+    entradas, claves = [], []
+    autores = {}
+    for libro_id in sorted(libros):
+        libro = libros[libro_id]
+        titulo = ' '.join(libro['titulo'].split())
+        clave = normalizar_texto(titulo)
+        if clave:
+            indice = len(entradas)
+            entradas.append([titulo, 't', libro_id, libro['prestamos']])
+            # El título completo y el resto desde cada palabra
+            palabras_titulo = clave.split(' ')
+            claves.extend((' '.join(palabras_titulo[i:]), indice) for i in range(len(palabras_titulo)))
+        if libro['signatura']:
+            entradas.append([libro['signatura'], 's', libro_id, libro['prestamos']])
+            claves.append((normalizar_texto(libro['signatura']), len(entradas) - 1))
+        for nombre in libro['autores']:
+            clave_autor = normalizar_texto(nombre)
+            if clave_autor not in autores:
+                autores[clave_autor] = [' '.join(nombre.split()), 'a', 0, 0]
+            autores[clave_autor][3] += libro['prestamos']
+
+    for clave_autor, entrada in sorted(autores.items()):
+        entradas.append(entrada)
+        # Nombre completo y apellidos ("cortez vasquez" completa "Augusto Cortez Vasquez")
+        partes = clave_autor.split(' ')
+        claves.extend((' '.join(partes[i:]), len(entradas) - 1) for i in range(len(partes)))
+
+    claves = sorted(set(c for c in claves if c[0]))
+    populares = {}
+    for clave, indice in claves:
+        for largo in range(1, min(LARGO_POPULARES, len(clave)) + 1):
+            populares.setdefault(clave[:largo], set()).add(indice)
+    orden = lambda i: (-entradas[i][3], len(entradas[i][0]), i)
+    return {
+        'entradas': entradas,
+        'claves': [c for c, _ in claves],
+        'indices': [i for _, i in claves],
+        'populares': {p: sorted(indices, key=orden)[:SUGERENCIAS] for p, indices in sorted(populares.items())},
+    }
+
+
+def completar(datos, prefijo, limite=SUGERENCIAS):
+    """Misma búsqueda que hace el front-end: [(texto, tipo, LibroID, peso)]"""
+    prefijo = normalizar_texto(prefijo)
+    if not prefijo:
+        return []
+    entradas = datos['entradas']
+    orden = lambda i: (-entradas[i][3], len(entradas[i][0]), i)
+    if len(prefijo) <= LARGO_POPULARES:
+        candidatos = datos['populares'].get(prefijo, [])
+    else:
+        claves, candidatos = datos['claves'], set()
+        posicion = bisect_left(claves, prefijo)
+        while posicion < len(claves) and claves[posicion].startswith(prefijo):
+            candidatos.add(datos['indices'][posicion])
+            posicion += 1
+    return [tuple(entradas[i]) for i in sorted(candidatos, key=orden)[:limite]]
+
+
+def cargar_estado(directorio):
+    archivo = os.path.join(directorio, ARCHIVO_ESTADO)
+    if not os.path.exists(archivo):
+        return {}, {}
+    with open(archivo, 'r', encoding='utf-8') as f:
+        estado = json.load(f)
+    huellas = {int(k): v for k, v in estado['huellas'].items()}
+    libros = {int(k): v for k, v in estado['libros'].items()}
+    return huellas, libros
+
+
+def actualizar_autocompletado(conn, directorio=DIRECTORIO_SALIDA, completo=False):
+    """
+    Refrescar el autocompletado; devuelve {'modo', 'cambiados', 'eliminados', 'entradas', 'archivo'}.
+    'archivo' es None si no hubo cambios y no se reescribió nada.
+    """
+    from generar_reportes import escribir_atomico
+
+    huellas = leer_huellas(conn)
+    huellas_previas, libros = ({}, {}) if completo else cargar_estado(directorio)
+    publicado = os.path.join(directorio, ARCHIVO_AUTOCOMPLETADO)
+
+    cambiados = sorted(i for i, h in huellas.items() if huellas_previas.get(i) != h or i not in libros)
+    eliminados = [i for i in libros if i not in huellas]
+    resultado = {'modo': 'completo' if completo or not huellas_previas else 'incremental',
+                 'cambiados': len(cambiados), 'eliminados': len(eliminados), 'entradas': None, 'archivo': None}
+    if not cambiados and not eliminados and os.path.exists(publicado):
+        return resultado
+
+    for libro_id in eliminados:
+        del libros[libro_id]
+    libros.update(leer_libros(conn, cambiados))
+
+    datos = construir_autocompletado(libros)
+    cuerpo = json.dumps(datos, ensure_ascii=False, separators=(',', ':'))
+    contenido = json.dumps({
+        'version': hashlib.sha1(cuerpo.encode('utf-8')).hexdigest()[:16],
+        'generado': datetime.now().isoformat(timespec='seconds'),
+        **datos,
+    }, ensure_ascii=False, separators=(',', ':'))
+
+    os.makedirs(directorio, exist_ok=True)
+    escribir_atomico(publicado, contenido)
+    # mtime=0: el .gz solo cambia si cambia el contenido
+    escribir_atomico(publicado + '.gz', gzip.compress(contenido.encode('utf-8'), compresslevel=9, mtime=0))
+    # El estado se escribe al final: si algo falla antes, el próximo refresco repite los cambios
+    escribir_atomico(os.path.join(directorio, ARCHIVO_ESTADO), json.dumps({
+        'huellas': {str(k): v for k, v in huellas.items()},
+        'libros': {str(k): v for k, v in libros.items()},
+    }, ensure_ascii=False, separators=(',', ':')))
+    resultado.update(entradas=len(datos['entradas']), archivo=publicado)
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generar el índice de autocompletado del catálogo')
+    parser.add_argument('--completo', action='store_true', help='Releer todo el catálogo')
+    parser.add_argument('--salida', default=DIRECTORIO_SALIDA, help='Directorio de los archivos generados')
+    parser.add_argument('--probar', default=None, help='Mostrar las sugerencias de un prefijo')
+    args = parser.parse_args()
+
+    if args.probar is not None:
+        archivo = os.path.join(args.salida, ARCHIVO_AUTOCOMPLETADO)
+        if not os.path.exists(archivo):
+            print(f"[ERROR] No existe {archivo}; genéralo con: python autocompletado.py")
+            sys.exit(1)
+        with open(archivo, 'r', encoding='utf-8') as f:
+            datos = json.load(f)
+        inicio = time.perf_counter()
+        sugerencias = completar(datos, args.probar)
+        print(f"[INFO] {len(sugerencias)} sugerencia(s) para '{args.probar}' "
+              f"en {(time.perf_counter() - inicio) * 1000:.3f} ms")
+        for texto, tipo, libro_id, peso in sugerencias:
+            print(f"  [{tipo}] {texto}  ({peso} préstamos{f', libro {libro_id}' if libro_id else ''})")
+        return
+
+    print("="*60)
+    print("AUTOCOMPLETADO DEL CATÁLOGO")
+    print("="*60)
+    from generar_reportes import conectar_bd
+
+    conn = conectar_bd()
+    try:
+        inicio = time.perf_counter()
+        resultado = actualizar_autocompletado(conn, args.salida, args.completo)
+    except pyodbc.Error as e:
+        print(f"[ERROR] Error de base de datos: {e}")
+        sys.exit(1)
+    finally:
+        conn.close()
+
+    print(f"[INFO] Refresco {resultado['modo']}: {resultado['cambiados']} libros cambiados, "
+          f"{resultado['eliminados']} eliminados ({time.perf_counter() - inicio:.2f} s)")
+    if resultado['archivo'] is None:
+        print("[INFO] Sin cambios; el archivo publicado sigue vigente")
+    else:
+        for archivo in (resultado['archivo'], resultado['archivo'] + '.gz'):
+            print(f"[GUARDADO] {archivo} ({os.path.getsize(archivo):,} bytes)")
+        print(f"[OK] {resultado['entradas']:,} entradas")
+
+
+if __name__ == "__main__":
+    main()
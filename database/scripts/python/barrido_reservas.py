@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Barrido de reservas vencidas por lotes (operaciones de conjunto)
+- Vencen las reservas con ejemplar asignado que no se retiraron a tiempo
+  (PorAprobar / Aprobada / Notificada con FechaLimiteRetiro pasada) y las
+  reservas en cola cuya FechaExpiracion pasó
+- Libera los ejemplares que esas reservas tenían en 'Reservado'
+- Avanza la cola de cada libro afectado: el n-ésimo ejemplar disponible se
+  asigna a la n-ésima reserva por PrioridadCola (igual que ProcesarColaEspera
+  del backend: pasa a Retiro / PorAprobar con 2 días para retirar)
+- Renumera PrioridadCola y crea las notificaciones de ambos casos
+
+Cada lote son unas pocas sentencias sobre tablas temporales dentro de una
+transacción, en lugar de una llamada por reserva como sp_ProcesarColaReservas.
+
+Uso:
+    python barrido_reservas.py --simulacion     # qué haría, sin guardar cambios
+    python barrido_reservas.py                  # aplicar
+    python barrido_reservas.py --lote 5000 --dias-retiro 3
+
+Índices recomendados: scripts/sql/crear_indices_barrido_reservas.sql
+"""
+
+import argparse
+import sys
+import time
+
+import pyodbc
+
+from generar_reportes import conectar_bd
+
+TAMANO_LOTE = 2000
+DIAS_RETIRO = 2
+
+# Estados con ejemplar asignado que vencen por FechaLimiteRetiro
+ESTADOS_POR_RETIRAR = "('PorAprobar', 'Aprobada', 'Notificada')"
+
+# Filas de ejemplo que muestra la simulación
+MUESTRA_SIMULACION = 10
+# La simulación procesa todas las vencidas en un solo lote (máximo de INT)
+LOTE_SIMULACION = 2**31 - 1
+
+CREAR_TEMPORALES = """
+    IF OBJECT_ID('tempdb..#Vencidas') IS NOT NULL DROP TABLE #Vencidas;
+    IF OBJECT_ID('tempdb..#Asignaciones') IS NOT NULL DROP TABLE #Asignaciones;
+    CREATE TABLE #Vencidas (
+        ReservaID INT PRIMARY KEY,
+        LibroID INT NOT NULL,
+        UsuarioID INT NOT NULL,
+        EjemplarID INT NULL,
+        Motivo VARCHAR(20) NOT NULL
+    );
+    CREATE TABLE #Asignaciones (
+        ReservaID INT PRIMARY KEY,
+        LibroID INT NOT NULL,
+        UsuarioID INT NOT NULL,
+        EjemplarID INT NOT NULL UNIQUE
+    );
+"""
+
+# Cada consulta usa su índice filtrado; READPAST salta las reservas que el
+# backend esté modificando en ese momento (se toman en el siguiente barrido)
+SELECCIONAR_VENCIDAS = (
+    ('retiro', f"""
+        INSERT INTO #Vencidas (ReservaID, LibroID, UsuarioID, EjemplarID, Motivo)
+        SELECT TOP (?) ReservaID, LibroID, UsuarioID, EjemplarID, 'retiro'
+        FROM Reservas WITH (UPDLOCK, READPAST)
+        WHERE Estado IN {ESTADOS_POR_RETIRAR} AND FechaLimiteRetiro IS NOT NULL AND FechaLimiteRetiro < ?
+        ORDER BY FechaLimiteRetiro
+    """),
+    ('cola', """
+        INSERT INTO #Vencidas (ReservaID, LibroID, UsuarioID, EjemplarID, Motivo)
+        SELECT TOP (?) ReservaID, LibroID, UsuarioID, EjemplarID, 'cola'
+        FROM Reservas WITH (UPDLOCK, READPAST)
+        WHERE Estado = 'ColaEspera' AND FechaExpiracion IS NOT NULL AND FechaExpiracion < ?
+        ORDER BY FechaExpiracion
+    """),
+)
+
+PASOS_LOTE = (
+    ('vencidas', """
+        UPDATE r SET Estado = 'Expirada'
+        FROM Reservas r
+        INNER JOIN #Vencidas v ON r.ReservaID = v.ReservaID
+    """),
+    ('ejemplares_liberados', """
+        UPDATE e SET Estado = 'Disponible'
+        FROM Ejemplares e
+        INNER JOIN #Vencidas v ON e.EjemplarID = v.EjemplarID
+        WHERE e.Estado = 'Reservado'
+    """),
+    ('notificaciones_vencidas', """
+        INSERT INTO Notificaciones (ReservaID, UsuarioID, Tipo, Mensaje, FechaCreacion, Estado)
+        SELECT ReservaID, UsuarioID, 'ReservaExpirada',
+               CASE Motivo
+                   WHEN 'retiro' THEN 'Tu reserva ha expirado por no ser recogida a tiempo.'
+                   ELSE 'Tu reserva en cola de espera ha expirado.'
+               END,
+               ?, 'Pendiente'
+        FROM #Vencidas
+    """),
+    # Emparejar por libro el n-ésimo ejemplar disponible con la n-ésima reserva de la cola
+    ('asignaciones', """
+        WITH disponibles AS (
+            SELECT EjemplarID, LibroID,
+                   ROW_NUMBER() OVER (PARTITION BY LibroID ORDER BY FechaAlta, EjemplarID) AS n
+            FROM Ejemplares WITH (UPDLOCK, READPAST)
+            WHERE Estado = 'Disponible' AND LibroID IN (SELECT LibroID FROM #Vencidas)
+        ),
+        cola AS (
+            SELECT ReservaID, LibroID, UsuarioID,
+                   ROW_NUMBER() OVER (PARTITION BY LibroID
+                                      ORDER BY ISNULL(PrioridadCola, 999999), FechaReserva, ReservaID) AS n
+            FROM Reservas WITH (UPDLOCK, READPAST)
+            WHERE Estado = 'ColaEspera' AND TipoReserva = 'ColaEspera'
+              AND LibroID IN (SELECT LibroID FROM #Vencidas)
+        )
+        INSERT INTO #Asignaciones (ReservaID, LibroID, UsuarioID, EjemplarID)
+        SELECT c.ReservaID, c.LibroID, c.UsuarioID, d.EjemplarID
+        FROM cola c
+        INNER JOIN disponibles d ON c.LibroID = d.LibroID AND c.n = d.n
+    """),
+    ('reservas_promovidas', """
+        UPDATE r SET EjemplarID = a.EjemplarID,
+                     TipoReserva = 'Retiro',
+                     Estado = 'PorAprobar',
+                     FechaLimiteRetiro = DATEADD(DAY, ?, ?),
+                     PrioridadCola = NULL
+        FROM Reservas r
+        INNER JOIN #Asignaciones a ON r.ReservaID = a.ReservaID
+    """),
+    ('ejemplares_reservados', """
+        UPDATE e SET Estado = 'Reservado'
+        FROM Ejemplares e
+        INNER JOIN #Asignaciones a ON e.EjemplarID = a.EjemplarID
+    """),
+    ('notificaciones_cola', """
+        INSERT INTO Notificaciones (ReservaID, UsuarioID, Tipo, Mensaje, FechaCreacion, Estado)
+        SELECT a.ReservaID, a.UsuarioID, 'LibroDisponibleCola',
+               N'¡Buenas noticias! El libro ''' + ISNULL(l.Titulo, 'Libro')
+                   + N''' que tenías en cola de espera ya está disponible. Fecha/Hora: '
+                   + CONVERT(VARCHAR(16), ?, 120),
+               ?, 'Pendiente'
+        FROM #Asignaciones a
+        LEFT JOIN Libros l ON a.LibroID = l.LibroID
+    """),
+    ('prioridades_renumeradas', """
+        WITH cola AS (
+            SELECT PrioridadCola,
+                   ROW_NUMBER() OVER (PARTITION BY LibroID
+                                      ORDER BY ISNULL(PrioridadCola, 999999), FechaReserva, ReservaID) AS n
+            FROM Reservas
+            WHERE Estado = 'ColaEspera' AND TipoReserva = 'ColaEspera'
+              AND LibroID IN (SELECT LibroID FROM #Vencidas)
+        )
+        UPDATE cola SET PrioridadCola = n
+        WHERE PrioridadCola IS NULL OR PrioridadCola <> n
+    """),
+)
+
+
+def parametros_paso(paso, ahora, dias_retiro):
+    """Parámetros de cada sentencia del lote"""
+    if paso == 'notificaciones_vencidas':
+        return (ahora,)
+    if paso == 'reservas_promovidas':
+        return (dias_retiro, ahora)
+    if paso == 'notificaciones_cola':
+        return (ahora, ahora)
+    return ()
+
+
+def procesar_lote(cursor, ahora, tamano_lote, dias_retiro):
+    """Aplicar un lote (sin commit); devuelve {paso: filas}"""
+    cursor.execute(CREAR_TEMPORALES)
+    conteos = {}
+    restantes = tamano_lote
+    for motivo, sql in SELECCIONAR_VENCIDAS:
+        cursor.execute(sql, restantes, ahora)
+        conteos[f'vencidas_{motivo}'] = max(cursor.rowcount, 0)
+        restantes -= conteos[f'vencidas_{motivo}']
+        if restantes <= 0:
+            break
+    if sum(conteos.values()) == 0:
+        return conteos
+
+    for paso, sql in PASOS_LOTE:
+        cursor.execute(sql, *parametros_paso(paso, ahora, dias_retiro))
+        conteos[paso] = max(cursor.rowcount, 0)
+    return conteos
+
+
+def imprimir_muestra(cursor):
+    """Mostrar algunas reservas vencidas y promovidas del lote simulado"""
+    cursor.execute(f"SELECT TOP ({MUESTRA_SIMULACION}) ReservaID, LibroID, UsuarioID, EjemplarID, Motivo FROM #Vencidas ORDER BY ReservaID")
+    filas = cursor.fetchall()
+    if filas:
+        print("\n  Reservas que vencerían:")
+        for row in filas:
+            ejemplar = f"libera ejemplar {row[3]}" if row[3] else "sin ejemplar"
+            print(f"    Reserva {row[0]:6d}  libro {row[1]:6d}  usuario {row[2]:6d}  ({row[4]}, {ejemplar})")
+
+    cursor.execute(f"SELECT TOP ({MUESTRA_SIMULACION}) ReservaID, LibroID, UsuarioID, EjemplarID FROM #Asignaciones ORDER BY LibroID, ReservaID")
+    filas = cursor.fetchall()
+    if filas:
+        print("\n  Reservas en cola que pasarían a retiro:")
+        for row in filas:
+            print(f"    Reserva {row[0]:6d}  libro {row[1]:6d}  usuario {row[2]:6d}  -> ejemplar {row[3]}")
+
+
+def barrer(conn, tamano_lote=TAMANO_LOTE, dias_retiro=DIAS_RETIRO, simulacion=False):
+    """
+    Barrer todas las reservas vencidas en lotes de tamano_lote.
+    En simulación se aplica un solo lote con todas las vencidas y se revierte.
+    Devuelve (totales por paso, lotes, segundos)
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT GETDATE()")
+    ahora = cursor.fetchone()[0]
+
+    totales = {}
+    lotes = 0
+    inicio = time.perf_counter()
+    while True:
+        inicio_lote = time.perf_counter()
+        try:
+            conteos = procesar_lote(cursor, ahora, LOTE_SIMULACION if simulacion else tamano_lote, dias_retiro)
+            if simulacion:
+                imprimir_muestra(cursor)
+                conn.rollback()
+            else:
+                conn.commit()
+        except pyodbc.Error:
+            conn.rollback()
+            raise
+
+        vencidas = conteos.get('vencidas_retiro', 0) + conteos.get('vencidas_cola', 0)
+        if vencidas == 0:
+            break
+        lotes += 1
+        for paso, filas in conteos.items():
+            totales[paso] = totales.get(paso, 0) + filas
+        if not simulacion:
+            print(f"  Lote {lotes}: {vencidas:,} vencidas, {conteos.get('reservas_promovidas', 0):,} promovidas "
+                  f"({time.perf_counter() - inicio_lote:.2f} s)")
+        if simulacion or vencidas < tamano_lote:
+            break
+
+    return totales, lotes, time.perf_counter() - inicio
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Vencer reservas no retiradas y avanzar las colas de espera')
+    parser.add_argument('--simulacion', action='store_true', help='Mostrar qué se haría y revertir los cambios')
+    parser.add_argument('--lote', type=int, default=TAMANO_LOTE, help=f'Reservas por lote (por defecto {TAMANO_LOTE})')
+    parser.add_argument('--dias-retiro', type=int, default=DIAS_RETIRO,
+                        help=f'Días para retirar una reserva promovida (por defecto {DIAS_RETIRO})')
+    args = parser.parse_args()
+    if args.lote <= 0:
+        parser.error("--lote debe ser mayor que cero")
+
+    print("="*60)
+    print("BARRIDO DE RESERVAS VENCIDAS" + (" (SIMULACION)" if args.simulacion else ""))
+    print("="*60)
+
+    conn = conectar_bd()
+    try:
+        totales, lotes, segundos = barrer(conn, args.lote, args.dias_retiro, args.simulacion)
+    except pyodbc.Error as e:
+        print(f"[ERROR] Error de base de datos: {e}")
+        sys.exit(1)
+    finally:
+        conn.close()
+
+    if not totales:
+        print("[OK] No hay reservas vencidas")
+        return
+
+    print(f"\n  Vencidas por retiro:           {totales.get('vencidas_retiro', 0):,}")
+    print(f"  Vencidas en cola:              {totales.get('vencidas_cola', 0):,}")
+    print(f"  Ejemplares liberados:          {totales.get('ejemplares_liberados', 0):,}")
+    print(f"  Reservas promovidas a retiro:  {totales.get('reservas_promovidas', 0):,}")
+    print(f"  Prioridades renumeradas:       {totales.get('prioridades_renumeradas', 0):,}")
+    print(f"  Notificaciones:                {totales.get('notificaciones_vencidas', 0) + totales.get('notificaciones_cola', 0):,}")
+    print(f"  Tiempo:                        {segundos:.2f} s ({lotes} lote(s))")
+    if args.simulacion:
+        print("\n[INFO] Simulación: no se guardó ningún cambio")
+    else:
+        print("\n[OK] Barrido completado")
+
+
+if __name__ == "__main__":
+    main()
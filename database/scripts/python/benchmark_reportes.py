@@ -0,0 +1,412 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark de los reportes de generar_reportes
+- Siembra una base SQLite de prueba (mismo esquema que replica_local) con
+  volúmenes configurables de usuarios, libros, reservas, préstamos y multas,
+  o mide directamente contra SQL Server con --backend sqlserver
+- Cada reporte se mide en frío (conexión nueva) y en caliente (mediana de
+  varias repeticiones sobre la misma conexión)
+- Trabajo realizado por el motor:
+    * SQL Server: lecturas lógicas de SET STATISTICS IO (cursor.messages)
+    * SQLite: instrucciones de la máquina virtual (set_progress_handler)
+- Los resultados se agregan a data/benchmarks/resultados.jsonl junto con el
+  commit actual, y --comparar los contrasta con la corrida anterior
+
+Uso:
+    python benchmark_reportes.py --prestamos 1000 100000 1000000
+    python benchmark_reportes.py --prestamos 100000 --repeticiones 5 --comparar
+    python benchmark_reportes.py --backend sqlserver --comparar
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+
+import pyodbc
+
+from generar_reportes import REPORTES, conectar_bd, opciones_por_defecto, parametros_reporte
+from replica_local import abrir_replica, ConexionReplica, TABLAS_REPLICA
+from jerarquia_lcc import clasificar_lcc
+
+DIRECTORIO_BENCHMARK = os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'benchmarks')
+ARCHIVO_RESULTADOS = os.path.join(DIRECTORIO_BENCHMARK, 'resultados.jsonl')
+
+# Variación (en tiempo caliente) a partir de la cual --comparar marca una regresión
+UMBRAL_REGRESION = 0.20
+
+ROLES = ('Estudiante', 'Estudiante', 'Estudiante', 'Estudiante', 'Profesor', 'Bibliotecaria')
+# Subclases LCC con un peso parecido al del catálogo real (mucho QA y TK)
+SUBCLASES_LCC = ('QA', 'QA', 'QA', 'QA', 'TK', 'TK', 'T', 'HF', 'HD', 'QC', 'TJ', 'TA', 'BF', 'Z')
+TAMANO_LOTE = 10000
+
+PATRON_STATISTICS_IO = re.compile(r"Table '([^']+)'\. Scan count (\d+), logical reads (\d+)")
+
+
+# ============================================================
+# Siembra de la base de prueba
+# ============================================================
+
+def volumenes_para(prestamos):
+    """Volúmenes del resto de tablas proporcionales a la cantidad de préstamos"""
+    return {
+        'usuarios': max(prestamos // 10, 10),
+        'libros': max(prestamos // 20, 10),
+        'ejemplares_por_libro': 3,
+        'prestamos': prestamos,
+    }
+
+
+def insertar_por_lotes(conn, tabla, filas):
+    columnas = TABLAS_REPLICA[tabla]['columnas']
+    sql = f"INSERT INTO {tabla} ({', '.join(columnas)}) VALUES ({', '.join('?' for _ in columnas)})"
+    lote = []
+    for fila in filas:
+        lote.append(fila)
+        if len(lote) >= TAMANO_LOTE:
+            conn.executemany(sql, lote)
+            lote = []
+    if lote:
+        conn.executemany(sql, lote)
+
+
+def sembrar_sqlite(archivo, volumenes, semilla=42):
+    """Crear una base SQLite con datos sintéticos de circulación"""
+    for sufijo in ('', '-wal', '-shm'):
+        if os.path.exists(archivo + sufijo):
+            os.remove(archivo + sufijo)
+
+    azar = random.Random(semilla)
+    ahora = datetime.now().replace(microsecond=0)
+    formato = lambda fecha: fecha.strftime('%Y-%m-%d %H:%M:%S') if fecha else None
+    n_usuarios, n_libros = volumenes['usuarios'], volumenes['libros']
+    n_ejemplares = n_libros * volumenes['ejemplares_por_libro']
+
+    conn = abrir_replica(archivo)
+    conn.execute("PRAGMA synchronous=OFF")
+
+    insertar_por_lotes(conn, 'Usuarios', (
+        (i, f'2020{i:06d}', f'Usuario {i}', azar.choice(ROLES), 1, formato(ahora - timedelta(days=azar.randint(0, 1500))))
+        for i in range(1, n_usuarios + 1)
+    ))
+    insertar_por_lotes(conn, 'Libros', (
+        (i, None, f'Libro {i}', None, azar.randint(1970, 2024), 'Español', None)
+        for i in range(1, n_libros + 1)
+    ))
+    insertar_por_lotes(conn, 'Ejemplares', (
+        (i, (i - 1) // volumenes['ejemplares_por_libro'] + 1, (i - 1) % volumenes['ejemplares_por_libro'] + 1,
+         f'FISI{(i - 1) // volumenes["ejemplares_por_libro"] + 1:06d}{(i - 1) % volumenes["ejemplares_por_libro"] + 1:03d}',
+         'Disponible', formato(ahora - timedelta(days=1500)))
+        for i in range(1, n_ejemplares + 1)
+    ))
+
+    # Popularidad sesgada: pocos libros y usuarios concentran muchos préstamos
+    def sesgado(n):
+        return min(int(azar.paretovariate(1.2)), n) if azar.random() < 0.3 else azar.randint(1, n)
+
+    reservas, prestamos, multas = [], [], []
+    multa_id = 0
+    for i in range(1, volumenes['prestamos'] + 1):
+        libro = sesgado(n_libros)
+        usuario = sesgado(n_usuarios)
+        fecha_prestamo = ahora - timedelta(days=azar.randint(0, 730), seconds=azar.randint(0, 86399))
+        vencimiento = fecha_prestamo + timedelta(days=7)
+        devolucion = None
+        if vencimiento < ahora and azar.random() < 0.9:
+            devolucion = fecha_prestamo + timedelta(days=azar.randint(1, 12), seconds=azar.randint(0, 86399))
+            estado = 'Devuelto'
+        else:
+            estado = 'Atrasado' if vencimiento < ahora else 'Prestado'
+
+        ejemplar = (libro - 1) * volumenes['ejemplares_por_libro'] + 1
+        reservas.append((i, usuario, libro, ejemplar, formato(fecha_prestamo - timedelta(hours=2)),
+                         'Completada', 'Retiro', None, None))
+        prestamos.append((i, i, formato(fecha_prestamo), formato(vencimiento), formato(devolucion), estado, 0,
+                          formato(fecha_prestamo), formato(devolucion or fecha_prestamo)))
+
+        if devolucion and devolucion > vencimiento:
+            multa_id += 1
+            dias = (devolucion - vencimiento).days + 1
+            pagada = azar.random() < 0.7
+            multas.append((multa_id, i, usuario, min(dias * 2.0, 50.0), 'Pagada' if pagada else 'Pendiente', dias,
+                           'Devolución tardía', formato(devolucion + timedelta(days=azar.randint(0, 30))) if pagada else None))
+
+        if len(prestamos) >= TAMANO_LOTE:
+            insertar_por_lotes(conn, 'Reservas', reservas)
+            insertar_por_lotes(conn, 'Prestamos', prestamos)
+            insertar_por_lotes(conn, 'Multas', multas)
+            reservas, prestamos, multas = [], [], []
+
+    insertar_por_lotes(conn, 'Reservas', reservas)
+    insertar_por_lotes(conn, 'Prestamos', prestamos)
+    insertar_por_lotes(conn, 'Multas', multas)
+
+    # Jerarquía LCC con su propio generador para no alterar los datos de circulación
+    azar_lcc = random.Random(semilla)
+    insertar_por_lotes(conn, 'JerarquiaLCC', (
+        (i,) + clasificar_lcc(azar_lcc.choice(SUBCLASES_LCC), f"{azar_lcc.uniform(1, 999):.2f}") + (formato(ahora),)
+        for i in range(1, n_libros + 1)
+    ))
+    conn.commit()
+    conn.execute("ANALYZE")
+    conn.close()
+
+
+# ============================================================
+# Medición
+# ============================================================
+
+class CursorMedido:
+    """Cursor de SQL Server que acumula las lecturas lógicas de STATISTICS IO"""
+
+    def __init__(self, cursor, lecturas):
+        self.cursor = cursor
+        self.lecturas = lecturas
+        self.recolectado = True
+
+    def recolectar(self):
+        """Sumar los mensajes pendientes (llegan al terminar cada conjunto de resultados)"""
+        if self.recolectado:
+            return
+        self.recolectado = True
+        try:
+            self.acumular(getattr(self.cursor, 'messages', None) or [])
+            while self.cursor.nextset():
+                self.acumular(getattr(self.cursor, 'messages', None) or [])
+        except pyodbc.Error:
+            pass
+
+    def acumular(self, mensajes):
+        for _, texto in mensajes:
+            for tabla, _, lecturas in PATRON_STATISTICS_IO.findall(str(texto)):
+                self.lecturas[tabla] = self.lecturas.get(tabla, 0) + int(lecturas)
+
+    def execute(self, sql, *parametros):
+        self.recolectar()
+        self.cursor.execute(sql, *parametros)
+        self.recolectado = False
+        return self
+
+    def __getattr__(self, nombre):
+        return getattr(self.cursor, nombre)
+
+
+class ConexionMedida:
+    """Envuelve una conexión pyodbc para medir lecturas lógicas por reporte"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.cursores = []
+        self.lecturas = {}
+        cursor = conn.cursor()
+        cursor.execute("SET STATISTICS IO ON")
+
+    def cursor(self):
+        cursor = CursorMedido(self.conn.cursor(), self.lecturas)
+        self.cursores.append(cursor)
+        return cursor
+
+    def reiniciar(self):
+        for cursor in self.cursores:
+            cursor.recolectar()
+        self.cursores = []
+        self.lecturas.clear()
+
+    def trabajo(self):
+        for cursor in self.cursores:
+            cursor.recolectar()
+        return {'lecturas_logicas': sum(self.lecturas.values()), 'por_tabla': dict(self.lecturas)}
+
+    def close(self):
+        self.conn.close()
+
+
+class ConexionSQLiteMedida(ConexionReplica):
+    """Conexión a la base sembrada que cuenta instrucciones de la VM de SQLite"""
+
+    def __init__(self, archivo):
+        super().__init__(archivo)
+        self.pasos = 0
+        # El manejador se llama cada 1000 instrucciones
+        self.conn.set_progress_handler(self.contar, 1000)
+
+    def contar(self):
+        self.pasos += 1000
+        return 0
+
+    def reiniciar(self):
+        self.pasos = 0
+
+    def trabajo(self):
+        return {'pasos_vm': self.pasos}
+
+
+def medir_reporte(conectar, nombre, parametros, repeticiones):
+    """Tiempo en frío (conexión nueva) y en caliente (mediana) de un reporte"""
+    funcion = REPORTES[nombre]['funcion']
+
+    conn = conectar()
+    try:
+        conn.reiniciar()
+        inicio = time.perf_counter()
+        funcion(conn, **parametros)
+        frio = time.perf_counter() - inicio
+        trabajo = conn.trabajo()
+
+        tiempos = []
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            funcion(conn, **parametros)
+            tiempos.append(time.perf_counter() - inicio)
+    finally:
+        conn.close()
+
+    return {
+        'frio_ms': round(frio * 1000, 3),
+        'caliente_ms': round(statistics.median(tiempos) * 1000, 3) if tiempos else None,
+        **trabajo,
+    }
+
+
+def commit_actual():
+    try:
+        salida = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10)
+        return salida.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def ejecutar_corrida(backend, conectar, volumenes, reportes, repeticiones, commit):
+    opciones = opciones_por_defecto()
+    corrida = {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'commit': commit,
+        'backend': backend,
+        'volumenes': volumenes,
+        'repeticiones': repeticiones,
+        'reportes': {},
+    }
+
+    print(f"\n  {'Reporte':35s} {'Frío (ms)':>11s} {'Caliente (ms)':>14s} {'Trabajo':>14s}")
+    for nombre in reportes:
+        resultado = medir_reporte(conectar, nombre, parametros_reporte(nombre, opciones), repeticiones)
+        corrida['reportes'][nombre] = resultado
+        trabajo = resultado.get('lecturas_logicas', resultado.get('pasos_vm'))
+        print(f"  {nombre:35s} {resultado['frio_ms']:11.2f} {resultado['caliente_ms'] or 0:14.2f} {trabajo or 0:14,}")
+    return corrida
+
+
+def leer_resultados(archivo=ARCHIVO_RESULTADOS):
+    if not os.path.exists(archivo):
+        return []
+    corridas = []
+    with open(archivo, 'r', encoding='utf-8') as f:
+        for linea in f:
+            try:
+                corridas.append(json.loads(linea))
+            except ValueError:
+                continue
+    return corridas
+
+
+def guardar_resultado(corrida, archivo=ARCHIVO_RESULTADOS):
+    os.makedirs(os.path.dirname(os.path.abspath(archivo)), exist_ok=True)
+    with open(archivo, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(corrida, ensure_ascii=False) + '\n')
+
+
+def comparar(corrida, anteriores, umbral=UMBRAL_REGRESION):
+    """Comparar con la última corrida del mismo backend y volúmenes; devuelve las regresiones"""
+    previa = next((c for c in reversed(anteriores)
+                   if c['backend'] == corrida['backend'] and c['volumenes'] == corrida['volumenes']), None)
+    if previa is None:
+        print("  [INFO] No hay una corrida anterior comparable")
+        return []
+
+    print(f"\n  Comparación con {previa['fecha']} (commit {previa.get('commit') or '?'})")
+    regresiones = []
+    for nombre, actual in corrida['reportes'].items():
+        anterior = previa['reportes'].get(nombre)
+        if not anterior or not anterior.get('caliente_ms') or not actual.get('caliente_ms'):
+            continue
+        variacion = actual['caliente_ms'] / anterior['caliente_ms'] - 1
+        marca = ''
+        if variacion > umbral:
+            marca = '  [WARN] regresión'
+            regresiones.append(nombre)
+        print(f"  {nombre:35s} {anterior['caliente_ms']:10.2f} -> {actual['caliente_ms']:10.2f} ms ({variacion:+.0%}){marca}")
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de los reportes - Biblioteca FISI')
+    parser.add_argument('--backend', choices=['sqlite', 'sqlserver'], default='sqlite',
+                        help='sqlite: base sembrada local; sqlserver: la base configurada en generar_reportes')
+    parser.add_argument('--prestamos', type=int, nargs='+', default=[10000],
+                        help='Cantidades de préstamos a sembrar (una corrida por valor)')
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--resembrar', action='store_true', help='Volver a sembrar aunque la base ya exista')
+    parser.add_argument('--repeticiones', type=int, default=3, help='Repeticiones en caliente por reporte')
+    parser.add_argument('--only', nargs='+', choices=list(REPORTES), metavar='REPORTE')
+    parser.add_argument('--comparar', action='store_true', help='Comparar con la corrida anterior equivalente')
+    parser.add_argument('--fallar-si-regresion', action='store_true',
+                        help=f'Terminar con código 1 si algún reporte empeora más de {UMBRAL_REGRESION:.0%}')
+    parser.add_argument('--resultados', default=ARCHIVO_RESULTADOS)
+    args = parser.parse_args()
+
+    reportes = [nombre for nombre in REPORTES if not args.only or nombre in args.only]
+    anteriores = leer_resultados(args.resultados)
+    commit = commit_actual()
+    regresiones = []
+
+    print("="*60)
+    print("BENCHMARK DE REPORTES - BIBLIOTECA FISI")
+    print("="*60)
+
+    if args.backend == 'sqlserver':
+        conn = conectar_bd()
+        cursor = conn.cursor()
+        cursor.execute("SELECT (SELECT COUNT(*) FROM Usuarios), (SELECT COUNT(*) FROM Libros), (SELECT COUNT(*) FROM Prestamos)")
+        fila = cursor.fetchone()
+        conn.close()
+        volumenes = {'usuarios': fila[0], 'libros': fila[1], 'prestamos': fila[2]}
+        print(f"\nSQL Server: {volumenes['prestamos']:,} préstamos, {volumenes['usuarios']:,} usuarios")
+        corridas = [ejecutar_corrida('sqlserver', lambda: ConexionMedida(conectar_bd()), volumenes,
+                                     reportes, args.repeticiones, commit)]
+    else:
+        os.makedirs(DIRECTORIO_BENCHMARK, exist_ok=True)
+        corridas = []
+        for prestamos in args.prestamos:
+            volumenes = volumenes_para(prestamos)
+            archivo = os.path.join(DIRECTORIO_BENCHMARK, f'sembrado_{prestamos}_{args.semilla}.sqlite')
+            if args.resembrar or not os.path.exists(archivo):
+                print(f"\nSembrando {prestamos:,} préstamos...")
+                inicio = time.perf_counter()
+                sembrar_sqlite(archivo, volumenes, args.semilla)
+                print(f"[OK] Base sembrada en {time.perf_counter() - inicio:.1f} s -> {archivo}")
+            else:
+                print(f"\nUsando base sembrada: {archivo}")
+            corridas.append(ejecutar_corrida('sqlite', lambda: ConexionSQLiteMedida(archivo), volumenes,
+                                             reportes, args.repeticiones, commit))
+
+    for corrida in corridas:
+        if args.comparar:
+            regresiones.extend(comparar(corrida, anteriores))
+        guardar_resultado(corrida, args.resultados)
+    print(f"\n[GUARDADO] Resultados agregados a: {args.resultados}")
+
+    if regresiones and args.fallar_si_regresion:
+        print(f"[ERROR] Regresiones en: {', '.join(sorted(set(regresiones)))}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
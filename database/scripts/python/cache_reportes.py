@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Caché de resultados para los reportes de la biblioteca
+- Cada entrada se identifica por el nombre del reporte, sus parámetros y una
+  "versión de datos" obtenida con una sonda por tabla: COUNT(*) más
+  MAX(VersionFila) (rowversion, scripts/sql/crear_versiones_fila.sql), que
+  cambia con cualquier INSERT o UPDATE y se lee de un índice angosto
+- Las tablas que aún no tienen VersionFila usan una sonda de respaldo que
+  recorre la tabla: COUNT más CHECKSUM_AGG de las columnas que usan los reportes
+- Si ni los parámetros ni la versión de las tablas cambiaron, el reporte se
+  devuelve desde disco sin volver a consultar las tablas pesadas
+- Las entradas expiran por TTL y se guardan en un archivo SQLite local
+"""
+
+import sqlite3
+import hashlib
+import json
+import os
+import time
+from datetime import date
+
+# Archivo de caché: junto a los demás archivos de datos
+ARCHIVO_CACHE = os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'cache_reportes.sqlite')
+
+# Tiempo de vida por defecto de una entrada (segundos)
+TTL_POR_DEFECTO = 15 * 60
+
+# Tablas de las que depende cada reporte
+DEPENDENCIAS_REPORTES = {
+    'estadisticas_generales': ('Usuarios', 'Libros', 'Ejemplares', 'Prestamos', 'Multas'),
+    'prestamos_por_mes': ('Prestamos',),
+    'libros_mas_prestados': ('Prestamos', 'Reservas', 'Libros'),
+    'usuarios_mas_activos': ('Prestamos', 'Reservas', 'Usuarios'),
+    'estadisticas_por_rol': ('Usuarios',),
+    'actividad_diaria': ('Prestamos', 'Multas'),
+    'rendimiento_biblioteca': ('Prestamos', 'Multas'),
+    'libros_mas_prestados_por_periodo': ('Prestamos', 'Reservas', 'Libros'),
+    'usuarios_mas_activos_por_periodo': ('Prestamos', 'Reservas', 'Usuarios'),
+    'distribuciones_prestamos': ('Prestamos', 'Reservas', 'Usuarios', 'Multas'),
+    'circulacion_por_lcc': ('Prestamos', 'Reservas', 'Libros', 'Ejemplares', 'JerarquiaLCC'),
+}
+
+# Reportes cuyo resultado depende de la fecha actual (GETDATE() / datetime.now())
+REPORTES_DEPENDIENTES_DE_FECHA = {
+    'estadisticas_generales', 'rendimiento_biblioteca', 'distribuciones_prestamos', 'circulacion_por_lcc',
+}
+
+# Sonda de versión de las tablas con VersionFila (IX_<Tabla>_VersionFila)
+SONDA_VERSION_FILA = "SELECT COUNT(*), MAX(VersionFila) FROM {tabla}"
+
+TABLAS_CON_VERSION_FILA = """
+    SELECT t.name FROM sys.columns c
+    INNER JOIN sys.tables t ON c.object_id = t.object_id
+    WHERE c.name = 'VersionFila'
+"""
+
+# Sondas de respaldo (sin VersionFila): COUNT más un checksum de la clave y las
+# columnas que muestran los reportes o que el backend actualiza en el lugar
+SONDAS_VERSION = {
+    'Usuarios': """
+        SELECT COUNT(*), CHECKSUM_AGG(BINARY_CHECKSUM(UsuarioID, CodigoUniversitario, Nombre, Rol, Estado))
+        FROM Usuarios
+    """,
+    'Libros': "SELECT COUNT(*), CHECKSUM_AGG(BINARY_CHECKSUM(LibroID, Titulo, SignaturaLCC)) FROM Libros",
+    'Ejemplares': "SELECT COUNT(*), CHECKSUM_AGG(BINARY_CHECKSUM(EjemplarID, LibroID, Estado)) FROM Ejemplares",
+    'Reservas': "SELECT COUNT(*), CHECKSUM_AGG(BINARY_CHECKSUM(ReservaID, Estado)) FROM Reservas",
+    'Prestamos': """
+        SELECT COUNT(*), CHECKSUM_AGG(BINARY_CHECKSUM(PrestamoID, Estado, FechaDevolucion, FechaVencimiento))
+        FROM Prestamos
+    """,
+    'Multas': "SELECT COUNT(*), CHECKSUM_AGG(BINARY_CHECKSUM(MultaID, Estado, Monto, FechaCobro)) FROM Multas",
+    'JerarquiaLCC': "SELECT COUNT(*), MAX(FechaActualizacion) FROM JerarquiaLCC",
+}
+
+# En la réplica local (--backend local) los datos solo cambian al sincronizar
+SONDA_VERSION_REPLICA = "SELECT MarcaAgua, FechaSincronizacion FROM _ReplicaEstado WHERE Tabla = ?"
+
+
+def versiones_tablas(conn, tablas=None):
+    """Obtener la versión de datos de cada tabla (una consulta pequeña por tabla)"""
+    if tablas is None:
+        tablas = SONDAS_VERSION.keys()
+
+    cursor = conn.cursor()
+    replica = getattr(conn, 'dialecto', 'sqlserver') == 'sqlite'
+    con_version_fila = set()
+    if not replica:
+        cursor.execute(TABLAS_CON_VERSION_FILA)
+        con_version_fila = {row[0] for row in cursor.fetchall()}
+
+    versiones = {}
+    for tabla in sorted(set(tablas)):
+        if replica:
+            cursor.execute(SONDA_VERSION_REPLICA, tabla)
+        elif tabla in con_version_fila:
+            cursor.execute(SONDA_VERSION_FILA.format(tabla=tabla))
+        else:
+            cursor.execute(SONDAS_VERSION[tabla])
+        row = cursor.fetchone() or ()
+        versiones[tabla] = [
+            None if valor is None else bytes(valor).hex() if isinstance(valor, (bytes, bytearray)) else str(valor)
+            for valor in row
+        ]
+    return versiones
+
+
+def clave_reporte(nombre, parametros, versiones):
+    """Calcular la clave de caché de un reporte"""
+    tablas = DEPENDENCIAS_REPORTES.get(nombre, tuple(versiones.keys()))
+    contenido = {
+        'reporte': nombre,
+        'parametros': parametros,
+        'versiones': {tabla: versiones.get(tabla) for tabla in tablas},
+    }
+    if nombre in REPORTES_DEPENDIENTES_DE_FECHA:
+        contenido['hoy'] = date.today()
+
+    serializado = json.dumps(contenido, sort_keys=True, default=str)
+    return hashlib.sha256(serializado.encode('utf-8')).hexdigest()
+
+
+class CacheReportes:
+    """Caché persistente de reportes con expiración por TTL"""
+
+    def __init__(self, archivo=ARCHIVO_CACHE, ttl=TTL_POR_DEFECTO):
+        self.archivo = archivo
+        self.ttl = ttl
+        self.aciertos = 0
+        self.fallos = 0
+
+        directorio = os.path.dirname(os.path.abspath(archivo))
+        os.makedirs(directorio, exist_ok=True)
+        self.conn = sqlite3.connect(archivo)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS CacheReportes (
+                Clave TEXT PRIMARY KEY,
+                Reporte TEXT NOT NULL,
+                Valor TEXT NOT NULL,
+                FechaCreacion REAL NOT NULL,
+                FechaExpiracion REAL NOT NULL
+            )
+        """)
+        self.conn.execute("""
+            CREATE INDEX IF NOT EXISTS IX_CacheReportes_Expiracion
+            ON CacheReportes (FechaExpiracion)
+        """)
+        self.conn.commit()
+        self.purgar_expiradas()
+
+    def obtener(self, clave):
+        """Devolver el valor guardado o None si no existe o expiró"""
+        row = self.conn.execute(
+            "SELECT Valor FROM CacheReportes WHERE Clave = ? AND FechaExpiracion > ?",
+            (clave, time.time())
+        ).fetchone()
+
+        if row is None:
+            self.fallos += 1
+            return None
+
+        self.aciertos += 1
+        return json.loads(row[0])
+
+    def guardar(self, clave, reporte, valor, ttl=None):
+        """Guardar un valor en la caché"""
+        ahora = time.time()
+        ttl = self.ttl if ttl is None else ttl
+        self.conn.execute("""
+            INSERT OR REPLACE INTO CacheReportes (Clave, Reporte, Valor, FechaCreacion, FechaExpiracion)
+            VALUES (?, ?, ?, ?, ?)
+        """, (clave, reporte, json.dumps(valor, ensure_ascii=False, default=str), ahora, ahora + ttl))
+        self.conn.commit()
+
+    def purgar_expiradas(self):
+        """Eliminar las entradas expiradas"""
+        cursor = self.conn.execute("DELETE FROM CacheReportes WHERE FechaExpiracion <= ?", (time.time(),))
+        self.conn.commit()
+        return cursor.rowcount
+
+    def limpiar(self):
+        """Vaciar toda la caché"""
+        self.conn.execute("DELETE FROM CacheReportes")
+        self.conn.commit()
+
+    def cerrar(self):
+        self.conn.close()
+
+
+def ejecutar_con_cache(cache, conn, nombre, funcion, parametros, versiones):
+    """
+    Ejecutar un reporte usando la caché.
+    `parametros` es un dict con los argumentos con nombre de `funcion`.
+    Devuelve (resultado, desde_cache).
+    """
+    if cache is None:
+        return funcion(conn, **parametros), False
+
+    clave = clave_reporte(nombre, parametros, versiones)
+    resultado = cache.obtener(clave)
+    if resultado is not None:
+        return resultado, True
+
+    resultado = funcion(conn, **parametros)
+    cache.guardar(clave, nombre, resultado)
+    # Normalizar a lo que devolvería la caché (tipos JSON) para que ambos caminos sean iguales
+    return json.loads(json.dumps(resultado, ensure_ascii=False, default=str)), False
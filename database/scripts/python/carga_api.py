@@ -0,0 +1,596 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Prueba de carga de la API REST de NeoLibro (asyncio)
+- Llegadas en lazo abierto: los recorridos empiezan según un proceso de
+  Poisson a la tasa pedida, terminen o no los anteriores; la latencia de
+  cada recorrido se mide desde su llegada programada (sin omisión
+  coordinada cuando el servidor se atasca)
+- Recorridos de usuario (mezcla configurable con --mezcla):
+    visitante      buscar en /api/Libros/buscar y abrir un libro
+    catalogo       listado completo /api/Libros
+    estudiante     sesión iniciada: buscar, abrir, reservar (cola de espera),
+                   ver mis reservas y cancelar la reserva creada
+    bibliotecaria  préstamos activos y renovación de uno de un usuario
+                   sintético (SIM); al terminar se restauran FechaVencimiento
+                   y Renovaciones de los renovados
+    publica        /api/public con X-API-Key (ApiKeyMiddleware): listado
+                   paginado, búsqueda y detalle
+- Un solo pool de conexiones HTTP (keep-alive) compartido por todas las
+  sesiones; cada sesión tiene su cookie de login y su X-Forwarded-For, para
+  que RateLimitingMiddleware la trate como un cliente distinto (--misma-ip
+  lo desactiva para medir el propio limitador)
+- Histogramas de latencia por endpoint y por recorrido al estilo HDR
+  (log-lineales, error relativo < 1,6 %): p50/p90/p95/p99/p99.9 y máximo
+- Etapas: --tasa 20 50 100 200 corre cada tasa --duracion segundos y se
+  detiene en la primera saturada (throughput < 95 % de lo ofrecido, más de
+  1 % de errores o p99 por encima de --slo-ms); el techo es la última que
+  aguantó. El resultado queda en data/benchmarks/carga_api/
+
+Preparación: base cargada con cargar_datos_completos.py y usuarios de
+generador_circulacion.py (inician sesión con su contraseña sintética).
+
+Uso:
+    python carga_api.py --tasa 10 20 50 100 --duracion 60
+    python carga_api.py --url http://localhost:5180 --mezcla visitante=0.6,estudiante=0.4 --tasa 30
+    python carga_api.py --api-key CLAVE --mezcla publica=1 --tasa 50 100 200
+
+Requiere aiohttp (pip install aiohttp)
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime
+
+import pyodbc
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+from generador_circulacion import CONTRASENA_SINTETICA, PREFIJO_CODIGO, leer_distribucion
+from generar_reportes import conectar_bd, escribir_atomico
+from indice_busqueda import palabras
+
+DIRECTORIO_RESULTADOS = os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'benchmarks', 'carga_api')
+
+URL_POR_DEFECTO = 'http://localhost:5180'
+MEZCLA_POR_DEFECTO = 'visitante=0.45,estudiante=0.3,bibliotecaria=0.05,publica=0.15,catalogo=0.05'
+
+# Criterios de saturación de una etapa
+MINIMO_THROUGHPUT = 0.95
+MAXIMO_ERRORES = 0.01
+SLO_P99_MS = 2000
+
+PERCENTILES = (50, 90, 95, 99, 99.9)
+
+# Préstamos sintéticos activos que puede renovar el recorrido bibliotecaria
+MAXIMO_PRESTAMOS_RENOVABLES = 5000
+
+
+# ============================================================
+# Histograma de latencias (estilo HDR)
+# ============================================================
+
+class HistogramaLatencias:
+    """
+    Cuentas por cubeta log-lineal en microsegundos: exactas por debajo de
+    128 µs y, encima, 64 cubetas por potencia de dos (error relativo < 1/64)
+    """
+
+    BITS = 7
+    MITAD = 1 << (BITS - 1)
+
+    def __init__(self):
+        self.cuentas = {}
+        self.total = 0
+        self.suma = 0
+        self.maximo = 0
+
+    @classmethod
+    def indice(cls, valor):
+        if valor < (1 << cls.BITS):
+            return valor
+        corrimiento = valor.bit_length() - cls.BITS
+        return (1 << cls.BITS) + (corrimiento - 1) * cls.MITAD + (valor >> corrimiento) - cls.MITAD
+
+    @classmethod
+    def limite_superior(cls, indice):
+        """Mayor valor que cae en la cubeta"""
+        if indice < (1 << cls.BITS):
+            return indice
+        corrimiento, resto = divmod(indice - (1 << cls.BITS), cls.MITAD)
+        corrimiento += 1
+        return ((resto + cls.MITAD + 1) << corrimiento) - 1
+
+    def registrar(self, microsegundos):
+        valor = max(int(microsegundos), 0)
+        i = self.indice(valor)
+        self.cuentas[i] = self.cuentas.get(i, 0) + 1
+        self.total += 1
+        self.suma += valor
+        if valor > self.maximo:
+            self.maximo = valor
+
+    def combinar(self, otro):
+        for i, cuenta in otro.cuentas.items():
+            self.cuentas[i] = self.cuentas.get(i, 0) + cuenta
+        self.total += otro.total
+        self.suma += otro.suma
+        self.maximo = max(self.maximo, otro.maximo)
+
+    def percentil(self, p):
+        if not self.total:
+            return None
+        objetivo = max(1, round(p / 100 * self.total))
+        acumulado = 0
+        for i in sorted(self.cuentas):
+            acumulado += self.cuentas[i]
+            if acumulado >= objetivo:
+                return min(self.limite_superior(i), self.maximo)
+        return self.maximo
+
+    def resumen(self):
+        """Percentiles en milisegundos y las cubetas no vacías [límite µs, cuenta]"""
+        resumen = {'n': self.total,
+                   'media_ms': round(self.suma / self.total / 1000, 3) if self.total else None,
+                   'max_ms': round(self.maximo / 1000, 3) if self.total else None}
+        for p in PERCENTILES:
+            valor = self.percentil(p)
+            resumen[f'p{p:g}_ms'.replace('.', '_')] = round(valor / 1000, 3) if valor is not None else None
+        resumen['histograma_us'] = [[self.limite_superior(i), self.cuentas[i]] for i in sorted(self.cuentas)]
+        return resumen
+
+
+class MetricasEtapa:
+    """Latencias y códigos HTTP por endpoint y por recorrido de una etapa"""
+
+    def __init__(self, tasa):
+        self.tasa = tasa
+        self.endpoints = {}
+        self.recorridos = {}
+        self.estados = {}
+        self.errores = {}
+        self.iniciados = self.completados = self.descartados = 0
+        # Completados al cerrar la ventana de medición (los rezagados se esperan aparte)
+        self.completados_en_ventana = None
+
+    def registrar_peticion(self, endpoint, microsegundos, estado):
+        datos = self.endpoints.setdefault(endpoint, {'latencia': HistogramaLatencias(), 'estados': {}})
+        datos['latencia'].registrar(microsegundos)
+        datos['estados'][estado] = datos['estados'].get(estado, 0) + 1
+        self.estados[estado] = self.estados.get(estado, 0) + 1
+
+    def registrar_error(self, endpoint, error):
+        clave = f"{endpoint}: {type(error).__name__}"
+        self.errores[clave] = self.errores.get(clave, 0) + 1
+        self.registrar_peticion(endpoint, 0, 'error')
+
+    def registrar_recorrido(self, nombre, microsegundos):
+        self.recorridos.setdefault(nombre, HistogramaLatencias()).registrar(microsegundos)
+        self.completados += 1
+
+    def peticiones(self):
+        return sum(self.estados.values())
+
+    def fallidas(self):
+        # 4xx de negocio (p. ej. "ya tienes una reserva") son respuestas válidas; 429 sí cuenta
+        return sum(n for estado, n in self.estados.items()
+                   if estado == 'error' or estado == 429 or (isinstance(estado, int) and estado >= 500))
+
+    def resumen(self, duracion, slo_ms):
+        total = HistogramaLatencias()
+        for datos in self.recorridos.values():
+            total.combinar(datos)
+        peticiones = self.peticiones()
+        tasa_errores = self.fallidas() / peticiones if peticiones else 0.0
+        en_ventana = self.completados if self.completados_en_ventana is None else self.completados_en_ventana
+        llegadas = self.iniciados + self.descartados
+        throughput = en_ventana / duracion if duracion else 0.0
+        p99 = total.percentil(99)
+        motivos = []
+        # Se compara con las llegadas reales, no con la tasa nominal (varianza de Poisson)
+        if en_ventana < llegadas * MINIMO_THROUGHPUT:
+            motivos.append('throughput')
+        if tasa_errores > MAXIMO_ERRORES:
+            motivos.append('errores')
+        if p99 is not None and p99 / 1000 > slo_ms:
+            motivos.append('p99')
+        return {
+            'tasa_ofrecida': self.tasa,
+            'llegadas_por_segundo': round(llegadas / duracion, 2) if duracion else 0.0,
+            'recorridos_por_segundo': round(throughput, 2),
+            'peticiones_por_segundo': round(peticiones / duracion, 2) if duracion else 0.0,
+            'iniciados': self.iniciados,
+            'completados': self.completados,
+            'descartados': self.descartados,
+            'tasa_errores': round(tasa_errores, 4),
+            'saturada': bool(motivos),
+            'motivos': motivos,
+            'estados': {str(k): v for k, v in sorted(self.estados.items(), key=lambda e: str(e[0]))},
+            'errores': self.errores,
+            'recorridos': {nombre: h.resumen() for nombre, h in sorted(self.recorridos.items())},
+            'endpoints': {nombre: {**d['latencia'].resumen(), 'estados': {str(k): v for k, v in d['estados'].items()}}
+                          for nombre, d in sorted(self.endpoints.items())},
+        }
+
+
+# ============================================================
+# Sesiones y recorridos
+# ============================================================
+
+def campo(datos, nombre):
+    """Propiedad de un JSON sin importar mayúsculas (la API serializa en camelCase)"""
+    if isinstance(datos, dict):
+        for clave, valor in datos.items():
+            if clave.lower() == nombre.lower():
+                return valor
+    return None
+
+
+class Sesion:
+    """Cliente HTTP con cookie propia sobre el pool de conexiones compartido"""
+
+    def __init__(self, conector, url, ip=None, api_key=None, timeout=30):
+        cabeceras = {'User-Agent': 'carga_api/1.0'}
+        if ip:
+            cabeceras['X-Forwarded-For'] = ip
+        if api_key:
+            cabeceras['X-API-Key'] = api_key
+        self.http = aiohttp.ClientSession(
+            base_url=url, connector=conector, connector_owner=False, headers=cabeceras,
+            cookie_jar=aiohttp.CookieJar(unsafe=True), timeout=aiohttp.ClientTimeout(total=timeout))
+
+    async def pedir(self, metricas, metodo, endpoint, ruta, **kwargs):
+        """(estado, json o None); registra la latencia bajo el nombre del endpoint"""
+        inicio = time.perf_counter()
+        try:
+            async with self.http.request(metodo, ruta, **kwargs) as respuesta:
+                cuerpo = await respuesta.read()
+                estado = respuesta.status
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            metricas.registrar_error(endpoint, e)
+            return None, None
+        metricas.registrar_peticion(endpoint, (time.perf_counter() - inicio) * 1e6, estado)
+        try:
+            return estado, json.loads(cuerpo) if cuerpo else None
+        except ValueError:
+            return estado, None
+
+    async def cerrar(self):
+        await self.http.close()
+
+
+class Contexto:
+    """Datos de la base y sesiones que comparten los recorridos"""
+
+    def __init__(self, libros, palabras, semilla, prestamos=(), renovados=None):
+        self.libros = libros
+        self.palabras = palabras
+        self.azar = random.Random(semilla)
+        self.anonima = None
+        self.publica = None
+        self.estudiantes = []
+        self.bibliotecarias = []
+        # Solo se renuevan préstamos de usuarios sintéticos; los renovados se restauran al final
+        self.prestamos_sinteticos = set(prestamos)
+        self.prestamos_activos = sorted(self.prestamos_sinteticos)
+        self.renovados = renovados if renovados is not None else set()
+
+    def libro(self):
+        return self.azar.choice(self.libros)
+
+    def palabra(self):
+        return self.azar.choice(self.palabras)
+
+
+async def recorrido_visitante(ctx, m):
+    await ctx.anonima.pedir(m, 'GET', 'GET /api/Libros/buscar', '/api/Libros/buscar', params={'titulo': ctx.palabra()})
+    await ctx.anonima.pedir(m, 'GET', 'GET /api/Libros/{id}', f'/api/Libros/{ctx.libro()}')
+
+
+async def recorrido_catalogo(ctx, m):
+    await ctx.anonima.pedir(m, 'GET', 'GET /api/Libros', '/api/Libros')
+
+
+async def recorrido_estudiante(ctx, m):
+    sesion = ctx.azar.choice(ctx.estudiantes)
+    await sesion.pedir(m, 'GET', 'GET /api/Libros/buscar', '/api/Libros/buscar', params={'palabraClave': ctx.palabra()})
+    libro_id = ctx.libro()
+    await sesion.pedir(m, 'GET', 'GET /api/Libros/{id}', f'/api/Libros/{libro_id}')
+    estado, datos = await sesion.pedir(m, 'POST', 'POST /api/Reservas', '/api/Reservas', json={'LibroID': libro_id})
+    await sesion.pedir(m, 'GET', 'GET /api/Reservas/mis-reservas', '/api/Reservas/mis-reservas')
+    # Se cancela lo creado para que la cola no crezca durante la prueba
+    reserva_id = campo(campo(datos, 'reserva'), 'ReservaID') if estado == 200 else None
+    if reserva_id:
+        await sesion.pedir(m, 'DELETE', 'DELETE /api/Reservas/{id}/cancelar', f'/api/Reservas/{reserva_id}/cancelar')
+
+
+async def recorrido_bibliotecaria(ctx, m):
+    sesion = ctx.azar.choice(ctx.bibliotecarias)
+    estado, datos = await sesion.pedir(m, 'GET', 'GET /api/Prestamos/activos', '/api/Prestamos/activos')
+    if estado == 200 and isinstance(datos, list):
+        ctx.prestamos_activos = [p for p in (campo(d, 'PrestamoID') for d in datos) if p in ctx.prestamos_sinteticos]
+    if ctx.prestamos_activos:
+        prestamo_id = ctx.azar.choice(ctx.prestamos_activos)
+        # Se anota antes de pedir: una renovación que venció por timeout pudo aplicarse igual
+        ctx.renovados.add(prestamo_id)
+        await sesion.pedir(m, 'PUT', 'PUT /api/Prestamos/{id}/renovar', f'/api/Prestamos/{prestamo_id}/renovar',
+                           json={'DiasAdicionales': 7})
+
+
+async def recorrido_publica(ctx, m):
+    await ctx.publica.pedir(m, 'GET', 'GET /api/public/libros', '/api/public/libros',
+                            params={'pagina': ctx.azar.randint(1, max(len(ctx.libros) // 50, 1)), 'tamanoPagina': 50})
+    await ctx.publica.pedir(m, 'GET', 'GET /api/public/libros/buscar', '/api/public/libros/buscar',
+                            params={'titulo': ctx.palabra()})
+    await ctx.publica.pedir(m, 'GET', 'GET /api/public/libros/{id}', f'/api/public/libros/{ctx.libro()}')
+
+
+RECORRIDOS = {
+    'visitante': recorrido_visitante,
+    'catalogo': recorrido_catalogo,
+    'estudiante': recorrido_estudiante,
+    'bibliotecaria': recorrido_bibliotecaria,
+    'publica': recorrido_publica,
+}
+
+
+def leer_datos(cantidad_estudiantes, cantidad_bibliotecarias):
+    """
+    LibroIDs, palabras de títulos, usuarios sintéticos por rol y
+    {PrestamoID: (FechaVencimiento, Renovaciones)} de préstamos activos sintéticos
+    """
+    conn = conectar_bd()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT LibroID, Titulo FROM Libros")
+        libros, vocabulario = [], set()
+        for libro_id, titulo in cursor.fetchall():
+            libros.append(libro_id)
+            vocabulario.update(p for p in palabras(titulo or '') if len(p) >= 4 and not p.isdigit())
+        usuarios = {}
+        for rol, cantidad in (('Estudiante', cantidad_estudiantes), ('Bibliotecaria', cantidad_bibliotecarias)):
+            cursor.execute(f"""
+                SELECT TOP (?) EmailInstitucional FROM Usuarios
+                WHERE CodigoUniversitario LIKE '{PREFIJO_CODIGO}%' AND Rol = ? AND Estado = 1
+                ORDER BY UsuarioID
+            """, cantidad, rol)
+            usuarios[rol] = [fila[0] for fila in cursor.fetchall()]
+        cursor.execute(f"""
+            SELECT TOP (?) p.PrestamoID, p.FechaVencimiento, p.Renovaciones
+            FROM Prestamos p
+            INNER JOIN Reservas r ON p.ReservaID = r.ReservaID
+            INNER JOIN Usuarios u ON r.UsuarioID = u.UsuarioID
+            WHERE u.CodigoUniversitario LIKE '{PREFIJO_CODIGO}%' AND p.FechaDevolucion IS NULL
+              AND p.Estado IN ('Prestado', 'Atrasado')
+            ORDER BY p.PrestamoID DESC
+        """, MAXIMO_PRESTAMOS_RENOVABLES)
+        prestamos = {fila[0]: (fila[1], fila[2]) for fila in cursor.fetchall()}
+    finally:
+        conn.close()
+    return libros, sorted(vocabulario), usuarios, prestamos
+
+
+def restaurar_prestamos(prestamos, renovados):
+    """Devolver FechaVencimiento y Renovaciones de los préstamos renovados a sus valores previos"""
+    filas = [(*prestamos[p], p) for p in sorted(renovados) if p in prestamos]
+    if not filas:
+        return 0
+    conn = conectar_bd()
+    try:
+        cursor = conn.cursor()
+        cursor.fast_executemany = True
+        cursor.executemany("UPDATE Prestamos SET FechaVencimiento = ?, Renovaciones = ? WHERE PrestamoID = ?", filas)
+        conn.commit()
+    finally:
+        conn.close()
+    return len(filas)
+
+
+async def iniciar_sesiones(conector, args, correos, metricas, ips):
+    """Sesiones con login hecho (en paralelo, con límite de concurrencia)"""
+    limite = asyncio.Semaphore(args.concurrencia_login)
+
+    async def una(correo):
+        sesion = Sesion(conector, args.url, next(ips), timeout=args.timeout)
+        async with limite:
+            estado, _ = await sesion.pedir(metricas, 'POST', 'POST /api/Usuarios/login', '/api/Usuarios/login',
+                                           json={'EmailInstitucional': correo, 'Contrasena': CONTRASENA_SINTETICA})
+        if estado != 200:
+            await sesion.cerrar()
+            return None
+        return sesion
+
+    sesiones = await asyncio.gather(*(una(c) for c in correos))
+    return [s for s in sesiones if s is not None]
+
+
+# ============================================================
+# Generador de llegadas
+# ============================================================
+
+async def ejecutar_recorrido(ctx, nombre, metricas, llegada):
+    try:
+        await RECORRIDOS[nombre](ctx, metricas)
+    finally:
+        metricas.registrar_recorrido(nombre, (time.perf_counter() - llegada) * 1e6)
+
+
+async def correr_etapa(ctx, tasa, args, mezcla):
+    """Llegadas de Poisson a `tasa` recorridos/s; solo se miden las que llegan después del calentamiento"""
+    nombres, pesos = list(mezcla), list(mezcla.values())
+    metricas = MetricasEtapa(tasa)
+    descartables = MetricasEtapa(tasa)
+    en_vuelo = set()
+    inicio = time.perf_counter()
+    llegada = inicio
+    fin = inicio + args.calentamiento + args.duracion
+    while True:
+        llegada += ctx.azar.expovariate(tasa)
+        if llegada >= fin:
+            break
+        espera = llegada - time.perf_counter()
+        if espera > 0:
+            await asyncio.sleep(espera)
+        destino = metricas if llegada - inicio >= args.calentamiento else descartables
+        if len(en_vuelo) >= args.max_en_vuelo:
+            destino.descartados += 1
+            continue
+        destino.iniciados += 1
+        nombre = ctx.azar.choices(nombres, weights=pesos)[0]
+        tarea = asyncio.create_task(ejecutar_recorrido(ctx, nombre, destino, llegada))
+        en_vuelo.add(tarea)
+        tarea.add_done_callback(en_vuelo.discard)
+    await asyncio.sleep(max(fin - time.perf_counter(), 0))
+    metricas.completados_en_ventana = metricas.completados
+    if en_vuelo:
+        _, pendientes = await asyncio.wait(en_vuelo, timeout=args.timeout)
+        for tarea in pendientes:
+            tarea.cancel()
+    return metricas.resumen(args.duracion, args.slo_ms)
+
+
+def direcciones(misma_ip):
+    """X-Forwarded-For distintos por sesión (10.x.y.z), o None con --misma-ip"""
+    n = 0
+    while True:
+        n += 1
+        yield None if misma_ip else f"10.{(n >> 16) & 255}.{(n >> 8) & 255}.{n & 255}"
+
+
+async def prueba(args, mezcla, libros, palabras, usuarios, prestamos, renovados):
+    ctx = Contexto(libros, palabras, args.semilla, prestamos, renovados)
+    conector = aiohttp.TCPConnector(limit=args.conexiones, ttl_dns_cache=300)
+    ips = direcciones(args.misma_ip)
+    preparacion = MetricasEtapa(0)
+    resultados = {'preparacion': None, 'etapas': []}
+    try:
+        ctx.anonima = Sesion(conector, args.url, next(ips), timeout=args.timeout)
+        if 'publica' in mezcla:
+            ctx.publica = Sesion(conector, args.url, next(ips), api_key=args.api_key, timeout=args.timeout)
+        if 'estudiante' in mezcla:
+            ctx.estudiantes = await iniciar_sesiones(conector, args, usuarios['Estudiante'], preparacion, ips)
+        if 'bibliotecaria' in mezcla:
+            ctx.bibliotecarias = await iniciar_sesiones(conector, args, usuarios['Bibliotecaria'], preparacion, ips)
+            if not prestamos:
+                print("[WARN] No hay préstamos activos de usuarios sintéticos: bibliotecaria no renovará")
+        resultados['preparacion'] = preparacion.resumen(1, args.slo_ms)['endpoints']
+        for rol, sesiones in (('estudiante', ctx.estudiantes), ('bibliotecaria', ctx.bibliotecarias)):
+            if rol in mezcla and not sesiones:
+                print(f"[WARN] Ninguna sesión de {rol} pudo iniciar; se quita de la mezcla")
+                del mezcla[rol]
+        if not mezcla:
+            print("[ERROR] No queda ningún recorrido para ejecutar")
+            return resultados
+        print(f"[INFO] Sesiones: {len(ctx.estudiantes)} estudiante(s), {len(ctx.bibliotecarias)} bibliotecaria(s)")
+
+        for tasa in args.tasa:
+            resumen = await correr_etapa(ctx, tasa, args, mezcla)
+            resultados['etapas'].append(resumen)
+            p99 = max((r['p99_ms'] or 0 for r in resumen['recorridos'].values()), default=0)
+            print(f"  {tasa:>8.1f}/s -> {resumen['recorridos_por_segundo']:>8.1f} rec/s "
+                  f"{resumen['peticiones_por_segundo']:>9.1f} pet/s  errores {resumen['tasa_errores']:.2%}  "
+                  f"p99 máx {p99:.1f} ms" + (f"  [SATURADA: {', '.join(resumen['motivos'])}]" if resumen['saturada'] else ""))
+            if resumen['saturada'] and not args.todas_las_etapas:
+                break
+    finally:
+        for sesion in [ctx.anonima, ctx.publica] + ctx.estudiantes + ctx.bibliotecarias:
+            if sesion is not None:
+                await sesion.cerrar()
+        await conector.close()
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Prueba de carga de la API de NeoLibro')
+    parser.add_argument('--url', default=URL_POR_DEFECTO, help=f'URL base de la API (por defecto {URL_POR_DEFECTO})')
+    parser.add_argument('--tasa', type=float, nargs='+', default=[10.0],
+                        help='Recorridos por segundo de cada etapa (por defecto 10)')
+    parser.add_argument('--duracion', type=float, default=60, help='Segundos medidos por etapa (por defecto 60)')
+    parser.add_argument('--calentamiento', type=float, default=10, help='Segundos sin medir al inicio de cada etapa')
+    parser.add_argument('--mezcla', default=MEZCLA_POR_DEFECTO, help=f'Pesos de los recorridos ({MEZCLA_POR_DEFECTO})')
+    parser.add_argument('--estudiantes', type=int, default=200, help='Sesiones de estudiante (por defecto 200)')
+    parser.add_argument('--bibliotecarias', type=int, default=10, help='Sesiones de bibliotecaria (por defecto 10)')
+    parser.add_argument('--api-key', default=None, help='Clave para /api/public (recorrido publica)')
+    parser.add_argument('--conexiones', type=int, default=100, help='Conexiones HTTP del pool (por defecto 100)')
+    parser.add_argument('--max-en-vuelo', type=int, default=5000,
+                        help='Recorridos simultáneos máximos; los que excedan se cuentan como descartados')
+    parser.add_argument('--concurrencia-login', type=int, default=20, help='Logins simultáneos al preparar sesiones')
+    parser.add_argument('--timeout', type=float, default=30, help='Segundos máximos por petición')
+    parser.add_argument('--slo-ms', type=float, default=SLO_P99_MS, help=f'p99 máximo aceptable (por defecto {SLO_P99_MS} ms)')
+    parser.add_argument('--misma-ip', action='store_true', help='No variar X-Forwarded-For (mide el rate limiting)')
+    parser.add_argument('--todas-las-etapas', action='store_true', help='Seguir aunque una etapa se sature')
+    parser.add_argument('--semilla', type=int, default=42, help='Semilla de llegadas y elecciones')
+    parser.add_argument('--salida', default=DIRECTORIO_RESULTADOS, help='Directorio del resultado JSON')
+    args = parser.parse_args()
+
+    if aiohttp is None:
+        print("[ERROR] Se necesita aiohttp: pip install aiohttp")
+        sys.exit(1)
+    mezcla = {nombre: peso for nombre, peso in leer_distribucion(args.mezcla).items() if peso > 0}
+    desconocidos = set(mezcla) - set(RECORRIDOS)
+    if desconocidos:
+        parser.error(f"Recorridos desconocidos: {', '.join(sorted(desconocidos))} (válidos: {', '.join(RECORRIDOS)})")
+    if 'publica' in mezcla and not args.api_key:
+        print("[WARN] Sin --api-key no se ejecuta el recorrido publica")
+        del mezcla['publica']
+    if not mezcla:
+        parser.error("La mezcla no tiene ningún recorrido")
+
+    print("="*60)
+    print("PRUEBA DE CARGA DE LA API")
+    print("="*60)
+    try:
+        libros, vocabulario, usuarios, prestamos = leer_datos(args.estudiantes, args.bibliotecarias)
+    except pyodbc.Error as e:
+        print(f"[ERROR] Error de base de datos: {e}")
+        sys.exit(1)
+    if not libros or not vocabulario:
+        print("[ERROR] No hay libros en la base; carga el catálogo con cargar_datos_completos.py")
+        sys.exit(1)
+    print(f"[INFO] {args.url}: {len(libros):,} libros, {len(vocabulario):,} palabras de búsqueda, mezcla {mezcla}")
+
+    inicio = datetime.now()
+    renovados = set()
+    try:
+        resultados = asyncio.run(prueba(args, mezcla, libros, vocabulario, usuarios, prestamos, renovados))
+    finally:
+        try:
+            restaurados = restaurar_prestamos(prestamos, renovados)
+            if restaurados:
+                print(f"[OK] {restaurados:,} préstamo(s) renovados restaurados a su vencimiento original")
+        except pyodbc.Error as e:
+            print(f"[ERROR] No se pudieron restaurar los préstamos renovados {sorted(renovados)}: {e}")
+    etapas = resultados['etapas']
+    aguantaron = [e['tasa_ofrecida'] for e in etapas if not e['saturada']]
+    resultado = {
+        'inicio': inicio.isoformat(timespec='seconds'),
+        'url': args.url,
+        'configuracion': {'mezcla': mezcla, 'duracion': args.duracion, 'calentamiento': args.calentamiento,
+                          'conexiones': args.conexiones, 'slo_ms': args.slo_ms, 'misma_ip': args.misma_ip,
+                          'semilla': args.semilla},
+        'techo_recorridos_por_segundo': max(aguantaron) if aguantaron else None,
+        **resultados,
+    }
+    if not etapas:
+        sys.exit(1)
+    if aguantaron:
+        print(f"[OK] Techo: {max(aguantaron):g} recorridos/s sin saturar")
+    else:
+        print("[WARN] Ya la primera etapa se saturó; prueba con una tasa menor")
+
+    os.makedirs(args.salida, exist_ok=True)
+    archivo = os.path.join(args.salida, f"carga_api_{inicio:%Y%m%d_%H%M%S}.json")
+    escribir_atomico(archivo, json.dumps(resultado, ensure_ascii=False, indent=2))
+    print(f"[GUARDADO] {archivo}")
+
+
+if __name__ == "__main__":
+    main()
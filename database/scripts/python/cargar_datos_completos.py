@@ -9,6 +9,10 @@ Script para cargar TODOS los datos a la base de datos
 - Relaciones Libro-Categoría
 - Ejemplares
 - Limpieza de libros huérfanos (sin ejemplares y sin autores)
+- Jerarquía LCC (clase > subclase > sección) para los reportes por materia
+- Índice de búsqueda del catálogo (data/busqueda/indice_busqueda.bin)
+- Autocompletado del catálogo (data/autocompletado/autocompletado.json)
+- Snapshot binario de solo lectura del catálogo (data/snapshot/catalogo.snap)
 
 FUNCIONALIDADES AUTOMÁTICAS:
 - Elimina autores duplicados similares (diferencias de acentos/mayúsculas)
@@ -23,6 +27,11 @@ import re
 import unicodedata
 import os
 
+from autocompletado import actualizar_autocompletado
+from indice_busqueda import ARCHIVO_INDICE, normalizar_texto, reconstruir_indice
+from jerarquia_lcc import poblar_jerarquia_lcc
+from snapshot_catalogo import exportar_snapshot
+
 def conectar_bd():
     """Conectar a la base de datos con múltiples intentos"""
     # Lista de posibles configuraciones de servidor
@@ -84,10 +93,8 @@ def normalizar_nombre(nombre):
     """Normalizar nombre para comparación de duplicados"""
     if pd.isna(nombre) or nombre is None:
         return ""
-    nombre = str(nombre).lower()
-    nombre = unicodedata.normalize('NFD', nombre).encode('ascii', 'ignore').decode('ascii')
-    nombre = re.sub(r'\s+', ' ', nombre).strip()
-    return nombre
+    # Misma normalización que usa el índice de búsqueda
+    return normalizar_texto(nombre)
 
 def cargar_datos_completos():
     """Cargar todos los datos a la base de datos"""
@@ -565,6 +572,49 @@ def cargar_datos_completos():
         else:
             print("✅ No se encontraron libros huérfanos")
         
+        # 8. JERARQUÍA LCC (clase > subclase > sección) para los reportes por materia
+        print("\n=== JERARQUÍA LCC ===")
+        try:
+            jerarquia = poblar_jerarquia_lcc(conn)
+            print(f"✅ Jerarquía LCC: {jerarquia[0]} insertadas, {jerarquia[1]} actualizadas, {jerarquia[2]} eliminadas")
+        except pyodbc.Error as e:
+            conn.rollback()
+            jerarquia = None
+            print(f"⚠️  No se pudo llenar JerarquiaLCC: {e}")
+            print("   Crea la tabla con scripts/sql/crear_tabla_jerarquia_lcc.sql")
+        
+        # 9. ÍNDICE DE BÚSQUEDA (palabras + trigramas) sobre el catálogo recién cargado
+        print("\n=== ÍNDICE DE BÚSQUEDA ===")
+        try:
+            libros_indexados, tamano_indice = reconstruir_indice(conn)
+            print(f"✅ Índice de búsqueda: {libros_indexados} libros, {tamano_indice:,} bytes")
+        except (pyodbc.Error, OSError) as e:
+            libros_indexados = None
+            print(f"⚠️  No se pudo construir el índice de búsqueda: {e}")
+            print("   Reintenta con: python indice_busqueda.py")
+        
+        # 10. AUTOCOMPLETADO (solo relee los libros cuya huella cambió)
+        print("\n=== AUTOCOMPLETADO ===")
+        try:
+            autocompletado = actualizar_autocompletado(conn)
+            print(f"✅ Autocompletado: {autocompletado['cambiados']} libros cambiados, "
+                  f"{autocompletado['eliminados']} eliminados")
+        except (pyodbc.Error, OSError) as e:
+            print(f"⚠️  No se pudo generar el autocompletado: {e}")
+            print("   Reintenta con: python autocompletado.py --completo")
+        
+        # 11. SNAPSHOT DEL CATÁLOGO para los consumidores de solo lectura
+        print("\n=== SNAPSHOT DEL CATÁLOGO ===")
+        try:
+            escrito, version_snapshot, tamano_snapshot = exportar_snapshot(conn)
+            if escrito:
+                print(f"✅ Snapshot {version_snapshot}: {tamano_snapshot:,} bytes")
+            else:
+                print(f"✅ Snapshot {version_snapshot} sin cambios")
+        except (pyodbc.Error, OSError) as e:
+            print(f"⚠️  No se pudo exportar el snapshot: {e}")
+            print("   Reintenta con: python snapshot_catalogo.py")
+        
         print("\n=== RESUMEN FINAL ===")
         print(f"[OK] Autores: {len(autores_dict)}")
         print(f"[OK] Categorías: {len(categorias_dict)}")
@@ -572,6 +622,11 @@ def cargar_datos_completos():
         print(f"[OK] Relaciones libro-autor: {relaciones_libro_autor}")
         print(f"[OK] Relaciones libro-categoría: {relaciones_libro_categoria}")
         print(f"[OK] Ejemplares: {ejemplares_creados}")
+        if jerarquia:
+            cursor.execute("SELECT COUNT(*) FROM JerarquiaLCC")
+            print(f"[OK] Jerarquía LCC: {cursor.fetchone()[0]} libros clasificados")
+        if libros_indexados is not None:
+            print(f"[OK] Índice de búsqueda: {libros_indexados} libros en {ARCHIVO_INDICE}")
         
         # Verificar algunos ejemplos
         print("\n=== VERIFICACIÓN FINAL ===")
@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tabla de códigos de barras para validar en las estaciones de escaneo sin consultar la base
+- Exporta Ejemplares.CodigoBarras + Estado a un archivo binario compacto:
+  una tabla hash de direccionamiento abierto (sondeo lineal) con una
+  entrada de 8 bytes por ranura: 56 bits de huella del código (BLAKE2b) y
+  8 bits de estado. Ocupa ~16 bytes por ejemplar y no guarda los códigos
+- La biblioteca de consulta (TablaCodigos) abre el archivo con mmap y
+  resuelve cada código en microsegundos sin pyodbc ni red; una huella
+  repetida entre dos códigos distintos tiene probabilidad ~n/2^56
+- Refresco incremental: la cabecera guarda la marca de agua
+  (MIN_ACTIVE_ROWVERSION) y solo se leen los ejemplares con VersionFila
+  posterior. rowversion no registra borrados ni el código anterior de un
+  ejemplar corregido, así que la cabecera guarda también el último
+  EjemplarID y una huella (CHECKSUM_AGG de EjemplarID + CodigoBarras) de
+  los ejemplares hasta ese ID. Se reconstruye todo si hay menos ejemplares
+  que antes, si esa huella cambió (un borrado compensado con altas, un
+  código corregido), si la tabla se llena o con --completo
+
+Uso:
+    python codigos_ejemplares.py                        # refresco incremental (o completo la primera vez)
+    python codigos_ejemplares.py --completo
+    python codigos_ejemplares.py --consultar FISI000042001
+
+Desde la estación:
+    from codigos_ejemplares import TablaCodigos
+    with TablaCodigos('codigos.bin') as tabla:
+        tabla.estado('FISI000042001')   # 'Disponible', 'Prestado', ... o None si no existe
+        tabla.recargar()                # reabre si el archivo fue reemplazado
+
+El refresco incremental requiere scripts/sql/crear_disponibilidad_libros.sql (VersionFila)
+"""
+
+import argparse
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+from hashlib import blake2b
+
+try:
+    import pyodbc
+except ImportError:  # las estaciones solo usan TablaCodigos
+    pyodbc = None
+
+ARCHIVO_CODIGOS = os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'codigos', 'codigos.bin')
+
+MAGIA = b'CODB'
+FORMATO = 2
+# magia, formato, códigos, filas en Ejemplares, ranuras, generado (epoch), marca de agua,
+# último EjemplarID y huella de los ejemplares hasta ese ID
+CABECERA = struct.Struct('<4sHxxIIIq8sIi')
+ENTRADA = struct.Struct('<Q')
+
+# Carga al construir y carga a partir de la cual se reconstruye con más ranuras
+CARGA_INICIAL = 0.5
+CARGA_MAXIMA = 0.75
+
+# Código de estado en los 8 bits bajos de cada entrada (0 = ranura vacía)
+ESTADOS = ['', 'Disponible', 'Prestado', 'Reservado', 'Reparacion', 'Extraviado', 'Baja', 'SinEstado']
+CODIGO_ESTADO = {estado: i for i, estado in enumerate(ESTADOS) if estado}
+
+TAMANO_LOTE = 50000
+
+# Con ? = último EjemplarID del archivo: huella de los ejemplares que ya existían y de todos
+ESTADO_EJEMPLARES = """
+    SELECT MIN_ACTIVE_ROWVERSION(), COUNT(*), MAX(EjemplarID),
+           CHECKSUM_AGG(CASE WHEN EjemplarID <= ? THEN BINARY_CHECKSUM(EjemplarID, CodigoBarras) END),
+           CHECKSUM_AGG(BINARY_CHECKSUM(EjemplarID, CodigoBarras))
+    FROM Ejemplares
+"""
+
+
+def normalizar_codigo(codigo):
+    return codigo.strip().upper()
+
+
+def huella(codigo):
+    """56 bits de BLAKE2b del código normalizado, nunca 0"""
+    valor = int.from_bytes(blake2b(normalizar_codigo(codigo).encode('utf-8'), digest_size=8).digest(), 'little')
+    return (valor >> 8) or 1
+
+
+def ranuras_para(cantidad):
+    ranuras = 1024
+    while ranuras * CARGA_INICIAL < cantidad:
+        ranuras *= 2
+    return ranuras
+
+
+def poner(tabla, mascara, codigo, estado):
+    """Insertar o actualizar; devuelve True si el código es nuevo"""
+    h = huella(codigo)
+    entrada = (h << 8) | CODIGO_ESTADO.get(estado, CODIGO_ESTADO['SinEstado'])
+    i = h & mascara
+    while True:
+        actual = tabla[i]
+        if actual == 0:
+            tabla[i] = entrada
+            return True
+        if actual >> 8 == h:
+            tabla[i] = entrada
+            return False
+        i = (i + 1) & mascara
+
+
+def construir(filas, ranuras):
+    """array('Q') con los (código, estado) de filas; devuelve (tabla, cantidad)"""
+    tabla = array('Q', bytes(ranuras * ENTRADA.size))
+    mascara = ranuras - 1
+    cantidad = 0
+    for codigo, estado in filas:
+        cantidad += poner(tabla, mascara, codigo, estado)
+    return tabla, cantidad
+
+
+def leer_cabecera(archivo):
+    with open(archivo, 'rb') as f:
+        datos = f.read(CABECERA.size)
+    if len(datos) < CABECERA.size:
+        return None
+    cabecera = CABECERA.unpack(datos)
+    return cabecera if cabecera[0] == MAGIA and cabecera[1] == FORMATO else None
+
+
+def leer_codigos(cursor, consulta, *parametros):
+    cursor.execute(consulta, *parametros)
+    while True:
+        lote = cursor.fetchmany(TAMANO_LOTE)
+        if not lote:
+            break
+        for codigo, estado in lote:
+            if codigo:
+                yield codigo, estado
+
+
+def exportar_codigos(conn, archivo=ARCHIVO_CODIGOS, completo=False):
+    """Refrescar el archivo de códigos; devuelve {'modo', 'codigos', 'cambios', 'version'}"""
+    from generar_reportes import escribir_atomico
+
+    cursor = conn.cursor()
+    anterior = leer_cabecera(archivo) if os.path.exists(archivo) else None
+    cursor.execute(ESTADO_EJEMPLARES, anterior[7] if anterior else 0)
+    nueva, filas, maximo, huella_previos, huella_actual = cursor.fetchone()
+    nueva = bytes(nueva)
+
+    cambios = 0
+    # rowversion no registra borrados ni códigos reemplazados: si hay menos ejemplares
+    # o cambió la huella de los que ya estaban en el archivo, reconstruir
+    if not completo and anterior is not None and filas >= anterior[3] and (huella_previos or 0) == anterior[8]:
+        _, _, cantidad, _, ranuras, _, marca, _, _ = anterior
+        if marca == nueva:
+            return {'modo': 'sin cambios', 'codigos': cantidad, 'cambios': 0, 'version': nueva.hex()}
+        tabla = array('Q')
+        with open(archivo, 'rb') as f:
+            f.seek(CABECERA.size)
+            tabla.frombytes(f.read(ranuras * ENTRADA.size))
+        cambiados = list(leer_codigos(cursor, """
+            SELECT CodigoBarras, Estado FROM Ejemplares
+            WHERE VersionFila >= ? AND VersionFila < ?
+        """, marca, nueva))
+        if (cantidad + len(cambiados)) <= ranuras * CARGA_MAXIMA:
+            modo = 'incremental'
+            mascara = ranuras - 1
+            for codigo, estado in cambiados:
+                cantidad += poner(tabla, mascara, codigo, estado)
+            cambios = len(cambiados)
+        else:
+            tabla = None
+    else:
+        tabla = None
+
+    if tabla is None:
+        modo = 'completo'
+        ranuras = ranuras_para(filas)
+        tabla, cantidad = construir(leer_codigos(cursor, "SELECT CodigoBarras, Estado FROM Ejemplares"), ranuras)
+        cambios = cantidad
+
+    if sys.byteorder != 'little':
+        tabla.byteswap()
+    os.makedirs(os.path.dirname(os.path.abspath(archivo)), exist_ok=True)
+    escribir_atomico(archivo, CABECERA.pack(MAGIA, FORMATO, cantidad, filas, ranuras, int(time.time()), nueva,
+                                            maximo or 0, huella_actual or 0) + tabla.tobytes())
+    return {'modo': modo, 'codigos': cantidad, 'cambios': cambios, 'version': nueva.hex()}
+
+
+class TablaCodigos:
+    """Consulta local de códigos de barras sobre el archivo exportado (mmap)"""
+
+    def __init__(self, archivo=ARCHIVO_CODIGOS):
+        self.archivo = archivo
+        self.mapa = None
+        self.abrir()
+
+    def abrir(self):
+        with open(self.archivo, 'rb') as f:
+            mapa = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        cabecera = CABECERA.unpack_from(mapa)
+        if cabecera[0] != MAGIA or cabecera[1] != FORMATO:
+            mapa.close()
+            raise ValueError(f"{self.archivo} no es una tabla de códigos (formato {FORMATO})")
+        if self.mapa is not None:
+            self.mapa.close()
+        self.mapa = mapa
+        _, _, self.cantidad, _, ranuras, self.generado, self.marca, _, _ = cabecera
+        self.mascara = ranuras - 1
+
+    @property
+    def version(self):
+        return self.marca.hex()
+
+    def vigente(self):
+        """False si el archivo en disco ya es otra versión"""
+        cabecera = leer_cabecera(self.archivo) if os.path.exists(self.archivo) else None
+        return cabecera is not None and cabecera[6] == self.marca and cabecera[5] == self.generado
+
+    def recargar(self):
+        """Reabrir si el exportador reemplazó el archivo; devuelve True si se recargó"""
+        if self.vigente():
+            return False
+        self.abrir()
+        return True
+
+    def estado(self, codigo):
+        """Estado del ejemplar, o None si el código no existe"""
+        h = huella(codigo)
+        i = h & self.mascara
+        while True:
+            entrada = ENTRADA.unpack_from(self.mapa, CABECERA.size + i * ENTRADA.size)[0]
+            if entrada == 0:
+                return None
+            if entrada >> 8 == h:
+                return ESTADOS[entrada & 0xFF] if (entrada & 0xFF) < len(ESTADOS) else 'SinEstado'
+            i = (i + 1) & self.mascara
+
+    def disponible(self, codigo):
+        return self.estado(codigo) == 'Disponible'
+
+    def __contains__(self, codigo):
+        return self.estado(codigo) is not None
+
+    def __len__(self):
+        return self.cantidad
+
+    def cerrar(self):
+        self.mapa.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.cerrar()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Exportar o consultar la tabla de códigos de barras')
+    parser.add_argument('--archivo', default=ARCHIVO_CODIGOS, help='Archivo de la tabla')
+    parser.add_argument('--completo', action='store_true', help='Reconstruir la tabla completa')
+    parser.add_argument('--consultar', nargs='+', default=None, metavar='CODIGO', help='Consultar códigos en la tabla')
+    args = parser.parse_args()
+
+    if args.consultar:
+        if not os.path.exists(args.archivo):
+            print(f"[ERROR] No existe {args.archivo}; expórtalo con: python codigos_ejemplares.py")
+            sys.exit(1)
+        with TablaCodigos(args.archivo) as tabla:
+            print(f"[INFO] {len(tabla):,} códigos, versión {tabla.version}")
+            for codigo in args.consultar:
+                inicio = time.perf_counter()
+                estado = tabla.estado(codigo)
+                micro = (time.perf_counter() - inicio) * 1e6
+                print(f"  {codigo:<16} {estado or 'NO EXISTE':<12} ({micro:.1f} µs)")
+        return
+
+    print("="*60)
+    print("TABLA DE CÓDIGOS DE BARRAS")
+    print("="*60)
+    if pyodbc is None:
+        print("[ERROR] Para exportar se necesita pyodbc")
+        sys.exit(1)
+    from generar_reportes import conectar_bd
+
+    conn = conectar_bd()
+    try:
+        inicio = time.perf_counter()
+        resultado = exportar_codigos(conn, args.archivo, args.completo)
+    except pyodbc.Error as e:
+        print(f"[ERROR] Error de base de datos: {e}")
+        sys.exit(1)
+    finally:
+        conn.close()
+
+    if resultado['modo'] == 'sin cambios':
+        print(f"[INFO] Sin cambios desde la versión {resultado['version']}")
+    else:
+        print(f"[GUARDADO] {args.archivo} ({resultado['modo']}: {resultado['cambios']:,} códigos leídos, "
+              f"{resultado['codigos']:,} en total, {time.perf_counter() - inicio:.2f} s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,384 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Despachador de notificaciones por correo (cola en la tabla Notificaciones)
+- Reclama lotes con UPDLOCK + READPAST: varios workers pueden correr a la vez
+  sin tomar las mismas filas ni bloquearse entre sí
+- Cada fila reclamada queda 'Enviando' con un plazo (ProximoIntento); si el
+  worker muere, otro la retoma cuando vence el plazo
+- Los envíos de un lote salen en paralelo con concurrencia acotada
+- Las enviadas se marcan en bloque; las fallidas se reintentan con espera
+  exponencial hasta --max-intentos y luego quedan 'Fallida'
+- Métricas de rendimiento (enviadas/s, latencia p50/p95 del transporte) en
+  data/notificaciones/metricas_<host>_<pid>.json, actualizadas en cada lote
+
+Transportes:
+    archivo   una línea JSON por correo en data/notificaciones/envios.jsonl
+              (sustituto local para pruebas; --latencia-ms simula la red)
+    smtp      smtplib, una conexión por hilo (--smtp-host, --smtp-puerto, ...)
+
+Uso:
+    python despachador_notificaciones.py                         # vaciar la cola y terminar
+    python despachador_notificaciones.py --continuo --espera 5   # worker permanente
+    python despachador_notificaciones.py --transporte smtp --smtp-host localhost --smtp-puerto 1025
+
+Requiere scripts/sql/crear_envio_notificaciones.sql
+"""
+
+import argparse
+import json
+import os
+import smtplib
+import socket
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from email.message import EmailMessage
+
+import pyodbc
+
+from generar_reportes import conectar_bd, escribir_atomico
+
+DIRECTORIO_SALIDA = os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'notificaciones')
+
+TAMANO_LOTE = 200
+CONCURRENCIA = 8
+MAX_INTENTOS = 5
+# Plazo de una fila reclamada antes de que otro worker pueda retomarla (segundos)
+PLAZO_RECLAMO = 300
+# Espera antes del primer reintento; se duplica en cada intento (segundos)
+ESPERA_REINTENTO = 60
+# SQL Server admite 2100 parámetros por consulta
+MAXIMO_PARAMETROS = 1000
+MUESTRAS_LATENCIA = 10000
+
+# Tipos que crean el backend, barrido_reservas.py y motor_multas.py
+ASUNTOS = {
+    'ReservaCreada': 'Reserva registrada',
+    'ReservaColaEspera': 'Estás en la cola de espera',
+    'ReservaAprobada': 'Tu reserva fue aprobada',
+    'ReservaRechazada': 'Tu reserva fue rechazada',
+    'ReservaExpirada': 'Tu reserva expiró',
+    'PrestamoCreado': 'Préstamo registrado',
+    'LibroDisponibleCola': 'Tu libro en cola ya está disponible',
+    'MultaGenerada': 'Se generó una multa',
+}
+ASUNTO_POR_DEFECTO = 'Notificación de la biblioteca'
+
+RECLAMAR_LOTE = """
+    SET NOCOUNT ON;
+    DECLARE @lote TABLE (
+        NotificacionID INT PRIMARY KEY, UsuarioID INT, Tipo NVARCHAR(50),
+        Mensaje NVARCHAR(500), FechaCreacion DATETIME2, IntentosEnvio INT
+    );
+    WITH cola AS (
+        SELECT TOP (?) NotificacionID, UsuarioID, Tipo, Mensaje, FechaCreacion,
+               EstadoEnvio, IntentosEnvio, ProximoIntento
+        FROM Notificaciones WITH (UPDLOCK, READPAST, ROWLOCK)
+        WHERE EstadoEnvio IN ('Pendiente', 'Enviando')
+          AND (ProximoIntento IS NULL OR ProximoIntento <= SYSDATETIME())
+        ORDER BY NotificacionID
+    )
+    UPDATE cola
+    SET EstadoEnvio = 'Enviando', IntentosEnvio = IntentosEnvio + 1,
+        ProximoIntento = DATEADD(SECOND, ?, SYSDATETIME())
+    OUTPUT inserted.NotificacionID, inserted.UsuarioID, inserted.Tipo, inserted.Mensaje,
+           inserted.FechaCreacion, inserted.IntentosEnvio
+    INTO @lote;
+
+    SELECT l.NotificacionID, l.Tipo, l.Mensaje, l.FechaCreacion, l.IntentosEnvio,
+           u.Nombre, u.EmailInstitucional
+    FROM @lote l
+    LEFT JOIN Usuarios u ON l.UsuarioID = u.UsuarioID
+    ORDER BY l.NotificacionID;
+"""
+
+# La condición EstadoEnvio = 'Enviando' evita pisar una fila que otro worker ya retomó
+MARCAR_ENVIADAS = """
+    UPDATE Notificaciones
+    SET EstadoEnvio = 'Enviada', FechaEnvio = SYSDATETIME(), ProximoIntento = NULL, ErrorEnvio = NULL
+    WHERE EstadoEnvio = 'Enviando' AND NotificacionID IN ({marcadores})
+"""
+
+MARCAR_FALLIDA = """
+    UPDATE Notificaciones
+    SET EstadoEnvio = CASE WHEN IntentosEnvio >= ? THEN 'Fallida' ELSE 'Pendiente' END,
+        ProximoIntento = DATEADD(SECOND, ?, SYSDATETIME()),
+        ErrorEnvio = LEFT(?, 200)
+    WHERE NotificacionID = ? AND EstadoEnvio = 'Enviando'
+"""
+
+
+class ErrorPermanente(Exception):
+    """Fallo que no se arregla reintentando (destinatario inválido o inexistente)"""
+
+
+class TransporteArchivo:
+    """Escribe cada correo como una línea JSON; sustituto local del SMTP"""
+
+    def __init__(self, archivo, latencia_ms=0):
+        self.archivo = archivo
+        self.latencia = latencia_ms / 1000
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(archivo)), exist_ok=True)
+        self.salida = open(archivo, 'a', encoding='utf-8')
+
+    def enviar(self, correo):
+        if self.latencia:
+            time.sleep(self.latencia)
+        linea = json.dumps({**correo, 'enviado': datetime.now().isoformat(timespec='seconds')}, ensure_ascii=False)
+        with self.lock:
+            self.salida.write(linea + '\n')
+            self.salida.flush()
+
+    def cerrar(self):
+        self.salida.close()
+
+
+class TransporteSmtp:
+    """smtplib con una conexión reutilizada por hilo"""
+
+    def __init__(self, host, puerto, remitente, usuario=None, contrasena=None, tls=False):
+        self.host, self.puerto, self.remitente = host, puerto, remitente
+        self.usuario, self.contrasena, self.tls = usuario, contrasena, tls
+        self.local = threading.local()
+        self.conexiones = []
+        self.lock = threading.Lock()
+
+    def conexion(self):
+        smtp = getattr(self.local, 'smtp', None)
+        if smtp is None:
+            smtp = smtplib.SMTP(self.host, self.puerto, timeout=30)
+            if self.tls:
+                smtp.starttls()
+            if self.usuario:
+                smtp.login(self.usuario, self.contrasena)
+            self.local.smtp = smtp
+            with self.lock:
+                self.conexiones.append(smtp)
+        return smtp
+
+    def enviar(self, correo):
+        mensaje = EmailMessage()
+        mensaje['From'] = self.remitente
+        mensaje['To'] = correo['para']
+        mensaje['Subject'] = correo['asunto']
+        mensaje['Message-ID'] = f"<notificacion-{correo['id']}@{self.remitente.split('@')[-1]}>"
+        mensaje.set_content(correo['cuerpo'])
+        try:
+            self.conexion().send_message(mensaje)
+        except smtplib.SMTPRecipientsRefused as e:
+            raise ErrorPermanente(f"Destinatario rechazado: {correo['para']}") from e
+        except (smtplib.SMTPServerDisconnected, OSError):
+            # Conexión caída: la siguiente llamada de este hilo abre otra
+            self.local.smtp = None
+            raise
+
+    def cerrar(self):
+        for smtp in self.conexiones:
+            try:
+                smtp.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+
+
+def crear_transporte(args):
+    if args.transporte == 'smtp':
+        return TransporteSmtp(args.smtp_host, args.smtp_puerto, args.remitente,
+                              args.smtp_usuario, os.environ.get('SMTP_CONTRASENA'), args.smtp_tls)
+    return TransporteArchivo(args.archivo or os.path.join(DIRECTORIO_SALIDA, 'envios.jsonl'), args.latencia_ms)
+
+
+class MetricasEnvio:
+    """Contadores y latencias del transporte, seguros entre hilos"""
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.lock = threading.Lock()
+        self.enviadas = self.fallidas = self.reintentos = self.lotes = 0
+        self.latencias = deque(maxlen=MUESTRAS_LATENCIA)
+
+    def registrar(self, segundos):
+        with self.lock:
+            self.latencias.append(segundos)
+
+    def resumen(self):
+        with self.lock:
+            latencias = sorted(self.latencias)
+        transcurrido = time.perf_counter() - self.inicio
+
+        def percentil(p):
+            return round(latencias[min(len(latencias) - 1, int(p / 100 * len(latencias)))] * 1000, 2) if latencias else None
+
+        return {
+            'worker': f"{socket.gethostname()}:{os.getpid()}",
+            'actualizado': datetime.now().isoformat(timespec='seconds'),
+            'segundos': round(transcurrido, 2),
+            'lotes': self.lotes,
+            'enviadas': self.enviadas,
+            'fallidas': self.fallidas,
+            'reintentos': self.reintentos,
+            'enviadas_por_segundo': round(self.enviadas / transcurrido, 2) if transcurrido else 0,
+            'latencia_p50_ms': percentil(50),
+            'latencia_p95_ms': percentil(95),
+        }
+
+
+def reclamar_lote(conn, tamano, plazo):
+    """Reclamar hasta `tamano` notificaciones; se confirma enseguida para soltar los bloqueos"""
+    cursor = conn.cursor()
+    cursor.execute(RECLAMAR_LOTE, tamano, plazo)
+    filas = cursor.fetchall()
+    conn.commit()
+    return filas
+
+
+def renderizar(fila):
+    """Fila reclamada -> correo (dict)"""
+    notificacion_id, tipo, mensaje, fecha, intentos, nombre, email = fila
+    cuerpo = (f"Hola {nombre or 'usuario'},\n\n{mensaje}\n\n"
+              f"Fecha: {fecha:%d/%m/%Y %H:%M}\n\n"
+              "Biblioteca FISI - este es un mensaje automático, no respondas a este correo.")
+    return {
+        'id': notificacion_id,
+        'intentos': intentos,
+        'para': email,
+        'asunto': ASUNTOS.get(tipo, ASUNTO_POR_DEFECTO),
+        'cuerpo': cuerpo,
+    }
+
+
+def enviar_uno(transporte, metricas, correo):
+    """Devuelve None si se envió, o (permanente, mensaje de error)"""
+    if not correo['para']:
+        return True, 'Usuario sin correo institucional'
+    inicio = time.perf_counter()
+    try:
+        transporte.enviar(correo)
+    except ErrorPermanente as e:
+        return True, str(e)
+    except Exception as e:
+        return False, f"{type(e).__name__}: {e}"
+    finally:
+        metricas.registrar(time.perf_counter() - inicio)
+    return None
+
+
+def registrar_resultados(conn, correos, resultados, max_intentos):
+    """Marcar enviadas en bloque y fallidas con su reintento; devuelve (enviadas, fallidas, reintentos)"""
+    cursor = conn.cursor()
+    enviadas = [c['id'] for c, r in zip(correos, resultados) if r is None]
+    for i in range(0, len(enviadas), MAXIMO_PARAMETROS):
+        bloque = enviadas[i:i + MAXIMO_PARAMETROS]
+        cursor.execute(MARCAR_ENVIADAS.format(marcadores=', '.join('?' * len(bloque))), *bloque)
+
+    fallos = []
+    reintentos = 0
+    for correo, resultado in zip(correos, resultados):
+        if resultado is None:
+            continue
+        permanente, error = resultado
+        limite = 0 if permanente else max_intentos
+        if correo['intentos'] < limite:
+            reintentos += 1
+        espera = ESPERA_REINTENTO * 2 ** (correo['intentos'] - 1)
+        fallos.append((limite, espera, error, correo['id']))
+    if fallos:
+        cursor.executemany(MARCAR_FALLIDA, fallos)
+    conn.commit()
+    return len(enviadas), len(fallos) - reintentos, reintentos
+
+
+def procesar_lote(conn, transporte, executor, metricas, args):
+    """Reclamar, enviar y registrar un lote; devuelve cuántas filas se reclamaron"""
+    filas = reclamar_lote(conn, args.lote, PLAZO_RECLAMO)
+    if not filas:
+        return 0
+    correos = [renderizar(fila) for fila in filas]
+    resultados = list(executor.map(lambda correo: enviar_uno(transporte, metricas, correo), correos))
+    enviadas, fallidas, reintentos = registrar_resultados(conn, correos, resultados, args.max_intentos)
+    with metricas.lock:
+        metricas.lotes += 1
+        metricas.enviadas += enviadas
+        metricas.fallidas += fallidas
+        metricas.reintentos += reintentos
+    return len(filas)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Enviar por correo las notificaciones pendientes')
+    parser.add_argument('--lote', type=int, default=TAMANO_LOTE, help=f'Notificaciones por lote (por defecto {TAMANO_LOTE})')
+    parser.add_argument('--concurrencia', type=int, default=CONCURRENCIA,
+                        help=f'Envíos simultáneos (por defecto {CONCURRENCIA})')
+    parser.add_argument('--max-intentos', type=int, default=MAX_INTENTOS,
+                        help=f'Intentos antes de marcar Fallida (por defecto {MAX_INTENTOS})')
+    parser.add_argument('--continuo', action='store_true', help='No terminar cuando la cola queda vacía')
+    parser.add_argument('--espera', type=float, default=5, help='Segundos entre consultas con la cola vacía')
+    parser.add_argument('--transporte', choices=['archivo', 'smtp'], default='archivo')
+    parser.add_argument('--archivo', default=None, help='Destino del transporte archivo')
+    parser.add_argument('--latencia-ms', type=int, default=0, help='Latencia simulada del transporte archivo')
+    parser.add_argument('--smtp-host', default='localhost')
+    parser.add_argument('--smtp-puerto', type=int, default=25)
+    parser.add_argument('--smtp-usuario', default=None, help='La contraseña se lee de SMTP_CONTRASENA')
+    parser.add_argument('--smtp-tls', action='store_true', help='Usar STARTTLS')
+    parser.add_argument('--remitente', default='biblioteca@unmsm.edu.pe')
+    parser.add_argument('--metricas', default=None, help='Archivo JSON de métricas')
+    args = parser.parse_args()
+    if args.lote < 1 or args.concurrencia < 1 or args.max_intentos < 1:
+        parser.error("--lote, --concurrencia y --max-intentos deben ser mayores que 0")
+    archivo_metricas = args.metricas or os.path.join(
+        DIRECTORIO_SALIDA, f"metricas_{socket.gethostname()}_{os.getpid()}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(archivo_metricas)), exist_ok=True)
+
+    print("="*60)
+    print("DESPACHADOR DE NOTIFICACIONES")
+    print("="*60)
+    print(f"  Transporte: {args.transporte}, lote {args.lote}, concurrencia {args.concurrencia}")
+
+    metricas = MetricasEnvio()
+    transporte = crear_transporte(args)
+    executor = ThreadPoolExecutor(max_workers=args.concurrencia, thread_name_prefix='envio')
+    conn = conectar_bd()
+    try:
+        while True:
+            try:
+                reclamadas = procesar_lote(conn, transporte, executor, metricas, args)
+            except pyodbc.Error as e:
+                print(f"[ERROR] Error de base de datos: {e}")
+                if not args.continuo:
+                    print("[INFO] ¿Se ejecutó scripts/sql/crear_envio_notificaciones.sql?")
+                    sys.exit(1)
+                # Lo reclamado y no registrado se retoma al vencer el plazo
+                time.sleep(args.espera)
+                conn.close()
+                conn = conectar_bd()
+                continue
+            if reclamadas:
+                resumen = metricas.resumen()
+                escribir_atomico(archivo_metricas, json.dumps(resumen, indent=2))
+                print(f"[INFO] Lote {resumen['lotes']}: {reclamadas} reclamadas | total {resumen['enviadas']:,} enviadas, "
+                      f"{resumen['reintentos']:,} reintentos, {resumen['fallidas']:,} fallidas | "
+                      f"{resumen['enviadas_por_segundo']}/s, p95 {resumen['latencia_p95_ms']} ms")
+            elif args.continuo:
+                time.sleep(args.espera)
+            else:
+                break
+    except KeyboardInterrupt:
+        print("\n[INFO] Detenido por el usuario")
+    finally:
+        executor.shutdown(wait=True)
+        transporte.cerrar()
+        conn.close()
+
+    resumen = metricas.resumen()
+    escribir_atomico(archivo_metricas, json.dumps(resumen, indent=2))
+    print(f"\n[OK] {resumen['enviadas']:,} enviadas, {resumen['reintentos']:,} para reintentar, "
+          f"{resumen['fallidas']:,} fallidas en {resumen['segundos']} s ({resumen['enviadas_por_segundo']}/s)")
+    print(f"[GUARDADO] {archivo_metricas}")
+
+
+if __name__ == "__main__":
+    main()
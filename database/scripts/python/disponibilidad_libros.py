@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Mantenimiento de la disponibilidad precalculada (tabla DisponibilidadLibros)
+- VistaDisponibilidadLibros agrupa todos los Ejemplares en cada lectura;
+  este job guarda los totales por libro en DisponibilidadLibros
+- Solo se recalculan los libros con ejemplares cambiados desde la última
+  marca de agua (Ejemplares.VersionFila, rowversion) y los libros nuevos
+- rowversion no registra borrados ni de qué libro salió un ejemplar: se
+  guarda también el último EjemplarID y una huella (CHECKSUM_AGG de
+  EjemplarID + LibroID) de los ejemplares hasta ese ID. Si hay menos
+  ejemplares o la huella de los que ya existían cambió (borrado, aunque se
+  haya compensado con altas, o cambio de libro) se reconstruye todo
+- Exporta un mapa de disponibilidad para las cachés del front-end:
+    disponibilidad.json  {"version", "generado", "libros": {"LibroID": [total, disponibles]}}
+    disponibilidad.bin   cabecera '<4sHI8s' (b'DISP', formato, cantidad, versión)
+                         + una entrada '<IHH' (LibroID, total, disponibles) por
+                         libro, ordenadas por LibroID (búsqueda binaria)
+
+Uso:
+    python disponibilidad_libros.py                  # refresco incremental + exportación
+    python disponibilidad_libros.py --completo       # recalcular todos los libros
+    python disponibilidad_libros.py --intervalo 60   # repetir cada 60 segundos
+
+Requiere scripts/sql/crear_disponibilidad_libros.sql
+"""
+
+import argparse
+import json
+import os
+import struct
+import sys
+import time
+from datetime import datetime
+
+import pyodbc
+
+from generar_reportes import conectar_bd, escribir_atomico
+
+DIRECTORIO_SALIDA = os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'disponibilidad')
+
+PROCESO = 'DisponibilidadLibros'
+
+ARCHIVOS_MAPA = {'json': 'disponibilidad.json', 'binario': 'disponibilidad.bin'}
+
+CABECERA_BINARIA = struct.Struct('<4sHI8s')
+ENTRADA_BINARIA = struct.Struct('<IHH')
+FORMATO_BINARIO = 1
+
+# Espera antes de reconectar en modo --intervalo (segundos)
+ESPERA_RECONEXION = 30
+
+# Totales por libro con el mismo criterio que VistaDisponibilidadLibros (sin 'Baja'),
+# pero un libro sin ejemplares activos queda con 0 en lugar de desaparecer
+MERGE_DISPONIBILIDAD = """
+    MERGE DisponibilidadLibros WITH (HOLDLOCK) AS d
+    USING (
+        SELECT l.LibroID,
+               COUNT(e.EjemplarID) AS Total,
+               COUNT(CASE WHEN e.Estado = 'Disponible' THEN 1 END) AS Disponibles
+        FROM Libros l
+        LEFT JOIN Ejemplares e ON e.LibroID = l.LibroID AND (e.Estado <> 'Baja' OR e.Estado IS NULL)
+        {filtro}
+        GROUP BY l.LibroID
+    ) AS s ON d.LibroID = s.LibroID
+    WHEN MATCHED AND (d.TotalEjemplares <> s.Total OR d.EjemplaresDisponibles <> s.Disponibles) THEN
+        UPDATE SET TotalEjemplares = s.Total, EjemplaresDisponibles = s.Disponibles, FechaActualizacion = GETDATE()
+    WHEN NOT MATCHED BY TARGET THEN
+        INSERT (LibroID, TotalEjemplares, EjemplaresDisponibles) VALUES (s.LibroID, s.Total, s.Disponibles)
+    {borrar};
+"""
+
+# Con ? = último EjemplarID de la marca anterior: la huella de los ejemplares
+# que ya existían se compara con la guardada; la de todos queda para la siguiente
+ESTADO_EJEMPLARES = """
+    SELECT MIN_ACTIVE_ROWVERSION(), COUNT(*), MAX(EjemplarID),
+           CHECKSUM_AGG(CASE WHEN EjemplarID <= ? THEN BINARY_CHECKSUM(EjemplarID, LibroID) END),
+           CHECKSUM_AGG(BINARY_CHECKSUM(EjemplarID, LibroID))
+    FROM Ejemplares
+"""
+
+FILTRO_INCREMENTAL = """
+        WHERE l.LibroID IN (SELECT LibroID FROM Ejemplares WHERE VersionFila >= ? AND VersionFila < ?)
+           OR NOT EXISTS (SELECT 1 FROM DisponibilidadLibros x WHERE x.LibroID = l.LibroID)
+"""
+
+
+def leer_marca(cursor, proceso):
+    """(versión, filas, último EjemplarID, huella) guardados para el proceso, o Nones"""
+    cursor.execute("SELECT Version, Filas, UltimoID, Huella FROM MarcasAgua WHERE Proceso = ?", proceso)
+    row = cursor.fetchone()
+    if not row:
+        return None, None, None, None
+    return (bytes(row[0]) if row[0] is not None else None, row[1], row[2], row[3])
+
+
+def guardar_marca(cursor, proceso, version, filas, ultimo_id, huella):
+    cursor.execute("""
+        UPDATE MarcasAgua SET Version = ?, Filas = ?, UltimoID = ?, Huella = ?, FechaActualizacion = GETDATE()
+        WHERE Proceso = ?
+    """, version, filas, ultimo_id, huella, proceso)
+    if cursor.rowcount == 0:
+        cursor.execute("INSERT INTO MarcasAgua (Proceso, Version, Filas, UltimoID, Huella) VALUES (?, ?, ?, ?, ?)",
+                       proceso, version, filas, ultimo_id, huella)
+
+
+def actualizar_disponibilidad(conn, completo=False):
+    """
+    Refrescar DisponibilidadLibros; devuelve {'modo', 'libros', 'version'}.
+    La nueva marca es MIN_ACTIVE_ROWVERSION(): todo lo que esté por debajo ya
+    está confirmado, así una transacción en curso no queda fuera del siguiente refresco.
+    """
+    cursor = conn.cursor()
+    anterior, filas_anteriores, ultimo_id, huella = leer_marca(cursor, PROCESO)
+    cursor.execute(ESTADO_EJEMPLARES, ultimo_id or 0)
+    nueva, filas, maximo, huella_previos, huella_actual = cursor.fetchone()
+    nueva = bytes(nueva)
+
+    # rowversion no registra borrados ni cambios de libro: recalcular todo si hay menos
+    # ejemplares o si cambió la huella de los que ya existían en el refresco anterior
+    if (completo or anterior is None or ultimo_id is None or filas < filas_anteriores
+            or huella_previos != huella):
+        modo = 'completo'
+        cursor.execute(MERGE_DISPONIBILIDAD.format(filtro='', borrar='WHEN NOT MATCHED BY SOURCE THEN DELETE'))
+    else:
+        modo = 'incremental'
+        cursor.execute(MERGE_DISPONIBILIDAD.format(filtro=FILTRO_INCREMENTAL, borrar=''), anterior, nueva)
+    libros = cursor.rowcount
+
+    guardar_marca(cursor, PROCESO, nueva, filas, maximo, huella_actual)
+    conn.commit()
+    return {'modo': modo, 'libros': libros, 'version': nueva.hex()}
+
+
+def leer_mapa(conn):
+    """Filas (LibroID, total, disponibles) ordenadas por LibroID"""
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT LibroID, TotalEjemplares, EjemplaresDisponibles
+        FROM DisponibilidadLibros
+        ORDER BY LibroID
+    """)
+    return [tuple(row) for row in cursor.fetchall()]
+
+
+def exportar_json(filas, version, archivo):
+    contenido = {
+        'version': version.hex(),
+        'generado': datetime.now().isoformat(timespec='seconds'),
+        'campos': ['total', 'disponibles'],
+        'libros': {str(libro_id): [total, disponibles] for libro_id, total, disponibles in filas},
+    }
+    escribir_atomico(archivo, json.dumps(contenido, separators=(',', ':')))
+
+
+def exportar_binario(filas, version, archivo):
+    # Los conteos van en 16 bits: ningún libro tiene 65535 ejemplares, pero se acota por seguridad
+    partes = [CABECERA_BINARIA.pack(b'DISP', FORMATO_BINARIO, len(filas), version)]
+    partes.extend(
+        ENTRADA_BINARIA.pack(libro_id, min(total, 0xFFFF), min(disponibles, 0xFFFF))
+        for libro_id, total, disponibles in filas
+    )
+    escribir_atomico(archivo, b''.join(partes))
+
+
+def leer_binario(archivo):
+    """Leer un disponibilidad.bin -> (versión hex, {LibroID: (total, disponibles)})"""
+    with open(archivo, 'rb') as f:
+        datos = f.read()
+    magia, formato, cantidad, version = CABECERA_BINARIA.unpack_from(datos)
+    if magia != b'DISP' or formato != FORMATO_BINARIO:
+        raise ValueError(f"{archivo} no es un mapa de disponibilidad (formato {FORMATO_BINARIO})")
+    entradas = ENTRADA_BINARIA.iter_unpack(datos[CABECERA_BINARIA.size:CABECERA_BINARIA.size + cantidad * ENTRADA_BINARIA.size])
+    return version.hex(), {libro_id: (total, disponibles) for libro_id, total, disponibles in entradas}
+
+
+EXPORTADORES = {'json': exportar_json, 'binario': exportar_binario}
+
+
+def exportar(conn, directorio, formatos, version):
+    """Escribir los mapas pedidos; devuelve (libros, archivos)"""
+    os.makedirs(directorio, exist_ok=True)
+    filas = leer_mapa(conn)
+    archivos = []
+    for formato in formatos:
+        archivos.append(os.path.join(directorio, ARCHIVOS_MAPA[formato]))
+        EXPORTADORES[formato](filas, version, archivos[-1])
+    return len(filas), archivos
+
+
+def ejecutar(conn, args, formatos):
+    inicio = time.perf_counter()
+    resultado = actualizar_disponibilidad(conn, args.completo)
+    print(f"[OK] Refresco {resultado['modo']}: {resultado['libros']} libros actualizados "
+          f"({time.perf_counter() - inicio:.2f} s, versión {resultado['version']})")
+
+    if not formatos:
+        return
+    # Sin cambios no se reescriben los mapas: las cachés que ya los tienen siguen válidas
+    vigentes = all(os.path.exists(os.path.join(args.salida, ARCHIVOS_MAPA[f])) for f in formatos)
+    if resultado['libros'] == 0 and vigentes:
+        print("[INFO] Sin cambios de disponibilidad; mapas exportados vigentes")
+        return
+    libros, archivos = exportar(conn, args.salida, formatos, bytes.fromhex(resultado['version']))
+    for archivo in archivos:
+        print(f"[GUARDADO] {archivo} ({libros} libros, {os.path.getsize(archivo):,} bytes)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Refrescar la disponibilidad precalculada por libro')
+    parser.add_argument('--completo', action='store_true', help='Recalcular todos los libros')
+    parser.add_argument('--formato', choices=['json', 'binario', 'ambos', 'ninguno'], default='ambos',
+                        help='Mapas a exportar (por defecto ambos)')
+    parser.add_argument('--salida', default=DIRECTORIO_SALIDA, help='Directorio de los mapas exportados')
+    parser.add_argument('--intervalo', type=int, default=None, help='Repetir el refresco cada N segundos')
+    args = parser.parse_args()
+    formatos = {'ambos': ('json', 'binario'), 'ninguno': ()}.get(args.formato, (args.formato,))
+
+    print("="*60)
+    print("DISPONIBILIDAD DE LIBROS")
+    print("="*60)
+
+    conn = conectar_bd()
+    try:
+        while True:
+            try:
+                ejecutar(conn, args, formatos)
+            except pyodbc.Error as e:
+                print(f"[ERROR] Error de base de datos: {e}")
+                if args.intervalo is None:
+                    print("[INFO] ¿Se ejecutó scripts/sql/crear_disponibilidad_libros.sql?")
+                    sys.exit(1)
+                time.sleep(ESPERA_RECONEXION)
+                conn.close()
+                conn = conectar_bd()
+                continue
+            if args.intervalo is None:
+                break
+            # Los refrescos siguientes son siempre incrementales
+            args.completo = False
+            time.sleep(args.intervalo)
+    except KeyboardInterrupt:
+        print("\n[INFO] Detenido por el usuario")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,393 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Detector de libros duplicados en el catálogo
+- La carga solo une filas del CSV idénticas; "Introduccion al Pensamiento
+  Sistematico" e "Introducción al pensamiento sistemático" con otro Cutter
+  quedan como dos Libros y parten sus estadísticas de circulación
+- Bloqueo: cada libro entra en los bloques (sección LCC, palabra) de las
+  PALABRAS_CLAVE palabras menos frecuentes de su título; solo se comparan
+  libros que comparten un bloque
+- Los bloques se puntúan en paralelo (multiprocessing). Cada par se evalúa
+  una sola vez, en el primer bloque que comparten
+- Puntaje: SequenceMatcher sobre los títulos normalizados (como la carga),
+  exigiendo autores compatibles y el mismo año (otra edición no es duplicado)
+- Los pares sobre el umbral se agrupan (union-find) en grupos para fusionar;
+  el libro canónico de cada grupo es el que tiene más ejemplares
+- Incremental: guarda el índice de bloques; con --incremental solo se
+  comparan los libros nuevos (LibroID mayor al último procesado)
+
+Salida: data/duplicados/duplicados.json y duplicados.csv (un grupo por fila)
+
+Uso:
+    python duplicados_libros.py                     # catálogo completo
+    python duplicados_libros.py --incremental       # solo libros nuevos
+    python duplicados_libros.py --umbral 0.85 --procesos 8
+"""
+
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import time
+from collections import Counter
+from datetime import datetime
+from difflib import SequenceMatcher
+from multiprocessing import Pool
+
+import pyodbc
+
+from indice_busqueda import normalizar_texto, palabras
+
+DIRECTORIO_SALIDA = os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'duplicados')
+ARCHIVO_ESTADO = 'duplicados_estado.json'
+
+UMBRAL = 0.9
+PALABRAS_CLAVE = 2
+# Un bloque más grande que esto es una palabra demasiado común: no se compara
+MAX_BLOQUE = 500
+# Bloques por tarea enviada a cada proceso
+BLOQUES_POR_TAREA = 200
+TAMANO_LOTE = 10000
+TAMANO_BLOQUE_IDS = 1000
+
+# Números romanos de tomos ("Analisis Matematico II")
+ROMANOS = {'i', 'ii', 'iii', 'iv', 'v', 'vi', 'vii', 'viii', 'ix', 'x', 'xi', 'xii'}
+
+PALABRAS_VACIAS = {
+    'a', 'al', 'con', 'de', 'del', 'el', 'en', 'la', 'las', 'los', 'para', 'por', 'un', 'una', 'y',
+    'the', 'of', 'and', 'to', 'an', 'in', 'for',
+}
+
+CONSULTA_LIBROS = """
+    SELECT l.LibroID, l.Titulo, l.LCCSeccion, l.AnioPublicacion,
+           (SELECT COUNT(*) FROM Ejemplares e WHERE e.LibroID = l.LibroID)
+    FROM Libros l
+    {filtro}
+    ORDER BY l.LibroID
+"""
+
+CONSULTA_AUTORES = """
+    SELECT la.LibroID, a.Nombre
+    FROM LibroAutores la
+    INNER JOIN Autores a ON la.AutorID = a.AutorID
+    {filtro}
+"""
+
+
+def palabras_titulo(titulo):
+    return [p for p in palabras(normalizar_texto(titulo)) if p not in PALABRAS_VACIAS]
+
+
+def leer_libros(conn, libro_ids=None, desde_id=None):
+    """{LibroID: {'titulo', 'normalizado', 'seccion', 'anio', 'ejemplares', 'autores'}}"""
+    cursor = conn.cursor()
+    consultas = []
+    if libro_ids is not None:
+        for i in range(0, len(libro_ids), TAMANO_BLOQUE_IDS):
+            bloque = libro_ids[i:i + TAMANO_BLOQUE_IDS]
+            consultas.append((f"WHERE {{columna}} IN ({', '.join('?' * len(bloque))})", bloque))
+    elif desde_id is not None:
+        consultas.append(("WHERE {columna} > ?", [desde_id]))
+    else:
+        consultas.append(("", []))
+
+    libros = {}
+    for filtro, parametros in consultas:
+        cursor.execute(CONSULTA_LIBROS.format(filtro=filtro.format(columna='l.LibroID')), *parametros)
+        while True:
+            lote = cursor.fetchmany(TAMANO_LOTE)
+            if not lote:
+                break
+            for libro_id, titulo, seccion, anio, ejemplares in lote:
+                libros[libro_id] = {
+                    'titulo': titulo, 'normalizado': ' '.join(palabras_titulo(titulo)),
+                    'seccion': (seccion or '').strip().upper(), 'anio': anio,
+                    'ejemplares': ejemplares, 'autores': [],
+                }
+        cursor.execute(CONSULTA_AUTORES.format(filtro=filtro.format(columna='la.LibroID')), *parametros)
+        while True:
+            lote = cursor.fetchmany(TAMANO_LOTE)
+            if not lote:
+                break
+            for libro_id, nombre in lote:
+                if libro_id in libros:
+                    libros[libro_id]['autores'].append(nombre)
+    return libros
+
+
+def claves_bloqueo(libro, frecuencias):
+    """Bloques (sección|palabra) de las palabras menos frecuentes del título"""
+    unicas = sorted(set(libro['normalizado'].split()), key=lambda p: (frecuencias.get(p, 0), p))
+    return [f"{libro['seccion']}|{p}" for p in unicas[:PALABRAS_CLAVE]]
+
+
+def marcas_volumen(normalizado):
+    """Palabras que distinguen tomos y módulos: números, romanos y códigos como 'uf2177'"""
+    return frozenset(p for p in normalizado.split() if p in ROMANOS or any(c.isdigit() for c in p))
+
+
+def ficha(libro_id, libro, claves):
+    """Lo que necesita un proceso para comparar un libro (pequeño para enviarlo)"""
+    autores = frozenset(p for nombre in libro['autores'] for p in palabras(normalizar_texto(nombre)))
+    return (libro_id, libro['normalizado'], autores, libro['anio'], tuple(claves),
+            marcas_volumen(libro['normalizado']))
+
+
+def comparar(a, b, umbral, ignorar_anio):
+    """Puntaje del par (0 si no puede ser el mismo libro)"""
+    if not ignorar_anio and a[3] and b[3] and a[3] != b[3]:
+        return 0.0
+    # Tomo I y tomo II no son el mismo libro aunque el título casi coincida
+    if a[5] != b[5]:
+        return 0.0
+    if a[2] and b[2] and len(a[2] & b[2]) * 2 < min(len(a[2]), len(b[2])):
+        return 0.0
+    comparador = SequenceMatcher(None, a[1], b[1], autojunk=False)
+    # Cotas superiores baratas antes del cálculo completo
+    if comparador.real_quick_ratio() < umbral or comparador.quick_ratio() < umbral:
+        return 0.0
+    return comparador.ratio()
+
+
+def puntuar_bloques(tarea):
+    """Proceso: [(clave, [fichas])] -> [(id_a, id_b, puntaje)]"""
+    bloques, umbral, ignorar_anio, solo_nuevos_desde = tarea
+    pares = []
+    for clave, fichas in bloques:
+        for i, a in enumerate(fichas):
+            for b in fichas[i + 1:]:
+                # En incremental basta comparar pares con al menos un libro nuevo
+                if solo_nuevos_desde is not None and max(a[0], b[0]) <= solo_nuevos_desde:
+                    continue
+                # El par se evalúa solo en el primer bloque que ambos comparten
+                if min(set(a[4]) & set(b[4])) != clave:
+                    continue
+                puntaje = comparar(a, b, umbral, ignorar_anio)
+                if puntaje >= umbral:
+                    pares.append((min(a[0], b[0]), max(a[0], b[0]), round(puntaje, 4)))
+    return pares
+
+
+def agrupar(pares, anios=None):
+    """
+    Union-find sobre los pares -> lista de grupos (conjuntos de LibroID).
+    Con `anios` no se unen grupos con años distintos (dos ediciones encadenadas
+    a través de un libro sin año).
+    """
+    padre = {}
+    anios_grupo = {}
+
+    def raiz(x):
+        padre.setdefault(x, x)
+        while padre[x] != x:
+            padre[x] = padre[padre[x]]
+            x = padre[x]
+        return x
+
+    for a, b, _ in sorted(pares, key=lambda p: -p[2]):
+        ra, rb = raiz(a), raiz(b)
+        if ra == rb:
+            continue
+        if anios is not None:
+            conocidos_a = anios_grupo.get(ra, {anios.get(a)} - {None})
+            conocidos_b = anios_grupo.get(rb, {anios.get(b)} - {None})
+            if len(conocidos_a | conocidos_b) > 1:
+                continue
+            anios_grupo[min(ra, rb)] = conocidos_a | conocidos_b
+        padre[max(ra, rb)] = min(ra, rb)
+    grupos = {}
+    for x in padre:
+        grupos.setdefault(raiz(x), set()).add(x)
+    return list(grupos.values())
+
+
+def cargar_estado(directorio):
+    archivo = os.path.join(directorio, ARCHIVO_ESTADO)
+    if not os.path.exists(archivo):
+        return None
+    with open(archivo, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def detectar(conn, args):
+    """Devuelve (grupos con detalle, resumen, estado para la próxima pasada incremental)"""
+    estado = cargar_estado(args.salida) if args.incremental else None
+    if args.incremental and estado is None:
+        print("[WARN] No hay estado previo; se procesa el catálogo completo")
+
+    if estado is None:
+        libros = leer_libros(conn)
+        frecuencias = Counter(p for libro in libros.values() for p in set(libro['normalizado'].split()))
+        claves = {i: claves_bloqueo(libro, frecuencias) for i, libro in libros.items()}
+        bloques_ids = {}
+        for libro_id, lista in claves.items():
+            for clave in lista:
+                bloques_ids.setdefault(clave, []).append(libro_id)
+        pares_previos, desde = [], None
+    else:
+        desde = estado['ultimo_libro_id']
+        frecuencias = Counter(estado['frecuencias'])
+        nuevos = leer_libros(conn, desde_id=desde)
+        bloques_ids = {k: v for k, v in estado['bloques'].items()}
+        claves_nuevos = {i: claves_bloqueo(libro, frecuencias) for i, libro in nuevos.items()}
+        for libro_id, libro in nuevos.items():
+            frecuencias.update(set(libro['normalizado'].split()))
+            for clave in claves_nuevos[libro_id]:
+                bloques_ids.setdefault(clave, []).append(libro_id)
+        # Solo se leen los libros previos que comparten bloque con uno nuevo
+        tocados = {c for lista in claves_nuevos.values() for c in lista}
+        previos = sorted({i for c in tocados for i in bloques_ids[c] if i not in nuevos})
+        libros = {**leer_libros(conn, libro_ids=previos), **nuevos}
+        # Los previos conservan las claves con que se indexaron (de las que importan aquí)
+        claves = dict(claves_nuevos)
+        for clave in sorted(tocados):
+            for libro_id in bloques_ids[clave]:
+                if libro_id not in nuevos:
+                    claves.setdefault(libro_id, []).append(clave)
+        pares_previos = [tuple(p) for p in estado['pares']]
+
+    # Bloques a comparar: en incremental, solo los que recibieron un libro nuevo
+    seleccion = bloques_ids if desde is None else {c: bloques_ids[c] for c in tocados}
+    seleccion = {c: [i for i in ids if i in libros] for c, ids in seleccion.items()}
+    grandes = {c for c, ids in seleccion.items() if len(ids) > MAX_BLOQUE}
+    fichas = {}
+    bloques = []
+    for clave, ids in seleccion.items():
+        if len(ids) < 2 or clave in grandes:
+            continue
+        for i in ids:
+            if i not in fichas:
+                # Sin los bloques omitidos: el "primer bloque compartido" tiene que ser uno que se compara
+                fichas[i] = ficha(i, libros[i], sorted(c for c in claves[i] if c not in grandes))
+        bloques.append((clave, [fichas[i] for i in ids]))
+
+    tareas = [(bloques[i:i + BLOQUES_POR_TAREA], args.umbral, args.ignorar_anio, desde)
+              for i in range(0, len(bloques), BLOQUES_POR_TAREA)]
+    pares = list(pares_previos)
+    if args.procesos > 1 and len(tareas) > 1:
+        with Pool(args.procesos) as pool:
+            for resultado in pool.imap_unordered(puntuar_bloques, tareas):
+                pares.extend(resultado)
+    else:
+        for tarea in tareas:
+            pares.extend(puntuar_bloques(tarea))
+    pares = sorted(set(pares))
+
+    # Detalle de los libros en grupos que no se leyeron en esta pasada
+    en_grupos = sorted({i for p in pares for i in p[:2]} - set(libros))
+    if en_grupos:
+        libros.update(leer_libros(conn, libro_ids=en_grupos))
+    anios = None if args.ignorar_anio else {i: libro['anio'] for i, libro in libros.items()}
+    grupo_de = {}
+    for numero, ids in enumerate(agrupar(pares, anios)):
+        for i in ids:
+            if i in libros:
+                grupo_de[i] = numero
+    miembros, puntajes = {}, {}
+    for i, numero in grupo_de.items():
+        miembros.setdefault(numero, []).append(i)
+    for a, b, puntaje in pares:
+        if grupo_de.get(a) is not None and grupo_de.get(a) == grupo_de.get(b):
+            puntajes[grupo_de[a]] = min(puntajes.get(grupo_de[a], 1.0), puntaje)
+
+    grupos = []
+    for numero, ids in miembros.items():
+        if len(ids) < 2:
+            continue
+        canonico = max(ids, key=lambda i: (libros[i]['ejemplares'], -i))
+        grupos.append({
+            'canonico': canonico,
+            'puntaje_minimo': puntajes.get(numero),
+            'libros': [{
+                'LibroID': i, 'Titulo': libros[i]['titulo'], 'LCCSeccion': libros[i]['seccion'],
+                'AnioPublicacion': libros[i]['anio'], 'Ejemplares': libros[i]['ejemplares'],
+                'Autores': libros[i]['autores'],
+            } for i in sorted(ids, key=lambda i: (i != canonico, i))],
+        })
+    grupos.sort(key=lambda g: (-len(g['libros']), g['canonico']))
+
+    ultimo = max(libros, default=desde or 0)
+    if desde is not None:
+        ultimo = max(ultimo, desde)
+    nuevo_estado = {
+        'ultimo_libro_id': ultimo,
+        'frecuencias': dict(frecuencias),
+        'bloques': bloques_ids,
+        'pares': [list(p) for p in pares],
+    }
+    resumen = {
+        'modo': 'incremental' if desde is not None else 'completo',
+        'libros_leidos': len(libros), 'bloques': len(bloques), 'bloques_omitidos': len(grandes),
+        'pares': len(pares), 'grupos': len(grupos),
+    }
+    return grupos, resumen, nuevo_estado
+
+
+def guardar(directorio, grupos, resumen, estado, args):
+    from generar_reportes import escribir_atomico
+
+    os.makedirs(directorio, exist_ok=True)
+    archivo_json = os.path.join(directorio, 'duplicados.json')
+    escribir_atomico(archivo_json, json.dumps({
+        'generado': datetime.now().isoformat(timespec='seconds'),
+        'umbral': args.umbral,
+        'resumen': resumen,
+        'grupos': grupos,
+    }, ensure_ascii=False, indent=2))
+
+    salida = io.StringIO()
+    escritor = csv.writer(salida, delimiter=';')
+    escritor.writerow(['LibroCanonico', 'Titulo', 'Duplicados', 'TitulosDuplicados', 'PuntajeMinimo'])
+    for grupo in grupos:
+        principal, *resto = grupo['libros']
+        escritor.writerow([principal['LibroID'], principal['Titulo'],
+                           ','.join(str(l['LibroID']) for l in resto),
+                           ' | '.join(l['Titulo'] for l in resto), grupo['puntaje_minimo']])
+    archivo_csv = os.path.join(directorio, 'duplicados.csv')
+    escribir_atomico(archivo_csv, salida.getvalue())
+    escribir_atomico(os.path.join(directorio, ARCHIVO_ESTADO), json.dumps(estado, separators=(',', ':')))
+    return archivo_json, archivo_csv
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Detectar libros duplicados en el catálogo')
+    parser.add_argument('--incremental', action='store_true', help='Comparar solo los libros nuevos')
+    parser.add_argument('--umbral', type=float, default=UMBRAL, help=f'Similitud mínima de títulos (por defecto {UMBRAL})')
+    parser.add_argument('--ignorar-anio', action='store_true', help='Considerar duplicados aunque cambie el año')
+    parser.add_argument('--procesos', type=int, default=os.cpu_count() or 1, help='Procesos para puntuar')
+    parser.add_argument('--salida', default=DIRECTORIO_SALIDA, help='Directorio de resultados')
+    args = parser.parse_args()
+    if not 0 < args.umbral <= 1:
+        parser.error("--umbral debe estar entre 0 y 1")
+
+    print("="*60)
+    print("DETECCIÓN DE LIBROS DUPLICADOS")
+    print("="*60)
+    from generar_reportes import conectar_bd
+
+    conn = conectar_bd()
+    try:
+        inicio = time.perf_counter()
+        grupos, resumen, estado = detectar(conn, args)
+    except pyodbc.Error as e:
+        print(f"[ERROR] Error de base de datos: {e}")
+        sys.exit(1)
+    finally:
+        conn.close()
+
+    archivos = guardar(args.salida, grupos, resumen, estado, args)
+    print(f"[INFO] Modo {resumen['modo']}: {resumen['libros_leidos']:,} libros leídos, "
+          f"{resumen['bloques']:,} bloques comparados ({resumen['bloques_omitidos']} omitidos por tamaño)")
+    print(f"[INFO] {resumen['pares']:,} pares similares en {resumen['grupos']:,} grupos "
+          f"({time.perf_counter() - inicio:.2f} s)")
+    for grupo in grupos[:10]:
+        print(f"  [{grupo['canonico']}] " + ' | '.join(l['Titulo'] for l in grupo['libros']))
+    for archivo in archivos:
+        print(f"[GUARDADO] {archivo}")
+
+
+if __name__ == "__main__":
+    main()
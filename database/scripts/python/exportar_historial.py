@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Exportador masivo del historial de préstamos y multas
+- Préstamos unidos con Reservas, Usuarios y Libros
+- Multas unidas con Usuarios
+- Lee por lotes con fetchmany (sin cargar la tabla completa en memoria)
+- Escribe Parquet particionado por año/mes o CSV comprimido con gzip
+- --since permite exportaciones incrementales (agrega archivos nuevos,
+  nunca reescribe los anteriores). Con --since ultimo los préstamos se
+  siguen por Prestamos.VersionFila (rowversion, crear_versiones_fila.sql):
+  uno devuelto o renovado después de una exportación vuelve a aparecer en
+  la siguiente y la versión vigente es la de mayor VersionFila. El límite
+  superior es MIN_ACTIVE_ROWVERSION(), así una transacción en curso no se
+  pierde. Con --since FECHA se exportan los préstamos hechos o devueltos
+  desde esa fecha (una renovación no cambia ninguna de las dos)
+- Multas no tiene fecha de modificación: con --since ultimo se exportan las
+  de MultaID mayor al último exportado (nuevas, también las pendientes) y
+  las cobradas después de la última FechaCobro exportada (ambos límites
+  exclusivos). La versión vigente de una multa es la última exportada
+
+Uso:
+    python exportar_historial.py --formato parquet
+    python exportar_historial.py --formato csv --since 2025-01-01
+    python exportar_historial.py --since ultimo      # continúa desde la última exportación
+"""
+
+import argparse
+import csv
+import gzip
+import json
+import os
+import sys
+import time
+from datetime import datetime, date
+
+from generar_reportes import conectar_bd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+DIRECTORIO_SALIDA = os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'exportaciones')
+ARCHIVO_ESTADO = '_estado_exportacion.json'
+TAMANO_LOTE = 5000
+
+# Cada conjunto: consulta base, filtro para --since con fecha, columna de
+# partición, columnas de marca de agua (con su condición para --since ultimo)
+# y tipos de columnas (para el esquema Parquet)
+CONJUNTOS = {
+    'prestamos': {
+        'consulta': """
+            SELECT
+                p.PrestamoID, p.ReservaID, r.UsuarioID, u.CodigoUniversitario,
+                u.Nombre AS NombreUsuario, u.Rol, r.LibroID, l.Titulo, l.SignaturaLCC,
+                r.EjemplarID, r.FechaReserva, p.FechaPrestamo, p.FechaVencimiento,
+                p.FechaDevolucion, p.Estado, p.Renovaciones,
+                COALESCE(p.FechaModificacion, p.FechaCreacion, p.FechaPrestamo) AS FechaModificacion,
+                CAST(p.VersionFila AS BIGINT) AS VersionFila
+            FROM Prestamos p
+            INNER JOIN Reservas r ON p.ReservaID = r.ReservaID
+            INNER JOIN Usuarios u ON r.UsuarioID = u.UsuarioID
+            INNER JOIN Libros l ON r.LibroID = l.LibroID
+            {filtro}
+            ORDER BY p.FechaPrestamo, p.PrestamoID
+        """,
+        # El backend no escribe FechaModificacion al devolver ni al renovar
+        'filtro': "WHERE p.FechaPrestamo >= ? OR p.FechaDevolucion >= ?",
+        'particion': 'FechaPrestamo',
+        # Inclusivo: la marca guardada es el MIN_ACTIVE_ROWVERSION() de la exportación anterior
+        'marca_agua': {
+            'VersionFila': "p.VersionFila >= CONVERT(BINARY(8), CAST(? AS BIGINT))",
+        },
+        'version': 'p.VersionFila',
+        'columnas': [
+            ('PrestamoID', 'int'), ('ReservaID', 'int'), ('UsuarioID', 'int'),
+            ('CodigoUniversitario', 'str'), ('NombreUsuario', 'str'), ('Rol', 'str'),
+            ('LibroID', 'int'), ('Titulo', 'str'), ('SignaturaLCC', 'str'), ('EjemplarID', 'int'),
+            ('FechaReserva', 'fecha'), ('FechaPrestamo', 'fecha'), ('FechaVencimiento', 'fecha'),
+            ('FechaDevolucion', 'fecha'), ('Estado', 'str'), ('Renovaciones', 'int'),
+            ('FechaModificacion', 'fecha'), ('VersionFila', 'int'),
+        ],
+    },
+    'multas': {
+        'consulta': """
+            SELECT
+                m.MultaID, m.PrestamoID, m.UsuarioID, u.CodigoUniversitario, u.Rol,
+                m.Monto, m.Estado, m.DiasAtraso, m.Motivo, m.FechaCobro
+            FROM Multas m
+            INNER JOIN Usuarios u ON m.UsuarioID = u.UsuarioID
+            {filtro}
+            ORDER BY m.FechaCobro, m.MultaID
+        """,
+        # Las pendientes no tienen FechaCobro y siempre reflejan el estado actual
+        'filtro': "WHERE m.FechaCobro >= ? OR m.FechaCobro IS NULL",
+        'particion': 'FechaCobro',
+        'marca_agua': {
+            'MultaID': "m.MultaID > ?",
+            'FechaCobro': "m.FechaCobro > ?",
+        },
+        'columnas': [
+            ('MultaID', 'int'), ('PrestamoID', 'int'), ('UsuarioID', 'int'),
+            ('CodigoUniversitario', 'str'), ('Rol', 'str'), ('Monto', 'decimal'),
+            ('Estado', 'str'), ('DiasAtraso', 'int'), ('Motivo', 'str'), ('FechaCobro', 'fecha'),
+        ],
+    },
+}
+
+
+def esquema_parquet(columnas):
+    """Construir el esquema Parquet de un conjunto"""
+    tipos = {
+        'int': pa.int64(),
+        'str': pa.string(),
+        'fecha': pa.timestamp('ms'),
+        'decimal': pa.float64(),
+    }
+    return pa.schema([(nombre, tipos[tipo]) for nombre, tipo in columnas])
+
+
+def clave_particion(valor):
+    """Devolver (año, mes) de la columna de partición; None si no hay fecha"""
+    if isinstance(valor, (datetime, date)):
+        return (valor.year, valor.month)
+    return None
+
+
+def ruta_particion(directorio, conjunto, particion):
+    if particion is None:
+        return os.path.join(directorio, conjunto, 'sin_fecha')
+    return os.path.join(directorio, conjunto, f'anio={particion[0]}', f'mes={particion[1]:02d}')
+
+
+class EscritorParticion:
+    """Escribe las filas de una partición en un único archivo nuevo (parquet o csv.gz)"""
+
+    def __init__(self, ruta, nombre_archivo, formato, columnas):
+        os.makedirs(ruta, exist_ok=True)
+        self.formato = formato
+        self.columnas = columnas
+        self.filas = 0
+
+        if formato == 'parquet':
+            self.ruta = os.path.join(ruta, nombre_archivo + '.parquet')
+            self.esquema = esquema_parquet(columnas)
+            self.escritor = pq.ParquetWriter(self.ruta, self.esquema, compression='snappy')
+        else:
+            self.ruta = os.path.join(ruta, nombre_archivo + '.csv.gz')
+            self.archivo = gzip.open(self.ruta, 'wt', encoding='utf-8', newline='')
+            self.escritor = csv.writer(self.archivo)
+            self.escritor.writerow([nombre for nombre, _ in columnas])
+
+    def escribir(self, filas):
+        if not filas:
+            return
+        if self.formato == 'parquet':
+            datos = {}
+            for i, (nombre, tipo) in enumerate(self.columnas):
+                valores = [fila[i] for fila in filas]
+                if tipo == 'decimal':
+                    valores = [float(v) if v is not None else None for v in valores]
+                datos[nombre] = valores
+            # Cada lote se convierte en un row group: la memoria no crece con el historial
+            self.escritor.write_table(pa.Table.from_pydict(datos, schema=self.esquema))
+        else:
+            self.escritor.writerows(
+                [v.isoformat(sep=' ') if isinstance(v, datetime) else v for v in fila]
+                for fila in filas
+            )
+        self.filas += len(filas)
+
+    def cerrar(self):
+        if self.formato == 'parquet':
+            self.escritor.close()
+        else:
+            self.archivo.close()
+
+
+def exportar_conjunto(conn, nombre, formato, directorio, desde=None, tamano_lote=TAMANO_LOTE):
+    """
+    Exportar un conjunto en streaming.
+    `desde` es una fecha (--since YYYY-MM-DD) o el dict de marcas de agua
+    de la exportación anterior. Como la consulta viene ordenada por la
+    columna de partición, solo hay un archivo abierto a la vez y la memoria
+    usada es la de un lote. Devuelve (filas, archivos, {columna: marca máxima}).
+    """
+    definicion = CONJUNTOS[nombre]
+    cursor = conn.cursor()
+    if isinstance(desde, dict):
+        marcas = [(columna, valor) for columna, valor in desde.items()
+                  if valor is not None and columna in definicion['marca_agua']]
+        filtro = "WHERE " + " OR ".join(definicion['marca_agua'][c] for c, _ in marcas) if marcas else ''
+        parametros = tuple(valor for _, valor in marcas)
+    elif desde:
+        filtro = definicion['filtro']
+        parametros = (desde,) * filtro.count('?')
+    else:
+        filtro, parametros = '', ()
+
+    # Solo hasta MIN_ACTIVE_ROWVERSION(): lo que esté por debajo ya está confirmado
+    limite = None
+    if 'version' in definicion:
+        cursor.execute("SELECT CAST(MIN_ACTIVE_ROWVERSION() AS BIGINT)")
+        limite = cursor.fetchone()[0]
+        condicion = f"{definicion['version']} < CONVERT(BINARY(8), CAST(? AS BIGINT))"
+        filtro = f"WHERE ({filtro[len('WHERE '):]}) AND {condicion}" if filtro else f"WHERE {condicion}"
+        parametros += (limite,)
+    consulta = definicion['consulta'].format(filtro=filtro)
+
+    columnas = definicion['columnas']
+    nombres = [c for c, _ in columnas]
+    idx_particion = nombres.index(definicion['particion'])
+    idx_marcas = {columna: nombres.index(columna) for columna in definicion['marca_agua']}
+    sello = datetime.now().strftime('%Y%m%d%H%M%S')
+
+    cursor.execute(consulta, *parametros)
+
+    escritor = None
+    particion_actual = object()
+    pendientes = []
+    total = 0
+    archivos = 0
+    marcas_maximas = {columna: None for columna in idx_marcas}
+
+    def vaciar():
+        nonlocal pendientes
+        if escritor is not None and pendientes:
+            escritor.escribir(pendientes)
+        pendientes = []
+
+    while True:
+        lote = cursor.fetchmany(tamano_lote)
+        if not lote:
+            break
+
+        for fila in lote:
+            particion = clave_particion(fila[idx_particion])
+            if particion != particion_actual:
+                vaciar()
+                if escritor is not None:
+                    escritor.cerrar()
+                escritor = EscritorParticion(
+                    ruta_particion(directorio, nombre, particion),
+                    f'part-{sello}', formato, columnas
+                )
+                archivos += 1
+                particion_actual = particion
+
+            pendientes.append(tuple(fila))
+            for columna, idx in idx_marcas.items():
+                marca = fila[idx]
+                if marca is not None and (marcas_maximas[columna] is None or marca > marcas_maximas[columna]):
+                    marcas_maximas[columna] = marca
+
+        vaciar()
+        total += len(lote)
+        print(f"  {nombre}: {total:,} filas exportadas...")
+
+    if escritor is not None:
+        escritor.cerrar()
+
+    if limite is not None:
+        marcas_maximas[definicion['version'].split('.')[-1]] = limite
+    return total, archivos, marcas_maximas
+
+
+def leer_estado(directorio):
+    ruta = os.path.join(directorio, ARCHIVO_ESTADO)
+    if not os.path.exists(ruta):
+        return {}
+    with open(ruta, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def guardar_estado(directorio, estado):
+    ruta = os.path.join(directorio, ARCHIVO_ESTADO)
+    temporal = ruta + '.tmp'
+    with open(temporal, 'w', encoding='utf-8') as f:
+        json.dump(estado, f, indent=2, ensure_ascii=False, default=str)
+    os.replace(temporal, ruta)
+
+
+def parsear_desde(valor, estado, conjunto):
+    """Interpretar --since: fecha ISO, 'ultimo' (dict de marcas de agua guardadas) o None"""
+    if valor is None:
+        return None
+    if valor == 'ultimo':
+        marca = estado.get(conjunto)
+        if not marca:
+            return None
+        if isinstance(marca, str):
+            # Estado de versiones anteriores: una sola fecha
+            return datetime.fromisoformat(marca)
+        tipos = dict(CONJUNTOS[conjunto]['columnas'])
+        return {columna: (datetime.fromisoformat(v) if tipos[columna] == 'fecha' else int(v)) if v is not None else None
+                for columna, v in marca.items()}
+    return datetime.fromisoformat(valor)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Exportar historial de préstamos y multas')
+    parser.add_argument('--formato', choices=['parquet', 'csv'], default='parquet')
+    parser.add_argument('--salida', default=DIRECTORIO_SALIDA, help='Directorio de salida')
+    parser.add_argument('--since', dest='desde', default=None,
+                        help="Exportar desde esta fecha (YYYY-MM-DD) o 'ultimo' (continúa desde la última exportación)")
+    parser.add_argument('--conjuntos', nargs='+', choices=list(CONJUNTOS), default=list(CONJUNTOS))
+    parser.add_argument('--lote', type=int, default=TAMANO_LOTE, help='Filas por fetchmany')
+    args = parser.parse_args()
+
+    if args.formato == 'parquet' and pa is None:
+        print("[ERROR] El formato parquet requiere pyarrow (pip install pyarrow)")
+        print("        Usa --formato csv para exportar sin dependencias adicionales")
+        sys.exit(1)
+
+    os.makedirs(args.salida, exist_ok=True)
+    estado = leer_estado(args.salida)
+
+    conn = conectar_bd()
+    print("[OK] Conexion exitosa!\n")
+
+    try:
+        for nombre in args.conjuntos:
+            desde = parsear_desde(args.desde, estado, nombre)
+            if isinstance(desde, dict):
+                descripcion = ', '.join(f"{c} {v}" for c, v in desde.items() if v is not None)
+            else:
+                descripcion = desde
+            print(f"Exportando {nombre}" + (f" desde {descripcion}" if desde else " (completo)") + "...")
+            inicio = time.perf_counter()
+            total, archivos, marca = exportar_conjunto(conn, nombre, args.formato, args.salida, desde, args.lote)
+            duracion = time.perf_counter() - inicio
+            print(f"[OK] {nombre}: {total:,} filas en {archivos} archivo(s) ({duracion:.1f} s)")
+
+            # Las columnas sin filas nuevas conservan la marca anterior
+            anteriores = desde if isinstance(desde, dict) else {}
+            for columna, valor in anteriores.items():
+                if columna in marca and marca[columna] is None:
+                    marca[columna] = valor
+            if any(v is not None for v in marca.values()):
+                estado[nombre] = {columna: v.isoformat() if isinstance(v, datetime) else v
+                                  for columna, v in marca.items()}
+                guardar_estado(args.salida, estado)
+    except Exception as e:
+        print(f"\n[ERROR] Error al exportar: {e}")
+        import traceback
+        traceback.print_exc()
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
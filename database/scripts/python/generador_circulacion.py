@@ -0,0 +1,535 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Generador de circulación sintética para pruebas de carga en SQL Server
+- Crea Usuarios (código SIM########), Reservas, Prestamos, Multas y
+  Notificaciones sobre los ejemplares Disponible del catálogo ya cargado
+- Distribuciones configurables:
+    * roles de los usuarios y actividad sesgada (Pareto): pocos usuarios
+      concentran muchos préstamos; Profesor/Bibliotecaria prestan menos
+    * préstamos por usuario (media), popularidad sesgada de los libros
+    * estacionalidad mensual (ciclos académicos por defecto)
+    * tasa de atraso y días medios de atraso; multas con la misma política
+      que motor_multas (configuracion.json)
+    * colas de espera: los libros con todos sus ejemplares prestados
+      reciben reservas ColaEspera con PrioridadCola 1..n
+- Consistencia: cada ejemplar tiene una línea de tiempo sin préstamos
+  solapados; cada préstamo cuelga de su reserva Completada/Retiro
+  (Prestamos.ReservaID), el último préstamo sin devolver deja el ejemplar
+  en Prestado y las multas llevan su notificación MultaGenerada
+- Los IDs se asignan en el cliente (a partir del MAX actual) y se escribe
+  por lotes con IDENTITY_INSERT + fast_executemany, o con --bcp a archivos
+  de texto y un script BULK INSERT (KEEPIDENTITY) para cargarlos en el servidor
+
+Uso:
+    python generador_circulacion.py --usuarios 100000 --prestamos-por-usuario 20
+    python generador_circulacion.py --usuarios 500000 --bcp ../../data/sinteticos
+    python generador_circulacion.py --limpiar           # borrar todo lo generado
+
+Para una base de pruebas: no usar con la base en producción.
+"""
+
+import argparse
+import hashlib
+import os
+import random
+import sys
+import time
+from array import array
+from datetime import datetime, timedelta
+from itertools import accumulate
+from decimal import Decimal, ROUND_HALF_UP
+
+import pyodbc
+
+from generar_reportes import conectar_bd
+from motor_multas import PREFIJO_MOTIVO, cargar_politica
+
+DIRECTORIO_BCP = os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'sinteticos')
+
+PREFIJO_CODIGO = 'SIM'
+CONTRASENA_SINTETICA = 'Sintetico123!'
+TAMANO_LOTE = 20000
+
+ROLES_POR_DEFECTO = 'Estudiante=0.85,Profesor=0.12,Bibliotecaria=0.03'
+# Peso relativo de la actividad de cada rol
+ACTIVIDAD_POR_ROL = {'Estudiante': 1.0, 'Profesor': 0.6, 'Bibliotecaria': 0.1, 'Administrador': 0.05}
+# Exponente de Pareto de la actividad de usuarios y popularidad de libros (menor = más sesgo)
+ALFA_USUARIOS = 1.5
+ALFA_LIBROS = 1.2
+
+# Pesos de enero a diciembre
+ESTACIONALIDAD = {
+    'semestral': (0.3, 0.25, 0.6, 1.0, 1.1, 1.0, 0.8, 0.5, 1.0, 1.1, 1.2, 0.8),
+    'plana': (1.0,) * 12,
+}
+
+TASA_PAGO = 0.7
+
+# Tablas en orden de carga (claves foráneas) y columnas que se escriben
+COLUMNAS = {
+    'Usuarios': ('UsuarioID', 'CodigoUniversitario', 'Nombre', 'EmailInstitucional', 'ContrasenaHash', 'Rol',
+                 'Estado', 'FechaRegistro', 'FechaUltimaActualizacionContrasena'),
+    'Reservas': ('ReservaID', 'UsuarioID', 'LibroID', 'FechaReserva', 'Estado', 'FechaExpiracion', 'PrioridadCola',
+                 'EjemplarID', 'EstadoNotificacion', 'FechaLimiteRetiro', 'TipoReserva'),
+    'Prestamos': ('PrestamoID', 'ReservaID', 'FechaPrestamo', 'FechaVencimiento', 'FechaDevolucion', 'Estado',
+                  'Renovaciones', 'DiasRenovacion', 'Observaciones', 'FechaCreacion', 'FechaModificacion'),
+    'Multas': ('MultaID', 'PrestamoID', 'UsuarioID', 'Monto', 'Estado', 'DiasAtraso', 'Motivo', 'FechaCobro'),
+    'Notificaciones': ('NotificacionID', 'ReservaID', 'UsuarioID', 'Tipo', 'Mensaje', 'FechaCreacion',
+                       'FechaLectura', 'Estado'),
+}
+CLAVES = {'Usuarios': 'UsuarioID', 'Reservas': 'ReservaID', 'Prestamos': 'PrestamoID',
+          'Multas': 'MultaID', 'Notificaciones': 'NotificacionID'}
+
+FILTRO_SINTETICOS = f"SELECT UsuarioID FROM Usuarios WHERE CodigoUniversitario LIKE '{PREFIJO_CODIGO}%'"
+
+LIMPIAR = (
+    ('notificaciones', f"""
+        DELETE FROM Notificaciones
+        WHERE UsuarioID IN ({FILTRO_SINTETICOS})
+           OR ReservaID IN (SELECT ReservaID FROM Reservas WHERE UsuarioID IN ({FILTRO_SINTETICOS}))
+    """),
+    ('multas', f"DELETE FROM Multas WHERE UsuarioID IN ({FILTRO_SINTETICOS})"),
+    ('ejemplares', f"""
+        UPDATE e SET Estado = 'Disponible'
+        FROM Ejemplares e
+        INNER JOIN Reservas r ON r.EjemplarID = e.EjemplarID
+        INNER JOIN Prestamos p ON p.ReservaID = r.ReservaID
+        WHERE r.UsuarioID IN ({FILTRO_SINTETICOS}) AND p.FechaDevolucion IS NULL AND e.Estado = 'Prestado'
+    """),
+    ('prestamos', f"""
+        DELETE FROM Prestamos
+        WHERE ReservaID IN (SELECT ReservaID FROM Reservas WHERE UsuarioID IN ({FILTRO_SINTETICOS}))
+    """),
+    ('reservas', f"DELETE FROM Reservas WHERE UsuarioID IN ({FILTRO_SINTETICOS})"),
+    ('usuarios', f"DELETE FROM Usuarios WHERE CodigoUniversitario LIKE '{PREFIJO_CODIGO}%'"),
+)
+
+MARCAR_PRESTADOS = """
+    UPDATE e SET Estado = 'Prestado'
+    FROM Ejemplares e
+    INNER JOIN #EjemplaresSinteticos s ON e.EjemplarID = s.EjemplarID
+"""
+
+
+def leer_distribucion(texto):
+    """'Estudiante=0.85,Profesor=0.12' -> {'Estudiante': 0.85, 'Profesor': 0.12}"""
+    distribucion = {}
+    for parte in texto.split(','):
+        clave, _, valor = parte.partition('=')
+        distribucion[clave.strip()] = float(valor)
+    return distribucion
+
+
+def leer_estacionalidad(texto):
+    if texto in ESTACIONALIDAD:
+        return ESTACIONALIDAD[texto]
+    pesos = tuple(float(p) for p in texto.split(','))
+    if len(pesos) != 12:
+        raise ValueError("La estacionalidad lleva 12 pesos (enero a diciembre) o un nombre: "
+                         + ', '.join(ESTACIONALIDAD))
+    return pesos
+
+
+def meses_del_periodo(inicio, fin, pesos):
+    """[(día inicial, día final)] de cada mes del periodo y sus pesos acumulados"""
+    tramos, acumulados, total = [], [], 0.0
+    cursor_fecha = inicio
+    while cursor_fecha < fin:
+        siguiente = (cursor_fecha.replace(day=1) + timedelta(days=32)).replace(day=1)
+        siguiente = min(siguiente, fin)
+        a = (cursor_fecha - inicio).total_seconds() / 86400
+        b = (siguiente - inicio).total_seconds() / 86400
+        total += pesos[cursor_fecha.month - 1] * (b - a)
+        tramos.append((a, b))
+        acumulados.append(total)
+        cursor_fecha = siguiente
+    return tramos, acumulados
+
+
+def calcular_multa(dias, politica):
+    """Monto con la misma regla que motor_multas; None si no corresponde multa"""
+    if dias <= politica['dias_gracia']:
+        return None
+    monto = min(politica['monto_por_dia'] * dias, politica['multa_maxima'])
+    return monto.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+
+# ============================================================
+# Destinos: SQL Server directo o archivos para BULK INSERT
+# ============================================================
+
+class DestinoSqlServer:
+    """Acumula filas por tabla y las inserta por lotes en orden de claves foráneas"""
+
+    def __init__(self, conn, columnas, tamano_lote):
+        self.conn = conn
+        self.columnas = columnas
+        self.tamano_lote = tamano_lote
+        self.buffers = {tabla: [] for tabla in columnas}
+        self.conteos = {tabla: 0 for tabla in columnas}
+
+    def agregar(self, tabla, fila):
+        buffer = self.buffers[tabla]
+        buffer.append(fila)
+        if len(buffer) >= self.tamano_lote:
+            self.vaciar()
+
+    def vaciar(self):
+        cursor = self.conn.cursor()
+        cursor.fast_executemany = True
+        for tabla, filas in self.buffers.items():
+            if not filas:
+                continue
+            columnas = self.columnas[tabla]
+            cursor.execute(f"SET IDENTITY_INSERT {tabla} ON")
+            cursor.executemany(
+                f"INSERT INTO {tabla} ({', '.join(columnas)}) VALUES ({', '.join('?' for _ in columnas)})", filas)
+            cursor.execute(f"SET IDENTITY_INSERT {tabla} OFF")
+            self.conteos[tabla] += len(filas)
+            filas.clear()
+        self.conn.commit()
+
+    def marcar_prestados(self, ejemplares):
+        cursor = self.conn.cursor()
+        cursor.fast_executemany = True
+        cursor.execute("""
+            IF OBJECT_ID('tempdb..#EjemplaresSinteticos') IS NOT NULL DROP TABLE #EjemplaresSinteticos;
+            CREATE TABLE #EjemplaresSinteticos (EjemplarID INT PRIMARY KEY);
+        """)
+        if ejemplares:
+            cursor.executemany("INSERT INTO #EjemplaresSinteticos (EjemplarID) VALUES (?)",
+                               [(e,) for e in ejemplares])
+        cursor.execute(MARCAR_PRESTADOS)
+        self.conn.commit()
+
+    def cerrar(self):
+        self.vaciar()
+
+
+class DestinoBcp:
+    """Escribe un archivo de texto por tabla y cargar_sinteticos.sql con los BULK INSERT"""
+
+    def __init__(self, directorio, columnas):
+        self.directorio = os.path.abspath(directorio)
+        self.columnas = columnas
+        os.makedirs(self.directorio, exist_ok=True)
+        self.archivos = {tabla: open(os.path.join(self.directorio, f'{tabla}.tsv'), 'w', encoding='utf-8', newline='\n')
+                         for tabla in columnas}
+        self.conteos = {tabla: 0 for tabla in columnas}
+
+    @staticmethod
+    def campo(valor):
+        if valor is None:
+            return ''
+        if isinstance(valor, datetime):
+            return valor.isoformat(timespec='seconds')
+        if isinstance(valor, bool):
+            return '1' if valor else '0'
+        return str(valor)
+
+    def agregar(self, tabla, fila):
+        self.archivos[tabla].write('\t'.join(self.campo(v) for v in fila) + '\n')
+        self.conteos[tabla] += 1
+
+    def marcar_prestados(self, ejemplares):
+        with open(os.path.join(self.directorio, 'EjemplaresPrestados.tsv'), 'w', encoding='utf-8', newline='\n') as f:
+            f.writelines(f'{e}\n' for e in ejemplares)
+
+    def cerrar(self):
+        for archivo in self.archivos.values():
+            archivo.close()
+        opciones = ("FIELDTERMINATOR = '\\t', ROWTERMINATOR = '0x0a', CODEPAGE = '65001', "
+                    "KEEPIDENTITY, KEEPNULLS, TABLOCK, BATCHSIZE = 100000")
+        lineas = ['-- Generado por generador_circulacion.py: ejecutar en el servidor con acceso a estos archivos',
+                  'USE BibliotecaFISI;', 'GO', '']
+        for tabla, columnas in self.columnas.items():
+            # Vista con las columnas del archivo, para no depender del orden de columnas de la tabla
+            lineas += [f"IF OBJECT_ID('dbo.Carga{tabla}', 'V') IS NOT NULL DROP VIEW dbo.Carga{tabla};", 'GO',
+                       f"CREATE VIEW dbo.Carga{tabla} AS SELECT {', '.join(columnas)} FROM dbo.{tabla};", 'GO',
+                       f"BULK INSERT dbo.Carga{tabla} FROM '{os.path.join(self.directorio, tabla + '.tsv')}' "
+                       f"WITH ({opciones});",
+                       f"DROP VIEW dbo.Carga{tabla};", 'GO', '']
+        lineas += ['CREATE TABLE #EjemplaresSinteticos (EjemplarID INT PRIMARY KEY);',
+                   f"BULK INSERT #EjemplaresSinteticos FROM '{os.path.join(self.directorio, 'EjemplaresPrestados.tsv')}' "
+                   "WITH (ROWTERMINATOR = '0x0a');",
+                   MARCAR_PRESTADOS.strip() + ';',
+                   'DROP TABLE #EjemplaresSinteticos;', 'GO', '']
+        with open(os.path.join(self.directorio, 'cargar_sinteticos.sql'), 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lineas))
+
+
+# ============================================================
+# Generación
+# ============================================================
+
+def leer_base(conn):
+    """Ejemplares disponibles [(EjemplarID, LibroID)], columnas extra de Notificaciones y los MAX de cada ID"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT EjemplarID, LibroID FROM Ejemplares WHERE Estado = 'Disponible' ORDER BY LibroID, EjemplarID")
+    ejemplares = [tuple(fila) for fila in cursor.fetchall()]
+    cursor.execute("SELECT COL_LENGTH('Notificaciones', 'EstadoEnvio')")
+    con_envio = cursor.fetchone()[0] is not None
+    maximos = {}
+    for tabla, clave in CLAVES.items():
+        cursor.execute(f"SELECT ISNULL(MAX({clave}), 0) FROM {tabla}")
+        maximos[tabla] = cursor.fetchone()[0]
+    return ejemplares, con_envio, maximos
+
+
+def lineas_de_tiempo(azar, ejemplares, total_prestamos, dias, tramos, acumulados, args):
+    """
+    Préstamos sin solapar por ejemplar; devuelve arreglos paralelos
+    (inicio, devolución o -1 si sigue prestado, índice del ejemplar)
+    """
+    peso_libro = {}
+    for _, libro_id in ejemplares:
+        if libro_id not in peso_libro:
+            peso_libro[libro_id] = azar.paretovariate(ALFA_LIBROS)
+    pesos = [peso_libro[libro_id] for _, libro_id in ejemplares]
+
+    # Un ejemplar no admite más préstamos de los que caben en el periodo: lo que
+    # excede su capacidad se reparte entre los demás (llenado por niveles)
+    # (con margen: en los meses altos los préstamos se empujan unos a otros)
+    duracion_media = ((1 - args.tasa_atraso) * args.dias_prestamo / 2
+                      + args.tasa_atraso * (args.dias_prestamo + 1 + args.media_atraso) + 0.5)
+    capacidad = dias / duracion_media * 0.6
+    esperados = [0.0] * len(ejemplares)
+    libres = list(range(len(ejemplares)))
+    restante = total_prestamos
+    while libres and restante > 0:
+        escala = restante / sum(pesos[i] for i in libres)
+        saturados = [i for i in libres if pesos[i] * escala > capacidad]
+        if not saturados:
+            for i in libres:
+                esperados[i] = pesos[i] * escala
+            break
+        for i in saturados:
+            esperados[i] = capacidad
+        restante -= capacidad * len(saturados)
+        libres = [i for i in libres if pesos[i] * escala <= capacidad]
+
+    inicios, fines, indices = array('d'), array('d'), array('i')
+    for indice, esperado in enumerate(esperados):
+        cantidad = int(esperado) + (azar.random() < esperado - int(esperado))
+        if cantidad == 0:
+            continue
+        fechas = sorted(azar.uniform(*tramo) for tramo in azar.choices(tramos, cum_weights=acumulados, k=cantidad))
+        fin_anterior = -1.0
+        for inicio in fechas:
+            # El ejemplar vuelve al estante unas horas después de la devolución
+            inicio = max(inicio, fin_anterior + azar.uniform(0.05, 1.0))
+            if inicio >= dias:
+                break
+            if azar.random() < args.tasa_atraso:
+                fin = inicio + args.dias_prestamo + 1 + azar.expovariate(1 / args.media_atraso)
+            else:
+                fin = inicio + azar.uniform(0.05, args.dias_prestamo)
+            prestado = fin >= dias
+            inicios.append(inicio)
+            fines.append(-1.0 if prestado else fin)
+            indices.append(indice)
+            if prestado:
+                break
+            fin_anterior = fin
+    return inicios, fines, indices
+
+
+def generar(destino, ejemplares, con_envio, maximos, args, politica):
+    azar = random.Random(args.semilla)
+    ahora = datetime.now().replace(microsecond=0)
+    origen = ahora - timedelta(days=round(args.meses * 30.44))
+    dias = (ahora - origen).total_seconds() / 86400
+    conteos = {}
+
+    # Usuarios con su peso de actividad
+    roles = leer_distribucion(args.roles)
+    nombres_roles, pesos_roles = list(roles), list(roles.values())
+    contrasena_hash = hashlib.sha256(CONTRASENA_SINTETICA.encode('utf-8')).hexdigest()
+    ids_usuarios, actividad = [], []
+    for n in range(args.usuarios):
+        usuario_id = maximos['Usuarios'] + n + 1
+        rol = azar.choices(nombres_roles, weights=pesos_roles)[0]
+        registro = origen - timedelta(days=azar.randint(0, 1500), seconds=azar.randint(0, 86399))
+        codigo = f'{PREFIJO_CODIGO}{usuario_id:08d}'
+        destino.agregar('Usuarios', (usuario_id, codigo, f'Usuario Sintético {usuario_id}',
+                                     f'{codigo.lower()}@sintetico.unmsm.edu.pe', contrasena_hash, rol, True,
+                                     registro, registro))
+        ids_usuarios.append(usuario_id)
+        actividad.append(ACTIVIDAD_POR_ROL.get(rol, 1.0) * azar.paretovariate(ALFA_USUARIOS))
+    acumulada_usuarios = list(accumulate(actividad))
+
+    # Préstamos por ejemplar, luego en orden cronológico para que los IDs crezcan con la fecha
+    tramos, acumulados = meses_del_periodo(origen, ahora, leer_estacionalidad(args.estacionalidad))
+    conteos['prestamos_objetivo'] = round(args.usuarios * args.prestamos_por_usuario)
+    inicios, fines, indices = lineas_de_tiempo(
+        azar, ejemplares, conteos['prestamos_objetivo'], dias, tramos, acumulados, args)
+    orden = sorted(range(len(inicios)), key=inicios.__getitem__)
+
+    reserva_id, prestamo_id = maximos['Reservas'], maximos['Prestamos']
+    multa_id, notificacion_id = maximos['Multas'], maximos['Notificaciones']
+    prestados = []
+    for desde in range(0, len(orden), TAMANO_LOTE):
+        bloque = orden[desde:desde + TAMANO_LOTE]
+        usuarios = azar.choices(ids_usuarios, cum_weights=acumulada_usuarios, k=len(bloque))
+        for i, usuario_id in zip(bloque, usuarios):
+            ejemplar_id, libro_id = ejemplares[indices[i]]
+            fecha_prestamo = origen + timedelta(days=inicios[i])
+            fecha_reserva = fecha_prestamo - timedelta(hours=azar.uniform(0.5, 48))
+            vencimiento = fecha_prestamo + timedelta(days=args.dias_prestamo)
+            devolucion = origen + timedelta(days=fines[i]) if fines[i] >= 0 else None
+            if devolucion is not None:
+                estado = 'Devuelto'
+            else:
+                # Sin devolver siempre 'Prestado': el atraso se calcula por FechaVencimiento,
+                # igual que en el backend, que solo devuelve y renueva préstamos 'Prestado'
+                estado = 'Prestado'
+                prestados.append((ejemplar_id, libro_id))
+
+            reserva_id += 1
+            prestamo_id += 1
+            destino.agregar('Reservas', (reserva_id, usuario_id, libro_id, fecha_reserva, 'Completada', None, 1,
+                                         ejemplar_id, 'Leida', fecha_reserva + timedelta(days=2), 'Retiro'))
+            destino.agregar('Prestamos', (prestamo_id, reserva_id, fecha_prestamo, vencimiento, devolucion, estado,
+                                          0, 0, None, fecha_prestamo, devolucion or fecha_prestamo))
+
+            # Días de atraso como DATEDIFF(DAY, FechaVencimiento, ...) del motor de multas
+            dias_atraso = ((devolucion or ahora).date() - vencimiento.date()).days
+            monto = calcular_multa(dias_atraso, politica)
+            if monto is None:
+                continue
+            motivo = f'{PREFIJO_MOTIVO} - {dias_atraso} día(s) de atraso'
+            generada = vencimiento + timedelta(days=politica['dias_gracia'] + 1)
+            if devolucion is not None:
+                generada = min(generada, devolucion)
+            pagada = devolucion is not None and azar.random() < TASA_PAGO
+            cobro = devolucion + timedelta(days=azar.uniform(0, 30)) if pagada else None
+            multa_id += 1
+            destino.agregar('Multas', (multa_id, prestamo_id, usuario_id, monto, 'Pagada' if pagada else 'Pendiente',
+                                       dias_atraso, motivo, min(cobro, ahora) if cobro else None))
+            leida = generada + timedelta(hours=azar.uniform(1, 72))
+            notificacion_id += 1
+            fila = (notificacion_id, reserva_id, usuario_id, 'MultaGenerada',
+                    f'Se te ha generado una multa de ${monto} por: {motivo} ({dias_atraso} día(s) de atraso)'[:500],
+                    generada, leida if leida < ahora else None, 'Leida' if leida < ahora else 'Pendiente')
+            # Sin la marca 'Omitida' el despachador enviaría por correo todas las multas sintéticas
+            destino.agregar('Notificaciones', fila + ('Omitida',) if con_envio else fila)
+    conteos['prestamos_activos'] = len(prestados)
+
+    # Colas de espera en los libros sin ejemplares disponibles
+    ejemplares_por_libro, prestados_por_libro = {}, {}
+    for _, libro_id in ejemplares:
+        ejemplares_por_libro[libro_id] = ejemplares_por_libro.get(libro_id, 0) + 1
+    for _, libro_id in prestados:
+        prestados_por_libro[libro_id] = prestados_por_libro.get(libro_id, 0) + 1
+    sin_disponibles = sorted(l for l, n in prestados_por_libro.items() if n == ejemplares_por_libro[l])
+    en_cola = 0
+    for libro_id in sin_disponibles:
+        if azar.random() >= args.tasa_cola:
+            continue
+        profundidad = min(1 + int(azar.expovariate(1 / max(args.cola_media - 1, 0.01))), args.cola_maxima)
+        fechas = sorted(ahora - timedelta(days=azar.uniform(0, 14)) for _ in range(profundidad))
+        usuarios = azar.choices(ids_usuarios, cum_weights=acumulada_usuarios, k=profundidad)
+        for prioridad, (fecha, usuario_id) in enumerate(zip(fechas, usuarios), 1):
+            reserva_id += 1
+            destino.agregar('Reservas', (reserva_id, usuario_id, libro_id, fecha, 'ColaEspera',
+                                         ahora + timedelta(days=azar.uniform(1, 7)), prioridad, None,
+                                         'Pendiente', None, 'ColaEspera'))
+        en_cola += profundidad
+    conteos['reservas_en_cola'] = en_cola
+
+    destino.cerrar()
+    destino.marcar_prestados([ejemplar_id for ejemplar_id, _ in prestados])
+    return conteos
+
+
+def limpiar(conn):
+    cursor = conn.cursor()
+    try:
+        for nombre, sql in LIMPIAR:
+            cursor.execute(sql)
+            print(f"  {nombre:<16} {cursor.rowcount:>10,} filas")
+        conn.commit()
+    except pyodbc.Error:
+        conn.rollback()
+        raise
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generar circulación sintética para pruebas de carga')
+    parser.add_argument('--usuarios', type=int, default=10000, help='Usuarios a crear (por defecto 10000)')
+    parser.add_argument('--prestamos-por-usuario', type=float, default=8.0,
+                        help='Media de préstamos por usuario en todo el periodo (por defecto 8)')
+    parser.add_argument('--roles', default=ROLES_POR_DEFECTO, help=f'Distribución de roles ({ROLES_POR_DEFECTO})')
+    parser.add_argument('--meses', type=int, default=24, help='Meses de historia (por defecto 24)')
+    parser.add_argument('--estacionalidad', default='semestral',
+                        help=f"Pesos mensuales: {', '.join(ESTACIONALIDAD)} o 12 números separados por coma")
+    parser.add_argument('--dias-prestamo', type=int, default=15, help='Plazo de préstamo en días (por defecto 15)')
+    parser.add_argument('--tasa-atraso', type=float, default=0.15, help='Fracción de préstamos devueltos tarde')
+    parser.add_argument('--media-atraso', type=float, default=4.0, help='Días medios de atraso (por defecto 4)')
+    parser.add_argument('--tasa-cola', type=float, default=0.5,
+                        help='Fracción de libros sin ejemplares disponibles que tienen cola de espera')
+    parser.add_argument('--cola-media', type=float, default=3.0, help='Profundidad media de las colas')
+    parser.add_argument('--cola-maxima', type=int, default=20, help='Profundidad máxima de una cola')
+    parser.add_argument('--semilla', type=int, default=42, help='Semilla del generador')
+    parser.add_argument('--lote', type=int, default=TAMANO_LOTE, help=f'Filas por lote (por defecto {TAMANO_LOTE})')
+    parser.add_argument('--bcp', nargs='?', const=DIRECTORIO_BCP, default=None, metavar='DIRECTORIO',
+                        help='Escribir archivos para BULK INSERT en lugar de insertar')
+    parser.add_argument('--limpiar', action='store_true', help='Borrar los datos sintéticos generados antes')
+    args = parser.parse_args()
+    try:
+        leer_estacionalidad(args.estacionalidad)
+        leer_distribucion(args.roles)
+    except ValueError as e:
+        parser.error(str(e))
+
+    print("="*60)
+    print("LIMPIEZA DE CIRCULACIÓN SINTÉTICA" if args.limpiar else "GENERADOR DE CIRCULACIÓN SINTÉTICA")
+    print("="*60)
+
+    conn = conectar_bd()
+    try:
+        if args.limpiar:
+            limpiar(conn)
+            print("[OK] Datos sintéticos eliminados")
+            return
+
+        ejemplares, con_envio, maximos = leer_base(conn)
+        if not ejemplares:
+            print("[ERROR] No hay ejemplares Disponible; carga primero el catálogo (cargar_datos_completos.py)")
+            sys.exit(1)
+        print(f"[INFO] {len(ejemplares):,} ejemplares disponibles; "
+              f"{args.usuarios:,} usuarios x {args.prestamos_por_usuario} préstamos en {args.meses} meses")
+
+        columnas = dict(COLUMNAS)
+        if con_envio:
+            columnas['Notificaciones'] = COLUMNAS['Notificaciones'] + ('EstadoEnvio',)
+        if args.bcp:
+            destino = DestinoBcp(args.bcp, columnas)
+        else:
+            destino = DestinoSqlServer(conn, columnas, args.lote)
+
+        inicio = time.perf_counter()
+        conteos = generar(destino, ejemplares, con_envio, maximos, args, cargar_politica())
+        segundos = time.perf_counter() - inicio
+    except pyodbc.Error as e:
+        print(f"[ERROR] Error de base de datos: {e}")
+        sys.exit(1)
+    finally:
+        conn.close()
+
+    total = sum(destino.conteos.values())
+    for tabla, filas in destino.conteos.items():
+        print(f"  {tabla:<16} {filas:>10,} filas")
+    print(f"[INFO] {conteos['prestamos_activos']:,} préstamos activos, {conteos['reservas_en_cola']:,} reservas en cola")
+    if destino.conteos['Prestamos'] < conteos['prestamos_objetivo'] * 0.9:
+        print(f"[WARN] Se pidieron {conteos['prestamos_objetivo']:,} préstamos pero los ejemplares no admiten más "
+              f"en {args.meses} meses; aumenta --meses o carga más ejemplares")
+    print(f"[OK] {total:,} filas en {segundos:.1f} s ({total / max(segundos, 1e-9):,.0f} filas/s)")
+    if args.bcp:
+        print(f"[GUARDADO] {os.path.join(os.path.abspath(args.bcp), 'cargar_sinteticos.sql')}")
+        print("[INFO] Ejecutarlo con sqlcmd en el servidor (las rutas deben ser visibles para SQL Server)")
+
+
+if __name__ == "__main__":
+    main()
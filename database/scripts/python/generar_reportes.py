@@ -10,9 +10,17 @@ from datetime import datetime, timedelta
 import json
 import sys
 import io
+import os
+import tempfile
+import argparse
+
+from cache_reportes import CacheReportes, versiones_tablas, ejecutar_con_cache, DEPENDENCIAS_REPORTES, TTL_POR_DEFECTO
+from historial_reportes import registrar_snapshot
+import analitica_prestamos
 
 # Configurar salida UTF-8 para Windows
-if sys.platform == 'win32':
+# (solo una vez: otros scripts importan este módulo y volver a envolver stdout lo cerraría)
+if sys.platform == 'win32' and (sys.stdout.encoding or '').lower() != 'utf-8':
     sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
 
 # Configuración de conexión
@@ -50,6 +58,24 @@ def conectar_bd():
         print("   3. Tengas permisos de acceso")
         sys.exit(1)
 
+# Última conexión consultada y sus columnas de Prestamos
+_columnas_prestamos = (None, None)
+
+def columnas_prestamos(conn):
+    """Columnas de Prestamos (se consultan una sola vez por conexión y se comparten entre reportes)"""
+    global _columnas_prestamos
+    conexion, columnas = _columnas_prestamos
+    if conexion is not conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT COLUMN_NAME 
+            FROM INFORMATION_SCHEMA.COLUMNS 
+            WHERE TABLE_NAME = 'Prestamos'
+        """)
+        columnas = [row[0] for row in cursor.fetchall()]
+        _columnas_prestamos = (conn, columnas)
+    return columnas
+
 def reporte_estadisticas_generales(conn):
     """Reporte 1: Estadísticas Generales"""
     cursor = conn.cursor()
@@ -66,14 +92,6 @@ def reporte_estadisticas_generales(conn):
     cursor.execute("SELECT COUNT(*) FROM Ejemplares")
     total_ejemplares = cursor.fetchone()[0]
     
-    # Detectar estructura de Prestamos
-    cursor.execute("""
-        SELECT COLUMN_NAME 
-        FROM INFORMATION_SCHEMA.COLUMNS 
-        WHERE TABLE_NAME = 'Prestamos'
-    """)
-    columnas_prestamos = [row[0] for row in cursor.fetchall()]
-    
     # Préstamos activos
     cursor.execute("""
         SELECT COUNT(*) FROM Prestamos 
@@ -124,13 +142,10 @@ def reporte_prestamos_por_mes(conn, año=None):
         ORDER BY mes
     """, año)
     
-    meses_nombres = ['Ene', 'Feb', 'Mar', 'Abr', 'May', 'Jun', 
-                     'Jul', 'Ago', 'Sep', 'Oct', 'Nov', 'Dic']
-    
-    resultados = {mes: 0 for mes in meses_nombres}
+    resultados = {mes: 0 for mes in MESES_NOMBRES}
     for row in cursor.fetchall():
         mes_idx = row[0] - 1
-        resultados[meses_nombres[mes_idx]] = row[1]
+        resultados[MESES_NOMBRES[mes_idx]] = row[1]
     
     return resultados
 
@@ -139,12 +154,7 @@ def reporte_libros_mas_prestados(conn, limite=10):
     cursor = conn.cursor()
     
     # Detectar estructura de Prestamos
-    cursor.execute("""
-        SELECT COLUMN_NAME 
-        FROM INFORMATION_SCHEMA.COLUMNS 
-        WHERE TABLE_NAME = 'Prestamos'
-    """)
-    columnas = [row[0] for row in cursor.fetchall()]
+    columnas = columnas_prestamos(conn)
     
     # Si tiene ReservaID, usar estructura nueva
     if 'ReservaID' in columnas:
@@ -185,12 +195,7 @@ def reporte_usuarios_mas_activos(conn, limite=10):
     cursor = conn.cursor()
     
     # Detectar estructura de Prestamos
-    cursor.execute("""
-        SELECT COLUMN_NAME 
-        FROM INFORMATION_SCHEMA.COLUMNS 
-        WHERE TABLE_NAME = 'Prestamos'
-    """)
-    columnas = [row[0] for row in cursor.fetchall()]
+    columnas = columnas_prestamos(conn)
     
     # Si tiene ReservaID, usar estructura nueva
     if 'ReservaID' in columnas:
@@ -352,6 +357,225 @@ def reporte_rendimiento_biblioteca(conn, meses=6):
         'tasa_pago_multas': round(tasa_pago_multas, 2)
     }
 
+MESES_NOMBRES = ['Ene', 'Feb', 'Mar', 'Abr', 'May', 'Jun',
+                 'Jul', 'Ago', 'Sep', 'Oct', 'Nov', 'Dic']
+
+# Entidades que se pueden rankear por período: (join de estructura nueva, join de estructura antigua,
+# (columna id, columna etiqueta, campo id, campo etiqueta))
+ENTIDADES_RANKING = {
+    'libros': (
+        "INNER JOIN Reservas r ON p.ReservaID = r.ReservaID INNER JOIN Libros x ON r.LibroID = x.LibroID",
+        "INNER JOIN Ejemplares e ON p.EjemplarID = e.EjemplarID INNER JOIN Libros x ON e.LibroID = x.LibroID",
+        ('x.LibroID', 'x.Titulo', 'libro_id', 'titulo'),
+    ),
+    'usuarios': (
+        "INNER JOIN Reservas r ON p.ReservaID = r.ReservaID INNER JOIN Usuarios x ON r.UsuarioID = x.UsuarioID",
+        "INNER JOIN Usuarios x ON p.UsuarioID = x.UsuarioID",
+        ('x.UsuarioID', 'x.Nombre', 'usuario_id', 'nombre'),
+    ),
+}
+
+# Expresión SQL del número de período dentro del año y etiquetas de cada período
+PERIODOS_RANKING = {
+    'mes': ("MONTH(p.FechaPrestamo)", MESES_NOMBRES),
+    'semestre': ("(MONTH(p.FechaPrestamo) - 1) / 6 + 1", ['S1', 'S2']),
+}
+
+def reporte_ranking_por_periodo(conn, entidad, año=None, limite=10, periodo='mes'):
+    """
+    Top N de libros o usuarios para cada mes/semestre de un año.
+    Una sola consulta: los préstamos del año se agrupan por período y entidad,
+    y ROW_NUMBER() OVER (PARTITION BY período) deja solo los N primeros de cada uno.
+    """
+    if año is None:
+        año = datetime.now().year
+
+    join_nuevo, join_antiguo, (columna_id, columna_etiqueta, campo_id, campo) = ENTIDADES_RANKING[entidad]
+    expresion_periodo, etiquetas = PERIODOS_RANKING[periodo]
+    join = join_nuevo if 'ReservaID' in columnas_prestamos(conn) else join_antiguo
+
+    cursor = conn.cursor()
+    # Rango de fechas en vez de YEAR(...) = ? para que pueda usar un índice sobre FechaPrestamo
+    cursor.execute(f"""
+        WITH conteos AS (
+            SELECT
+                {expresion_periodo} AS periodo,
+                {columna_id} AS id,
+                {columna_etiqueta} AS etiqueta,
+                COUNT(*) AS total
+            FROM Prestamos p
+            {join}
+            WHERE p.FechaPrestamo >= ? AND p.FechaPrestamo < ?
+            GROUP BY {expresion_periodo}, {columna_id}, {columna_etiqueta}
+        ),
+        ranking AS (
+            SELECT periodo, id, etiqueta, total,
+                   ROW_NUMBER() OVER (PARTITION BY periodo ORDER BY total DESC, id) AS puesto
+            FROM conteos
+        )
+        SELECT periodo, puesto, id, etiqueta, total
+        FROM ranking
+        WHERE puesto <= ?
+        ORDER BY periodo, puesto
+    """, datetime(año, 1, 1), datetime(año + 1, 1, 1), limite)
+
+    ranking = {etiqueta: [] for etiqueta in etiquetas}
+    series = {}
+    for row in cursor.fetchall():
+        indice = int(row[0]) - 1
+        ranking[etiquetas[indice]].append({'puesto': row[1], campo_id: row[2], campo: row[3], 'prestamos': row[4]})
+        # Series para graficar: un valor por período (None si ese período no estuvo en el top).
+        # Por id: dos libros con el mismo título son series distintas
+        serie = series.setdefault(row[2], {campo_id: row[2], campo: row[3], 'valores': [None] * len(etiquetas)})
+        serie['valores'][indice] = row[4]
+
+    return {
+        'año': año,
+        'periodo': periodo,
+        'limite': limite,
+        'periodos': etiquetas,
+        'ranking': ranking,
+        'series': list(series.values()),
+    }
+
+def reporte_libros_mas_prestados_por_periodo(conn, año=None, limite=10, periodo='mes'):
+    """Reporte 8: Libros Más Prestados por Período"""
+    return reporte_ranking_por_periodo(conn, 'libros', año, limite, periodo)
+
+def reporte_usuarios_mas_activos_por_periodo(conn, año=None, limite=10, periodo='mes'):
+    """Reporte 9: Usuarios Más Activos por Período"""
+    return reporte_ranking_por_periodo(conn, 'usuarios', año, limite, periodo)
+
+# Niveles de GROUPING_ID(Clase, Subclase, Seccion) en el ROLLUP
+NIVELES_LCC = {0: 'seccion', 1: 'subclase', 3: 'clase', 7: 'total'}
+
+def consulta_base_lcc(conn):
+    """
+    CTE por libro con su jerarquía LCC, ejemplares y préstamos del período.
+    Ejemplares y préstamos se agregan por libro antes del join para no multiplicar filas.
+    Los libros que aún no están en JerarquiaLCC quedan como 'Sin clasificar'.
+    """
+    if 'ReservaID' in columnas_prestamos(conn):
+        libro, join = "r.LibroID", "INNER JOIN Reservas r ON p.ReservaID = r.ReservaID"
+    else:
+        libro, join = "e.LibroID", "INNER JOIN Ejemplares e ON p.EjemplarID = e.EjemplarID"
+
+    return f"""
+        WITH ejemplares_libro AS (
+            SELECT LibroID,
+                   SUM(CASE WHEN ISNULL(Estado, '') <> 'Baja' THEN 1 ELSE 0 END) AS activos,
+                   SUM(CASE WHEN Estado = 'Disponible' THEN 1 ELSE 0 END) AS disponibles
+            FROM Ejemplares
+            GROUP BY LibroID
+        ),
+        prestamos_libro AS (
+            SELECT {libro} AS LibroID, COUNT(*) AS total
+            FROM Prestamos p
+            {join}
+            WHERE p.FechaPrestamo >= ?
+            GROUP BY {libro}
+        ),
+        base AS (
+            SELECT COALESCE(j.Clase, '-') AS Clase,
+                   COALESCE(j.NombreClase, 'Sin clasificar') AS NombreClase,
+                   COALESCE(j.Subclase, '-') AS Subclase,
+                   COALESCE(j.Seccion, 'Sin clasificar') AS Seccion,
+                   ISNULL(e.activos, 0) AS activos,
+                   ISNULL(e.disponibles, 0) AS disponibles,
+                   ISNULL(pr.total, 0) AS prestamos
+            FROM Libros l
+            LEFT JOIN JerarquiaLCC j ON l.LibroID = j.LibroID
+            LEFT JOIN ejemplares_libro e ON l.LibroID = e.LibroID
+            LEFT JOIN prestamos_libro pr ON l.LibroID = pr.LibroID
+        )
+    """
+
+def filas_lcc_rollup(conn, fecha_inicio):
+    """SQL Server: todos los niveles en una sola consulta con ROLLUP"""
+    cursor = conn.cursor()
+    cursor.execute(consulta_base_lcc(conn) + """
+        SELECT Clase, MAX(NombreClase), Subclase, Seccion,
+               GROUPING_ID(Clase, Subclase, Seccion) AS nivel,
+               COUNT(*), SUM(activos), SUM(disponibles), SUM(prestamos)
+        FROM base
+        GROUP BY ROLLUP (Clase, Subclase, Seccion)
+    """, fecha_inicio)
+    return [tuple(row) for row in cursor.fetchall()]
+
+def filas_lcc_por_seccion(conn, fecha_inicio):
+    """
+    Réplica SQLite (no tiene ROLLUP): se agrupa por sección y los
+    subtotales de subclase, clase y total se suman en Python
+    """
+    cursor = conn.cursor()
+    cursor.execute(consulta_base_lcc(conn) + """
+        SELECT Clase, MAX(NombreClase), Subclase, Seccion, 0,
+               COUNT(*), SUM(activos), SUM(disponibles), SUM(prestamos)
+        FROM base
+        GROUP BY Clase, Subclase, Seccion
+    """, fecha_inicio)
+    filas = [tuple(row) for row in cursor.fetchall()]
+
+    subtotales = {}
+    for clase, nombre, subclase, _, _, *metricas in filas:
+        for clave in ((clase, nombre, subclase, None, 1), (clase, nombre, None, None, 3), (None, None, None, None, 7)):
+            acumulado = subtotales.setdefault(clave, [0, 0, 0, 0])
+            for i, valor in enumerate(metricas):
+                acumulado[i] += valor
+    return filas + [clave + tuple(metricas) for clave, metricas in subtotales.items()]
+
+def metricas_lcc(libros, activos, disponibles, prestamos):
+    """Métricas de un nodo de la jerarquía"""
+    return {
+        'libros': libros,
+        'ejemplares_activos': activos,
+        'ejemplares_disponibles': disponibles,
+        'disponibilidad': round(disponibles / activos * 100, 2) if activos else 0,
+        'prestamos': prestamos,
+        'prestamos_por_ejemplar': round(prestamos / activos, 2) if activos else 0,
+    }
+
+def reporte_circulacion_por_lcc(conn, meses=6):
+    """
+    Reporte 11: Circulación por Materia (LCC)
+    Préstamos, ejemplares activos y disponibilidad por clase, subclase y sección,
+    sobre la tabla JerarquiaLCC que llena el cargador del catálogo.
+    """
+    fecha_inicio = datetime.now() - timedelta(days=meses*30)
+    if getattr(conn, 'dialecto', 'sqlserver') == 'sqlite':
+        filas = filas_lcc_por_seccion(conn, fecha_inicio)
+    else:
+        filas = filas_lcc_rollup(conn, fecha_inicio)
+
+    total = metricas_lcc(0, 0, 0, 0)
+    clases, subclases, secciones = {}, {}, []
+    for clase, nombre, subclase, seccion, nivel, *valores in filas:
+        nodo = metricas_lcc(*valores)
+        nivel = NIVELES_LCC[nivel]
+        if nivel == 'total':
+            total = nodo
+        elif nivel == 'clase':
+            clases[clase] = dict({'clase': clase, 'nombre': nombre}, **nodo, subclases=[])
+        elif nivel == 'subclase':
+            subclases[(clase, subclase)] = dict({'subclase': subclase}, **nodo, secciones=[])
+        else:
+            secciones.append(((clase, subclase), dict({'seccion': seccion}, **nodo)))
+
+    # Armar el árbol; en cada nivel primero lo que más circula
+    por_prestamos = lambda nodo: (-nodo['prestamos'], -nodo['libros'])
+    for padre, seccion in sorted(secciones, key=lambda s: por_prestamos(s[1])):
+        subclases[padre]['secciones'].append(seccion)
+    for (clase, _), subclase in sorted(subclases.items(), key=lambda s: por_prestamos(s[1])):
+        clases[clase]['subclases'].append(subclase)
+
+    return {
+        'periodo': f'{meses} meses',
+        'fecha_inicio': str(fecha_inicio.date()),
+        'fecha_fin': str(datetime.now().date()),
+        'total': total,
+        'clases': sorted(clases.values(), key=por_prestamos),
+    }
+
 def imprimir_reporte_1(datos):
     """Imprimir Reporte 1: Estadísticas Generales"""
     print("\n" + "="*60)
@@ -430,74 +654,284 @@ def imprimir_reporte_7(datos):
     print(f"  Multas pagadas:           {datos['multas_pagadas']:,}")
     print(f"  Tasa de pago multas:      {datos['tasa_pago_multas']:.2f}%")
 
-def guardar_json(todos_reportes, archivo='reportes_biblioteca.json'):
+def imprimir_reporte_11(datos):
+    """Imprimir Reporte 11: Circulación por Materia (LCC)"""
+    print("\n" + "="*60)
+    print("[REPORTE 11] CIRCULACION POR MATERIA (LCC)")
+    print("="*60)
+    print(f"  Período:                  {datos['periodo']} ({datos['fecha_inicio']} a {datos['fecha_fin']})")
+    total = datos['total']
+    print(f"  Total préstamos:          {total['prestamos']:,}")
+    print(f"  Ejemplares activos:       {total['ejemplares_activos']:,} ({total['disponibilidad']:.1f}% disponibles)")
+    print(f"\n  {'Materia':38s} {'Prést.':>7s} {'Ejempl.':>7s} {'Disp.%':>7s}")
+    fila = lambda etiqueta, nodo: print(
+        f"  {etiqueta[:38]:38s} {nodo['prestamos']:7,d} {nodo['ejemplares_activos']:7,d} {nodo['disponibilidad']:6.1f}%"
+    )
+    for clase in datos['clases']:
+        fila(f"{clase['clase']} {clase['nombre']}", clase)
+        for subclase in clase['subclases']:
+            fila(f"  {subclase['subclase']}", subclase)
+            for seccion in subclase['secciones'][:5]:
+                fila(f"    {seccion['seccion']}", seccion)
+
+# Registro de reportes: función, parámetros que acepta y cómo imprimirlo en texto
+REPORTES = {
+    'estadisticas_generales': {
+        'funcion': reporte_estadisticas_generales,
+        'parametros': (),
+        'imprimir': lambda datos, p: imprimir_reporte_1(datos),
+    },
+    'prestamos_por_mes': {
+        'funcion': reporte_prestamos_por_mes,
+        'parametros': ('año',),
+        'imprimir': lambda datos, p: imprimir_reporte_2(datos, p['año']),
+    },
+    'libros_mas_prestados': {
+        'funcion': reporte_libros_mas_prestados,
+        'parametros': ('limite',),
+        'imprimir': lambda datos, p: imprimir_reporte_3(datos),
+    },
+    'usuarios_mas_activos': {
+        'funcion': reporte_usuarios_mas_activos,
+        'parametros': ('limite',),
+        'imprimir': lambda datos, p: imprimir_reporte_4(datos),
+    },
+    'estadisticas_por_rol': {
+        'funcion': reporte_estadisticas_por_rol,
+        'parametros': (),
+        'imprimir': lambda datos, p: imprimir_reporte_5(datos),
+    },
+    'actividad_diaria': {
+        'funcion': reporte_actividad_diaria,
+        'parametros': ('fecha',),
+        'imprimir': lambda datos, p: imprimir_reporte_6(datos),
+    },
+    'rendimiento_biblioteca': {
+        'funcion': reporte_rendimiento_biblioteca,
+        'parametros': ('meses',),
+        'imprimir': lambda datos, p: imprimir_reporte_7(datos),
+    },
+    'libros_mas_prestados_por_periodo': {
+        'funcion': reporte_libros_mas_prestados_por_periodo,
+        'parametros': ('año', 'limite', 'periodo'),
+        'imprimir': lambda datos, p: imprimir_ranking_por_periodo(datos, 8, 'LIBROS MAS PRESTADOS', 'titulo'),
+    },
+    'usuarios_mas_activos_por_periodo': {
+        'funcion': reporte_usuarios_mas_activos_por_periodo,
+        'parametros': ('año', 'limite', 'periodo'),
+        'imprimir': lambda datos, p: imprimir_ranking_por_periodo(datos, 9, 'USUARIOS MAS ACTIVOS', 'nombre'),
+    },
+    'distribuciones_prestamos': {
+        'funcion': analitica_prestamos.reporte_distribuciones_prestamos,
+        'parametros': ('meses',),
+        'imprimir': lambda datos, p: analitica_prestamos.imprimir_distribuciones_prestamos(datos),
+    },
+    'circulacion_por_lcc': {
+        'funcion': reporte_circulacion_por_lcc,
+        'parametros': ('meses',),
+        'imprimir': lambda datos, p: imprimir_reporte_11(datos),
+    },
+}
+
+# La analítica de distribuciones necesita numpy (dependencia opcional)
+if analitica_prestamos.np is None:
+    del REPORTES['distribuciones_prestamos']
+
+def opciones_por_defecto():
+    """Valores por defecto de los parámetros comunes a los reportes"""
+    return {
+        'año': datetime.now().year,
+        'limite': 10,
+        'meses': 6,
+        'fecha': datetime.now().date(),
+        'periodo': 'mes',
+    }
+
+def parametros_reporte(nombre, opciones):
+    """Tomar de las opciones comunes solo los parámetros que usa el reporte"""
+    return {parametro: opciones[parametro] for parametro in REPORTES[nombre]['parametros']}
+
+def imprimir_ranking_por_periodo(datos, numero, titulo, campo):
+    """Imprimir Reportes 8 y 9: top de cada período (hasta 3 por línea)"""
+    print("\n" + "="*60)
+    print(f"[REPORTE {numero}] {titulo} POR {datos['periodo'].upper()} ({datos['año']})")
+    print("="*60)
+    for periodo in datos['periodos']:
+        top = datos['ranking'].get(periodo, [])
+        if not top:
+            print(f"  {periodo:3s}: -")
+            continue
+        primeros = ", ".join(f"{e['puesto']}. {e[campo][:25]} ({e['prestamos']})" for e in top[:3])
+        print(f"  {periodo:3s}: {primeros}")
+
+def escribir_atomico(archivo, contenido):
+    """
+    Escribir un archivo de forma atómica: se escribe en un temporal del mismo
+    directorio y luego se renombra, así un lector nunca ve un archivo a medias.
+    Acepta texto (se escribe en UTF-8) o bytes
+    """
+    directorio = os.path.dirname(os.path.abspath(archivo))
+    fd, temporal = tempfile.mkstemp(prefix='.' + os.path.basename(archivo) + '.', suffix='.tmp', dir=directorio)
+    try:
+        binario = isinstance(contenido, bytes)
+        with os.fdopen(fd, 'wb' if binario else 'w', encoding=None if binario else 'utf-8') as f:
+            f.write(contenido)
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp crea el archivo con permisos 0600; dejarlo legible como un archivo normal
+        os.chmod(temporal, 0o644)
+        os.replace(temporal, archivo)
+    except BaseException:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        raise
+
+def guardar_json(todos_reportes, archivo='reportes_biblioteca.json', silencioso=False):
     """Guardar todos los reportes en formato JSON"""
-    with open(archivo, 'w', encoding='utf-8') as f:
-        json.dump(todos_reportes, f, indent=2, ensure_ascii=False, default=str)
-    print(f"\n[GUARDADO] Reportes guardados en: {archivo}")
+    escribir_atomico(archivo, json.dumps(todos_reportes, indent=2, ensure_ascii=False, default=str))
+    if not silencioso:
+        print(f"\n[GUARDADO] Reportes guardados en: {archivo}")
+
+def parsear_argumentos():
+    """Parsear argumentos de línea de comandos"""
+    parser = argparse.ArgumentParser(description='Generador de reportes - Biblioteca FISI')
+    parser.add_argument('--sin-cache', action='store_true',
+                        help='Ignorar la caché de reportes y consultar siempre la base de datos')
+    parser.add_argument('--limpiar-cache', action='store_true',
+                        help='Vaciar la caché de reportes antes de generar')
+    parser.add_argument('--ttl', type=int, default=TTL_POR_DEFECTO,
+                        help=f'Segundos de vida de cada entrada de la caché (por defecto {TTL_POR_DEFECTO})')
+    parser.add_argument('--programado', action='store_true',
+                        help='Modo demonio: refrescar cada reporte según su propia cadencia')
+    parser.add_argument('--cadencia', action='append', default=[], metavar='REPORTE=SEGUNDOS',
+                        help='Cadencia de un reporte en modo programado (p.ej. actividad_diaria=300)')
+    parser.add_argument('--edad-maxima', type=int, default=None, metavar='SEGUNDOS',
+                        help='Modo programado: recalcular una sección con esta antigüedad aunque sus tablas '
+                             'no hayan cambiado (por defecto 3600)')
+    parser.add_argument('--salida', default=None,
+                        help='Archivo JSON de salida (por defecto reportes_biblioteca.json; '
+                             'con --only solo se escribe si se indica)')
+    parser.add_argument('--only', nargs='+', choices=list(REPORTES), metavar='REPORTE',
+                        help=f'Generar solo estos reportes ({", ".join(REPORTES)})')
+    parser.add_argument('--year', type=int, default=None, help='Año del reporte prestamos_por_mes')
+    parser.add_argument('--limit', type=int, default=None, help='Tamaño de los rankings (por defecto 10)')
+    parser.add_argument('--months', type=int, default=None, help='Meses del reporte rendimiento_biblioteca')
+    parser.add_argument('--period', choices=list(PERIODOS_RANKING), default=None,
+                        help='Período de los rankings por período (por defecto mes)')
+    parser.add_argument('--date', type=lambda v: datetime.strptime(v, '%Y-%m-%d').date(), default=None,
+                        help='Fecha del reporte actividad_diaria (YYYY-MM-DD)')
+    parser.add_argument('--format', dest='formato', choices=['text', 'json'], default='text',
+                        help='text: reportes impresos; json: solo el JSON por salida estándar')
+    parser.add_argument('--sin-historial', action='store_true',
+                        help='No agregar esta ejecución al historial de snapshots')
+    parser.add_argument('--backend', choices=['sqlserver', 'local'], default='sqlserver',
+                        help='Origen de datos: SQL Server o la réplica local (replica_local.py)')
+    return parser.parse_args()
+
+def conectar_backend(backend, log=print):
+    """Conectar al origen de datos elegido con --backend"""
+    if backend == 'local':
+        from replica_local import conectar_replica, ARCHIVO_REPLICA
+        log(f"\nAbriendo réplica local: {ARCHIVO_REPLICA}...")
+        conn = conectar_replica()
+        sincronizaciones = conn.estado().values()
+        if sincronizaciones:
+            log(f"[INFO] Última sincronización: {min(sincronizaciones)}")
+        return conn
+
+    log(f"\nConectando a {SERVIDOR} - Base de datos: {BASE_DATOS}...")
+    return conectar_bd()
 
 def main():
     """Función principal"""
-    print("="*60)
-    print("GENERADOR DE REPORTES - BIBLIOTECA FISI")
-    print("="*60)
-    print(f"\nConectando a {SERVIDOR} - Base de datos: {BASE_DATOS}...")
+    args = parsear_argumentos()
+
+    if args.programado:
+        from programador_reportes import ejecutar_programado
+        ejecutar_programado(args.salida or 'reportes_biblioteca.json', args.cadencia,
+                            historial=not args.sin_historial,
+                            conectar=lambda: conectar_backend(args.backend),
+                            edad_maxima=args.edad_maxima)
+        return
+
+    # Con --format json la salida estándar queda reservada para el JSON
+    def log(mensaje=''):
+        print(mensaje, file=sys.stderr if args.formato == 'json' else sys.stdout)
+
+    # Solo los reportes pedidos, en el orden del registro
+    seleccion = [nombre for nombre in REPORTES if not args.only or nombre in args.only]
+    completo = len(seleccion) == len(REPORTES)
+    salida = args.salida or ('reportes_biblioteca.json' if completo else None)
+
+    opciones = opciones_por_defecto()
+    for parametro, valor in (('año', args.year), ('limite', args.limit), ('meses', args.months), ('fecha', args.date),
+                             ('periodo', args.period)):
+        if valor is not None:
+            opciones[parametro] = valor
+
+    log("="*60)
+    log("GENERADOR DE REPORTES - BIBLIOTECA FISI")
+    log("="*60)
+    
+    conn = conectar_backend(args.backend, log)
+    log("[OK] Conexion exitosa!\n")
     
-    conn = conectar_bd()
-    print("[OK] Conexion exitosa!\n")
+    cache = None
+    if not args.sin_cache:
+        cache = CacheReportes(ttl=args.ttl)
+        if args.limpiar_cache:
+            cache.limpiar()
     
     try:
-        # Generar todos los reportes
-        print("Generando reportes...")
+        log(f"Generando reportes ({len(seleccion)} de {len(REPORTES)})...")
+        
+        # Versión de datos solo de las tablas que usan los reportes pedidos (una vez por ejecución)
+        versiones = {}
+        if cache is not None:
+            tablas = {t for nombre in seleccion for t in DEPENDENCIAS_REPORTES[nombre]}
+            versiones = versiones_tablas(conn, tablas)
         
-        r1 = reporte_estadisticas_generales(conn)
-        año_actual = datetime.now().year
-        r2 = reporte_prestamos_por_mes(conn, año_actual)
-        r3 = reporte_libros_mas_prestados(conn, 10)
-        r4 = reporte_usuarios_mas_activos(conn, 10)
-        r5 = reporte_estadisticas_por_rol(conn)
-        r6 = reporte_actividad_diaria(conn)
-        r7 = reporte_rendimiento_biblioteca(conn, 6)
+        resultados = {}
+        parametros = {}
+        for nombre in seleccion:
+            parametros[nombre] = parametros_reporte(nombre, opciones)
+            resultados[nombre], desde_cache = ejecutar_con_cache(
+                cache, conn, nombre, REPORTES[nombre]['funcion'], parametros[nombre], versiones
+            )
+            if desde_cache:
+                log(f"  [CACHE] {nombre}")
         
-        # Imprimir todos los reportes
-        imprimir_reporte_1(r1)
-        imprimir_reporte_2(r2, año_actual)
-        imprimir_reporte_3(r3)
-        imprimir_reporte_4(r4)
-        imprimir_reporte_5(r5)
-        imprimir_reporte_6(r6)
-        imprimir_reporte_7(r7)
+        if cache is not None:
+            log(f"  Caché: {cache.aciertos} acierto(s), {cache.fallos} fallo(s)")
         
-        # Guardar en JSON
-        todos_reportes = {
-            'fecha_generacion': datetime.now().isoformat(),
-            'estadisticas_generales': r1,
-            'prestamos_por_mes': r2,
-            'libros_mas_prestados': r3,
-            'usuarios_mas_activos': r4,
-            'estadisticas_por_rol': r5,
-            'actividad_diaria': r6,
-            'rendimiento_biblioteca': r7
-        }
+        todos_reportes = {'fecha_generacion': datetime.now().isoformat(), **resultados}
         
-        guardar_json(todos_reportes)
+        if args.formato == 'json':
+            print(json.dumps(todos_reportes, indent=2, ensure_ascii=False, default=str))
+        else:
+            for nombre in seleccion:
+                REPORTES[nombre]['imprimir'](resultados[nombre], parametros[nombre])
         
-        print("\n" + "="*60)
-        print("[OK] TODOS LOS REPORTES GENERADOS EXITOSAMENTE")
-        print("="*60)
+        if salida:
+            guardar_json(todos_reportes, salida, silencioso=args.formato == 'json')
+        # El historial solo guarda ejecuciones completas para que las series sean comparables
+        if completo and not args.sin_historial:
+            registrar_snapshot(todos_reportes)
+            log("[GUARDADO] Snapshot agregado al historial de reportes")
+        
+        log("\n" + "="*60)
+        log("[OK] REPORTES GENERADOS EXITOSAMENTE")
+        log("="*60)
         
     except Exception as e:
-        print(f"\n[ERROR] Error al generar reportes: {e}")
+        log(f"\n[ERROR] Error al generar reportes: {e}")
         import traceback
         traceback.print_exc()
+        sys.exit(1)
     finally:
+        if cache is not None:
+            cache.cerrar()
         conn.close()
 
 if __name__ == "__main__":
     main()
-
-
-
-
-
-
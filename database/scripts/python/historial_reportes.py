@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Historial de snapshots de reportes (solo agregar, comprimido)
+- Cada ejecución de generar_reportes agrega su JSON como un miembro gzip
+  independiente al final de historial/snapshots.jsonl.gz
+- Un índice sin comprimir (historial/snapshots.idx.jsonl) guarda por cada
+  snapshot: fecha, offset y longitud dentro del .gz, y sus métricas
+  numéricas aplanadas (p.ej. "estadisticas_generales.total_usuarios")
+- Las series temporales se leen solo del índice; un diff entre dos
+  snapshots descomprime únicamente esos dos miembros
+
+Uso:
+    python historial_reportes.py listar
+    python historial_reportes.py metricas
+    python historial_reportes.py serie rendimiento_biblioteca.total_prestamos --desde 2025-01-01
+    python historial_reportes.py diff anterior ultimo
+    python historial_reportes.py agregar reportes_biblioteca.json
+"""
+
+import argparse
+import gzip
+import json
+import os
+import sys
+from datetime import datetime
+
+DIRECTORIO_HISTORIAL = os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'historial')
+ARCHIVO_DATOS = 'snapshots.jsonl.gz'
+ARCHIVO_INDICE = 'snapshots.idx.jsonl'
+
+
+def aplanar_metricas(reportes):
+    """
+    Aplanar las métricas numéricas de un snapshot:
+    - dicts: "seccion.campo"
+    - listas de dicts (rankings, roles): "seccion.<etiqueta>.campo", donde la
+      etiqueta es el primer valor de texto del elemento
+    """
+    metricas = {}
+
+    def agregar(prefijo, valor):
+        if isinstance(valor, bool):
+            return
+        if isinstance(valor, (int, float)):
+            metricas[prefijo] = valor
+        elif isinstance(valor, dict):
+            for clave, sub in valor.items():
+                agregar(f"{prefijo}.{clave}", sub)
+        elif isinstance(valor, list):
+            for elemento in valor:
+                if not isinstance(elemento, dict):
+                    continue
+                etiqueta = next((v for v in elemento.values() if isinstance(v, str)), None)
+                if etiqueta is None:
+                    continue
+                for clave, sub in elemento.items():
+                    if isinstance(sub, (int, float)) and not isinstance(sub, bool):
+                        metricas[f"{prefijo}.{etiqueta}.{clave}"] = sub
+
+    for seccion, valor in reportes.items():
+        if seccion == 'fecha_generacion':
+            continue
+        agregar(seccion, valor)
+    return metricas
+
+
+class HistorialReportes:
+    """Almacén de snapshots: datos gzip multi-miembro + índice JSONL"""
+
+    def __init__(self, directorio=DIRECTORIO_HISTORIAL):
+        self.directorio = directorio
+        self.ruta_datos = os.path.join(directorio, ARCHIVO_DATOS)
+        self.ruta_indice = os.path.join(directorio, ARCHIVO_INDICE)
+        os.makedirs(directorio, exist_ok=True)
+
+    def agregar(self, reportes):
+        """Agregar un snapshot al final del historial; devuelve su entrada de índice"""
+        fecha = reportes.get('fecha_generacion') or datetime.now().isoformat()
+        contenido = json.dumps(reportes, ensure_ascii=False, default=str, sort_keys=True)
+        miembro = gzip.compress(contenido.encode('utf-8'))
+
+        # Primero los datos, luego el índice: si el proceso cae entre ambos,
+        # el miembro queda huérfano pero el índice nunca apunta a datos incompletos
+        with open(self.ruta_datos, 'ab') as f:
+            offset = f.seek(0, os.SEEK_END)
+            f.write(miembro)
+            f.flush()
+            os.fsync(f.fileno())
+
+        entrada = {
+            'fecha': str(fecha),
+            'offset': offset,
+            'longitud': len(miembro),
+            'metricas': aplanar_metricas(reportes),
+        }
+        with open(self.ruta_indice, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entrada, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        return entrada
+
+    def indice(self, desde=None, hasta=None):
+        """Leer las entradas del índice (opcionalmente filtradas por fecha ISO)"""
+        if not os.path.exists(self.ruta_indice):
+            return []
+        entradas = []
+        with open(self.ruta_indice, 'r', encoding='utf-8') as f:
+            for linea in f:
+                linea = linea.strip()
+                if not linea:
+                    continue
+                try:
+                    entrada = json.loads(linea)
+                except ValueError:
+                    # Línea truncada por una escritura interrumpida
+                    continue
+                if desde and entrada['fecha'] < desde:
+                    continue
+                if hasta and entrada['fecha'] > hasta:
+                    continue
+                entradas.append(entrada)
+        return entradas
+
+    def leer(self, entrada):
+        """Descomprimir solo el snapshot indicado"""
+        with open(self.ruta_datos, 'rb') as f:
+            f.seek(entrada['offset'])
+            miembro = f.read(entrada['longitud'])
+        return json.loads(gzip.decompress(miembro).decode('utf-8'))
+
+    def serie(self, metrica, desde=None, hasta=None):
+        """Serie temporal [(fecha, valor)] de una métrica, leída solo del índice"""
+        return [
+            (entrada['fecha'], entrada['metricas'].get(metrica))
+            for entrada in self.indice(desde, hasta)
+            if metrica in entrada['metricas']
+        ]
+
+    def metricas_disponibles(self):
+        nombres = set()
+        for entrada in self.indice():
+            nombres.update(entrada['metricas'])
+        return sorted(nombres)
+
+    def resolver(self, referencia, entradas=None):
+        """
+        Resolver una referencia a una entrada del índice:
+        'ultimo', 'anterior', un índice entero (-1, 0, ...) o un prefijo de fecha
+        """
+        entradas = self.indice() if entradas is None else entradas
+        if not entradas:
+            raise ValueError("El historial está vacío")
+        if referencia == 'ultimo':
+            return entradas[-1]
+        if referencia == 'anterior':
+            if len(entradas) < 2:
+                raise ValueError("No hay snapshot anterior")
+            return entradas[-2]
+        try:
+            posicion = int(referencia)
+        except ValueError:
+            posicion = None
+        if posicion is not None and -len(entradas) <= posicion < len(entradas):
+            return entradas[posicion]
+        for entrada in reversed(entradas):
+            if entrada['fecha'].startswith(referencia):
+                return entrada
+        raise ValueError(f"No se encontró un snapshot con fecha {referencia}")
+
+    def diff(self, referencia_a, referencia_b):
+        """Diferencias entre dos snapshots (métricas numéricas y rankings)"""
+        entradas = self.indice()
+        a = self.resolver(referencia_a, entradas)
+        b = self.resolver(referencia_b, entradas)
+
+        metricas = {}
+        for nombre in sorted(set(a['metricas']) | set(b['metricas'])):
+            antes = a['metricas'].get(nombre)
+            despues = b['metricas'].get(nombre)
+            if antes == despues:
+                continue
+            delta = despues - antes if antes is not None and despues is not None else None
+            metricas[nombre] = {'antes': antes, 'despues': despues, 'delta': delta}
+
+        # Los rankings solo se comparan descomprimiendo los dos snapshots
+        snapshot_a = self.leer(a)
+        snapshot_b = self.leer(b)
+        rankings = {}
+        for seccion in sorted(set(snapshot_a) | set(snapshot_b)):
+            lista_a = snapshot_a.get(seccion)
+            lista_b = snapshot_b.get(seccion)
+            if not isinstance(lista_a, list) or not isinstance(lista_b, list):
+                continue
+            etiquetas_a = [_etiqueta(e) for e in lista_a]
+            etiquetas_b = [_etiqueta(e) for e in lista_b]
+            if etiquetas_a == etiquetas_b:
+                continue
+            rankings[seccion] = {
+                'entran': [e for e in etiquetas_b if e not in etiquetas_a],
+                'salen': [e for e in etiquetas_a if e not in etiquetas_b],
+            }
+
+        return {'desde': a['fecha'], 'hasta': b['fecha'], 'metricas': metricas, 'rankings': rankings}
+
+
+def _etiqueta(elemento):
+    if isinstance(elemento, dict):
+        return next((v for v in elemento.values() if isinstance(v, str)), str(elemento))
+    return str(elemento)
+
+
+def registrar_snapshot(reportes, directorio=DIRECTORIO_HISTORIAL):
+    """Atajo usado por generar_reportes para agregar la ejecución actual"""
+    return HistorialReportes(directorio).agregar(reportes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Historial de snapshots de reportes')
+    parser.add_argument('--directorio', default=DIRECTORIO_HISTORIAL)
+    sub = parser.add_subparsers(dest='comando', required=True)
+
+    sub.add_parser('listar', help='Listar los snapshots registrados')
+    sub.add_parser('metricas', help='Listar las métricas disponibles')
+
+    p_serie = sub.add_parser('serie', help='Serie temporal de una métrica')
+    p_serie.add_argument('metrica')
+    p_serie.add_argument('--desde')
+    p_serie.add_argument('--hasta')
+    p_serie.add_argument('--formato', choices=['texto', 'json', 'csv'], default='texto')
+
+    p_diff = sub.add_parser('diff', help='Diferencias entre dos snapshots')
+    p_diff.add_argument('a', help="'anterior', 'ultimo', índice o prefijo de fecha")
+    p_diff.add_argument('b', help="'anterior', 'ultimo', índice o prefijo de fecha")
+
+    p_agregar = sub.add_parser('agregar', help='Agregar un JSON de reportes existente')
+    p_agregar.add_argument('archivo')
+
+    args = parser.parse_args()
+    historial = HistorialReportes(args.directorio)
+
+    try:
+        if args.comando == 'listar':
+            for i, entrada in enumerate(historial.indice()):
+                print(f"  {i:5d}  {entrada['fecha']}  ({entrada['longitud']:,} bytes)")
+
+        elif args.comando == 'metricas':
+            for nombre in historial.metricas_disponibles():
+                print(f"  {nombre}")
+
+        elif args.comando == 'serie':
+            serie = historial.serie(args.metrica, args.desde, args.hasta)
+            if args.formato == 'json':
+                print(json.dumps([{'fecha': f, 'valor': v} for f, v in serie], ensure_ascii=False, indent=2))
+            elif args.formato == 'csv':
+                print("fecha,valor")
+                for fecha, valor in serie:
+                    print(f"{fecha},{valor}")
+            else:
+                for fecha, valor in serie:
+                    print(f"  {fecha}  {valor}")
+
+        elif args.comando == 'diff':
+            print(json.dumps(historial.diff(args.a, args.b), ensure_ascii=False, indent=2))
+
+        elif args.comando == 'agregar':
+            with open(args.archivo, 'r', encoding='utf-8') as f:
+                entrada = historial.agregar(json.load(f))
+            print(f"[OK] Snapshot {entrada['fecha']} agregado al historial")
+
+    except ValueError as e:
+        print(f"[ERROR] {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Índice de búsqueda del catálogo (palabras + trigramas)
+- Normaliza títulos, autores e ISBN igual que cargar_datos_completos
+  (minúsculas, sin tildes, espacios colapsados): "LOGICA MATEMATICA  un
+  enfoque axiomatico" y "Lógica matemática" dan las mismas palabras
+- Índice invertido de palabras exactas y de trigramas de cada palabra
+  ("$lo", "log", ..., "ca$") para tolerar errores de tipeo
+- Listas de posteo compactas: índices de libro en 16 bits si el catálogo
+  tiene menos de 65536 libros (32 bits si no)
+- Se guarda en un solo archivo binario que se abre con mmap: abrir el
+  índice no copia las listas de posteo a memoria
+- Puntaje: 0.5 · peso (idf) de las palabras exactas encontradas
+         + 0.5 · fracción de trigramas de la consulta presentes en el libro
+
+Se reconstruye al final de cargar_datos_completos.py; también a mano:
+    python indice_busqueda.py                              # construir
+    python indice_busqueda.py --buscar "logica matematica"
+    python indice_busqueda.py --buscar "algoritmso" --limite 5
+
+Desde otro script:
+    from indice_busqueda import IndiceBusqueda
+    with IndiceBusqueda(ARCHIVO_INDICE) as indice:
+        indice.buscar("calculo stewart")   # [(LibroID, puntaje, título), ...]
+"""
+
+import argparse
+import math
+import mmap
+import os
+import re
+import struct
+import sys
+import time
+import unicodedata
+
+import numpy as np
+import pyodbc
+
+ARCHIVO_INDICE = os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'busqueda', 'indice_busqueda.bin')
+
+MAGIA = b'IBUS'
+FORMATO = 1
+# magia, formato, bytes por posteo, libros, palabras, trigramas, posteos, bytes de términos, bytes de títulos
+CABECERA = struct.Struct('<4sHHIIIIII')
+ALINEACION = 8
+
+# Puntaje mínimo para devolver un libro
+PUNTAJE_MINIMO = 0.3
+
+
+def normalizar_texto(texto):
+    """Minúsculas, sin tildes y con los espacios colapsados"""
+    texto = unicodedata.normalize('NFD', str(texto).lower()).encode('ascii', 'ignore').decode('ascii')
+    return re.sub(r'\s+', ' ', texto).strip()
+
+
+def palabras(texto):
+    """Palabras alfanuméricas de un texto ya normalizado"""
+    return re.findall(r'[a-z0-9]+', texto)
+
+
+def trigramas(palabra):
+    """Trigramas de una palabra con sus bordes marcados ('$')"""
+    relleno = f'${palabra}$'
+    return {relleno[i:i + 3] for i in range(len(relleno) - 2)}
+
+
+def secciones(cabecera):
+    """(nombre, dtype, cantidad) de cada arreglo del archivo, en orden"""
+    _, _, ancho, libros, n_palabras, n_trigramas, posteos, bytes_terminos, bytes_titulos = cabecera
+    return [
+        ('libro_ids', np.dtype('<u4'), libros),
+        ('trigramas_libro', np.dtype('<u2'), libros),
+        ('inicio_titulos', np.dtype('<u4'), libros + 1),
+        ('inicio_posteos', np.dtype('<u4'), n_palabras + n_trigramas + 1),
+        ('posteos', np.dtype(f'<u{ancho}'), posteos),
+        ('terminos', np.dtype('u1'), bytes_terminos),
+        ('titulos', np.dtype('u1'), bytes_titulos),
+    ]
+
+
+def desplazamientos(cabecera):
+    """Posición en bytes de cada sección (alineadas a 8 bytes)"""
+    posicion = CABECERA.size
+    resultado = {}
+    for nombre, tipo, cantidad in secciones(cabecera):
+        posicion += -posicion % ALINEACION
+        resultado[nombre] = posicion
+        posicion += tipo.itemsize * cantidad
+    return resultado, posicion
+
+
+def leer_documentos(conn):
+    """[(LibroID, título, texto normalizado con título, autores e ISBN)]"""
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT la.LibroID, a.Nombre
+        FROM LibroAutores la
+        INNER JOIN Autores a ON la.AutorID = a.AutorID
+        ORDER BY la.LibroID, ISNULL(la.OrdenAutor, 999)
+    """)
+    autores = {}
+    for libro_id, nombre in cursor.fetchall():
+        autores.setdefault(libro_id, []).append(nombre)
+
+    cursor.execute("SELECT LibroID, Titulo, ISBN FROM Libros ORDER BY LibroID")
+    documentos = []
+    for libro_id, titulo, isbn in cursor.fetchall():
+        partes = [titulo, *autores.get(libro_id, []), (isbn or '').replace('-', '')]
+        documentos.append((libro_id, titulo, normalizar_texto(' '.join(partes))))
+    return documentos
+
+
+def construir_indice(documentos):
+    """Armar el contenido binario del índice a partir de los documentos"""
+    posteos_palabras, posteos_trigramas = {}, {}
+    trigramas_libro = []
+    for indice, (_, _, texto) in enumerate(documentos):
+        grams = set()
+        for palabra in set(palabras(texto)):
+            posteos_palabras.setdefault(palabra, []).append(indice)
+            grams |= trigramas(palabra)
+        for gram in grams:
+            posteos_trigramas.setdefault(gram, []).append(indice)
+        trigramas_libro.append(min(len(grams), 0xFFFF))
+
+    terminos = sorted(posteos_palabras) + sorted(posteos_trigramas)
+    n_palabras = len(posteos_palabras)
+    listas = [posteos_palabras[t] for t in terminos[:n_palabras]] + [posteos_trigramas[t] for t in terminos[n_palabras:]]
+    inicio_posteos = np.zeros(len(listas) + 1, dtype='<u4')
+    np.cumsum([len(lista) for lista in listas], out=inicio_posteos[1:])
+    ancho = 2 if len(documentos) <= 0xFFFF else 4
+    # Cada lista ya está ordenada: los libros se recorren en orden
+    posteos = np.fromiter((i for lista in listas for i in lista), dtype=f'<u{ancho}', count=int(inicio_posteos[-1]))
+
+    titulos = [titulo.encode('utf-8') for _, titulo, _ in documentos]
+    inicio_titulos = np.zeros(len(titulos) + 1, dtype='<u4')
+    np.cumsum([len(t) for t in titulos], out=inicio_titulos[1:])
+    bytes_terminos = '\n'.join(terminos).encode('ascii')
+
+    cabecera = (MAGIA, FORMATO, ancho, len(documentos), n_palabras, len(terminos) - n_palabras,
+                len(posteos), len(bytes_terminos), int(inicio_titulos[-1]))
+    arreglos = {
+        'libro_ids': np.array([d[0] for d in documentos], dtype='<u4'),
+        'trigramas_libro': np.array(trigramas_libro, dtype='<u2'),
+        'inicio_titulos': inicio_titulos,
+        'inicio_posteos': inicio_posteos,
+        'posteos': posteos,
+        'terminos': np.frombuffer(bytes_terminos, dtype='u1'),
+        'titulos': np.frombuffer(b''.join(titulos), dtype='u1'),
+    }
+    posiciones, total = desplazamientos(cabecera)
+    contenido = bytearray(total)
+    CABECERA.pack_into(contenido, 0, *cabecera)
+    for nombre, posicion in posiciones.items():
+        datos = arreglos[nombre].tobytes()
+        contenido[posicion:posicion + len(datos)] = datos
+    return bytes(contenido)
+
+
+class IndiceBusqueda:
+    """Índice abierto con mmap; buscar() devuelve [(LibroID, puntaje, título)]"""
+
+    def __init__(self, archivo=ARCHIVO_INDICE):
+        with open(archivo, 'rb') as f:
+            self.mapa = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        cabecera = CABECERA.unpack_from(self.mapa)
+        if cabecera[0] != MAGIA or cabecera[1] != FORMATO:
+            self.mapa.close()
+            raise ValueError(f"{archivo} no es un índice de búsqueda (formato {FORMATO})")
+        self.libros, n_palabras = cabecera[3], cabecera[4]
+        posiciones, _ = desplazamientos(cabecera)
+        for nombre, tipo, cantidad in secciones(cabecera):
+            setattr(self, nombre, np.frombuffer(self.mapa, dtype=tipo, count=cantidad, offset=posiciones[nombre]))
+
+        terminos = self.terminos.tobytes().decode('ascii').split('\n') if len(self.terminos) else []
+        self.ids_palabras = {t: i for i, t in enumerate(terminos[:n_palabras])}
+        self.ids_trigramas = {t: i + n_palabras for i, t in enumerate(terminos[n_palabras:])}
+        # idf de cada palabra; una palabra que no está en el índice pesa como la más rara
+        frecuencias = np.diff(self.inicio_posteos[:n_palabras + 1].astype(np.int64))
+        self.idf = np.log((self.libros + 1) / (frecuencias + 1)) + 1
+        self.idf_maximo = math.log(self.libros + 1) + 1
+
+    def posteos_de(self, termino_id):
+        return self.posteos[self.inicio_posteos[termino_id]:self.inicio_posteos[termino_id + 1]]
+
+    def titulo(self, indice):
+        return self.titulos[self.inicio_titulos[indice]:self.inicio_titulos[indice + 1]].tobytes().decode('utf-8')
+
+    def buscar(self, texto, limite=10, puntaje_minimo=PUNTAJE_MINIMO):
+        consulta = set(palabras(normalizar_texto(texto)))
+        if not consulta or not self.libros:
+            return []
+
+        exactas = np.zeros(self.libros, dtype=np.float32)
+        peso_total = 0.0
+        grams = set()
+        for palabra in consulta:
+            termino_id = self.ids_palabras.get(palabra)
+            if termino_id is None:
+                peso_total += self.idf_maximo
+            else:
+                peso_total += self.idf[termino_id]
+                exactas[self.posteos_de(termino_id)] += self.idf[termino_id]
+            grams |= trigramas(palabra)
+
+        listas = [self.posteos_de(self.ids_trigramas[g]) for g in grams if g in self.ids_trigramas]
+        coincidencias = np.bincount(np.concatenate(listas), minlength=self.libros) if listas else 0
+        puntajes = 0.5 * exactas / peso_total + 0.5 * np.asarray(coincidencias, dtype=np.float32) / len(grams)
+
+        candidatos = np.flatnonzero(puntajes >= puntaje_minimo)
+        if len(candidatos) > limite:
+            candidatos = candidatos[np.argpartition(-puntajes[candidatos], limite - 1)[:limite]]
+        # Desempate: el título más corto (menos trigramas) se parece más a la consulta
+        orden = np.lexsort((self.trigramas_libro[candidatos], -puntajes[candidatos]))
+        return [
+            (int(self.libro_ids[i]), round(float(puntajes[i]), 4), self.titulo(i))
+            for i in candidatos[orden]
+        ]
+
+    def cerrar(self):
+        # Los arreglos de numpy apuntan al mmap: se sueltan antes de cerrarlo
+        for nombre in ('libro_ids', 'trigramas_libro', 'inicio_titulos', 'inicio_posteos', 'posteos', 'terminos', 'titulos'):
+            self.__dict__.pop(nombre, None)
+        self.mapa.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.cerrar()
+
+
+def reconstruir_indice(conn, archivo=ARCHIVO_INDICE):
+    """Leer el catálogo y reescribir el archivo del índice; devuelve (libros, bytes)"""
+    from generar_reportes import escribir_atomico
+
+    documentos = leer_documentos(conn)
+    contenido = construir_indice(documentos)
+    os.makedirs(os.path.dirname(os.path.abspath(archivo)), exist_ok=True)
+    escribir_atomico(archivo, contenido)
+    return len(documentos), len(contenido)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Construir o consultar el índice de búsqueda del catálogo')
+    parser.add_argument('--buscar', default=None, help='Consultar el índice en lugar de construirlo')
+    parser.add_argument('--limite', type=int, default=10, help='Resultados a mostrar')
+    parser.add_argument('--archivo', default=ARCHIVO_INDICE, help='Archivo del índice')
+    args = parser.parse_args()
+
+    if args.buscar is not None:
+        if not os.path.exists(args.archivo):
+            print(f"[ERROR] No existe {args.archivo}; constrúyelo con: python indice_busqueda.py")
+            sys.exit(1)
+        with IndiceBusqueda(args.archivo) as indice:
+            inicio = time.perf_counter()
+            resultados = indice.buscar(args.buscar, args.limite)
+            tiempo = (time.perf_counter() - inicio) * 1000
+            print(f"[INFO] {len(resultados)} resultado(s) para '{args.buscar}' en {tiempo:.3f} ms")
+            for libro_id, puntaje, titulo in resultados:
+                print(f"  {puntaje:6.3f}  [{libro_id:>6}] {titulo}")
+        return
+
+    print("="*60)
+    print("ÍNDICE DE BÚSQUEDA DEL CATÁLOGO")
+    print("="*60)
+    from generar_reportes import conectar_bd
+
+    conn = conectar_bd()
+    try:
+        inicio = time.perf_counter()
+        libros, tamano = reconstruir_indice(conn, args.archivo)
+    except pyodbc.Error as e:
+        print(f"[ERROR] Error de base de datos: {e}")
+        sys.exit(1)
+    finally:
+        conn.close()
+    print(f"[GUARDADO] {args.archivo} ({libros:,} libros, {tamano:,} bytes, {time.perf_counter() - inicio:.2f} s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Conciliación del inventario (día de inventario) contra los códigos escaneados
+- Lee uno o varios archivos de escaneo, uno por estante: una línea por
+  código de barras (FISI + libro 6 dígitos + ejemplar 3 dígitos). El estante
+  es el nombre del archivo, o la segunda columna si la línea trae
+  "codigo;estante" (también con coma o tabulación)
+- Trae todos los ejemplares (código, estado, ubicación) en una sola consulta
+  a un diccionario por código y recorre los escaneos una sola vez
+- Reporta:
+    faltantes          en la base como Disponible/Reservado en un estante
+                       escaneado, pero no se escanearon
+    desconocidos       escaneados y sin ejemplar en la base
+    duplicados         escaneados más de una vez
+    mal_ubicados       escaneados en otro estante que el registrado
+    encontrados        figuraban como Extraviado y aparecieron
+    prestados_en_estante / de_baja   escaneados con estado Prestado o Baja
+    ilegibles          líneas que no tienen forma de código
+- Con --aplicar corrige estados en bloque: faltantes Disponible ->
+  Extraviado y encontrados -> Disponible. Los faltantes Reservado solo se
+  reportan (una reserva activa todavía apunta a ese EjemplarID). La
+  ubicación de los mal ubicados solo se cambia con --reubicar. Solo se toca
+  un ejemplar si su estado sigue siendo el que se leyó al empezar
+
+Uso:
+    python inventario_ejemplares.py escaneos/*.txt                 # solo reporte
+    python inventario_ejemplares.py escaneos/*.txt --aplicar
+    python inventario_ejemplares.py escaneos/*.txt --aplicar --reubicar   # también corrige Ubicacion
+    python inventario_ejemplares.py todo.txt --todos-los-estantes  # faltantes de toda la biblioteca
+"""
+
+import argparse
+import csv
+import io
+import json
+import os
+import re
+import sys
+import time
+from datetime import datetime
+
+import pyodbc
+
+from generar_reportes import conectar_bd, escribir_atomico
+
+DIRECTORIO_SALIDA = os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'inventario')
+
+PATRON_CODIGO = re.compile(r'FISI\d{9}')
+SEPARADORES = re.compile(r'[;,\t]')
+# Estados en los que el ejemplar debería estar en su estante
+ESTADOS_EN_ESTANTE = {'Disponible', 'Reservado'}
+# Faltantes que --aplicar marca como Extraviado (un Reservado sigue asignado a una reserva)
+ESTADOS_A_EXTRAVIADO = {'Disponible'}
+TAMANO_LOTE = 50000
+
+CREAR_CORRECCIONES = """
+    IF OBJECT_ID('tempdb..#CorreccionesInventario') IS NOT NULL DROP TABLE #CorreccionesInventario;
+    CREATE TABLE #CorreccionesInventario (
+        EjemplarID INT PRIMARY KEY,
+        EstadoAnterior VARCHAR(20) NULL,
+        EstadoNuevo VARCHAR(20) NULL,
+        UbicacionNueva NVARCHAR(100) NULL
+    );
+"""
+
+APLICAR_CORRECCIONES = """
+    UPDATE e
+    SET Estado = ISNULL(c.EstadoNuevo, e.Estado),
+        Ubicacion = ISNULL(c.UbicacionNueva, e.Ubicacion)
+    FROM Ejemplares e
+    INNER JOIN #CorreccionesInventario c ON e.EjemplarID = c.EjemplarID
+    WHERE ISNULL(e.Estado, '') = ISNULL(c.EstadoAnterior, '')
+"""
+
+
+def leer_ejemplares(conn):
+    """{CodigoBarras: (EjemplarID, LibroID, Ubicacion, Estado)} en una sola consulta"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT CodigoBarras, EjemplarID, LibroID, Ubicacion, Estado FROM Ejemplares")
+    ejemplares = {}
+    while True:
+        lote = cursor.fetchmany(TAMANO_LOTE)
+        if not lote:
+            break
+        for codigo, ejemplar_id, libro_id, ubicacion, estado in lote:
+            ejemplares[codigo.strip().upper()] = (ejemplar_id, libro_id, ubicacion, estado)
+    return ejemplares
+
+
+def leer_escaneos(archivos):
+    """Genera (codigo, estante, archivo, línea) recorriendo los archivos sin cargarlos enteros"""
+    for archivo in archivos:
+        estante_archivo = os.path.splitext(os.path.basename(archivo))[0]
+        with open(archivo, 'r', encoding='utf-8-sig', errors='replace') as f:
+            for numero, linea in enumerate(f, 1):
+                linea = linea.strip()
+                if not linea:
+                    continue
+                partes = SEPARADORES.split(linea, maxsplit=1)
+                estante = partes[1].strip() if len(partes) > 1 and partes[1].strip() else estante_archivo
+                yield partes[0].strip().upper(), estante, archivo, numero
+
+
+def conciliar(ejemplares, escaneos, todos_los_estantes=False):
+    """Una pasada sobre los escaneos; devuelve {tipo: [hallazgos]} y los conteos"""
+    hallazgos = {tipo: [] for tipo in ('faltantes', 'desconocidos', 'duplicados', 'mal_ubicados', 'encontrados',
+                                       'prestados_en_estante', 'de_baja', 'ilegibles')}
+    vistos = {}
+    estantes = set()
+    lecturas = 0
+    for codigo, estante, archivo, linea in escaneos:
+        lecturas += 1
+        if not PATRON_CODIGO.fullmatch(codigo):
+            hallazgos['ilegibles'].append({'codigo': codigo, 'archivo': archivo, 'linea': linea})
+            continue
+        estantes.add(estante.casefold())
+        previo = vistos.get(codigo)
+        if previo is not None:
+            hallazgos['duplicados'].append({'codigo': codigo, 'estante': estante, 'archivo': archivo, 'linea': linea,
+                                            'primer_estante': previo[0], 'primer_archivo': previo[1], 'primera_linea': previo[2]})
+            continue
+        vistos[codigo] = (estante, archivo, linea)
+
+        ejemplar = ejemplares.get(codigo)
+        if ejemplar is None:
+            hallazgos['desconocidos'].append({'codigo': codigo, 'estante': estante, 'archivo': archivo, 'linea': linea})
+            continue
+        ejemplar_id, libro_id, ubicacion, estado = ejemplar
+        base = {'codigo': codigo, 'EjemplarID': ejemplar_id, 'LibroID': libro_id,
+                'ubicacion': ubicacion, 'estante': estante, 'estado': estado}
+        if (ubicacion or '').strip().casefold() != estante.casefold():
+            hallazgos['mal_ubicados'].append(base)
+        if estado == 'Extraviado':
+            hallazgos['encontrados'].append(base)
+        elif estado == 'Prestado':
+            hallazgos['prestados_en_estante'].append(base)
+        elif estado == 'Baja':
+            hallazgos['de_baja'].append(base)
+
+    for codigo, (ejemplar_id, libro_id, ubicacion, estado) in ejemplares.items():
+        if codigo in vistos or estado not in ESTADOS_EN_ESTANTE:
+            continue
+        # Sin --todos-los-estantes solo se exige lo registrado en los estantes escaneados
+        if todos_los_estantes or (ubicacion or '').strip().casefold() in estantes:
+            hallazgos['faltantes'].append({'codigo': codigo, 'EjemplarID': ejemplar_id, 'LibroID': libro_id,
+                                           'ubicacion': ubicacion, 'estado': estado})
+    conteos = {'lecturas': lecturas, 'codigos_unicos': len(vistos), 'estantes': len(estantes),
+               'ejemplares_en_base': len(ejemplares)}
+    return hallazgos, conteos
+
+
+def correcciones(hallazgos, reubicar=False):
+    """(EjemplarID, estado leído, estado nuevo, ubicación nueva) por ejemplar"""
+    cambios = {}
+    for h in hallazgos['faltantes']:
+        if h['estado'] in ESTADOS_A_EXTRAVIADO:
+            cambios[h['EjemplarID']] = [h['estado'], 'Extraviado', None]
+    for h in hallazgos['encontrados']:
+        cambios[h['EjemplarID']] = [h['estado'], 'Disponible', None]
+    if reubicar:
+        for h in hallazgos['mal_ubicados']:
+            cambios.setdefault(h['EjemplarID'], [h['estado'], None, None])[2] = h['estante'][:100]
+    return [(ejemplar_id, *valores) for ejemplar_id, valores in sorted(cambios.items())]
+
+
+def aplicar(conn, filas):
+    """Aplicar las correcciones con una tabla temporal y un solo UPDATE; devuelve filas actualizadas"""
+    cursor = conn.cursor()
+    cursor.fast_executemany = True
+    try:
+        cursor.execute(CREAR_CORRECCIONES)
+        if filas:
+            cursor.executemany("""
+                INSERT INTO #CorreccionesInventario (EjemplarID, EstadoAnterior, EstadoNuevo, UbicacionNueva)
+                VALUES (?, ?, ?, ?)
+            """, filas)
+        cursor.execute(APLICAR_CORRECCIONES)
+        actualizadas = cursor.rowcount
+        conn.commit()
+    except pyodbc.Error:
+        conn.rollback()
+        raise
+    return actualizadas
+
+
+def guardar_reporte(directorio, hallazgos, conteos):
+    os.makedirs(directorio, exist_ok=True)
+    marca = datetime.now().strftime('%Y%m%d_%H%M%S')
+    columnas = ['tipo', 'codigo', 'EjemplarID', 'LibroID', 'estado', 'ubicacion', 'estante', 'archivo', 'linea']
+    salida = io.StringIO()
+    escritor = csv.DictWriter(salida, fieldnames=columnas, delimiter=';', extrasaction='ignore')
+    escritor.writeheader()
+    for tipo, lista in hallazgos.items():
+        for h in lista:
+            escritor.writerow({'tipo': tipo, **h})
+    archivo_csv = os.path.join(directorio, f'inventario_{marca}.csv')
+    escribir_atomico(archivo_csv, salida.getvalue())
+    archivo_json = os.path.join(directorio, f'inventario_{marca}.json')
+    escribir_atomico(archivo_json, json.dumps({
+        'generado': datetime.now().isoformat(timespec='seconds'),
+        'conteos': conteos,
+        'resumen': {tipo: len(lista) for tipo, lista in hallazgos.items()},
+    }, ensure_ascii=False, indent=2))
+    return archivo_csv, archivo_json
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Conciliar el inventario con los códigos escaneados')
+    parser.add_argument('archivos', nargs='+', help='Archivos de escaneo (uno por estante)')
+    parser.add_argument('--aplicar', action='store_true', help='Corregir estados en la base')
+    parser.add_argument('--reubicar', action='store_true',
+                        help='Con --aplicar, cambiar también la Ubicacion de los mal ubicados al estante escaneado')
+    parser.add_argument('--todos-los-estantes', action='store_true',
+                        help='Contar como faltante cualquier ejemplar no escaneado, no solo los de estantes escaneados')
+    parser.add_argument('--salida', default=DIRECTORIO_SALIDA, help='Directorio del reporte')
+    args = parser.parse_args()
+    if args.reubicar and not args.aplicar:
+        parser.error("--reubicar requiere --aplicar")
+    for archivo in args.archivos:
+        if not os.path.isfile(archivo):
+            parser.error(f"No existe el archivo {archivo}")
+
+    print("="*60)
+    print("CONCILIACIÓN DE INVENTARIO" + ("" if args.aplicar else " (SOLO REPORTE)"))
+    print("="*60)
+
+    conn = conectar_bd()
+    try:
+        inicio = time.perf_counter()
+        ejemplares = leer_ejemplares(conn)
+        print(f"[INFO] {len(ejemplares):,} ejemplares leídos ({time.perf_counter() - inicio:.2f} s)")
+
+        marca = time.perf_counter()
+        hallazgos, conteos = conciliar(ejemplares, leer_escaneos(args.archivos), args.todos_los_estantes)
+        print(f"[INFO] {conteos['lecturas']:,} lecturas, {conteos['codigos_unicos']:,} códigos únicos en "
+              f"{conteos['estantes']} estante(s) ({time.perf_counter() - marca:.2f} s)")
+        for tipo, lista in hallazgos.items():
+            print(f"  {tipo:<22} {len(lista):>8,}")
+
+        if args.aplicar:
+            filas = correcciones(hallazgos, args.reubicar)
+            reservados = sum(1 for h in hallazgos['faltantes'] if h['estado'] not in ESTADOS_A_EXTRAVIADO)
+            if reservados:
+                print(f"[INFO] {reservados:,} faltantes en estado Reservado no se marcan como Extraviado")
+            marca = time.perf_counter()
+            actualizadas = aplicar(conn, filas)
+            print(f"[OK] {actualizadas:,} de {len(filas):,} ejemplares corregidos ({time.perf_counter() - marca:.2f} s)")
+            if actualizadas < len(filas):
+                print("[WARN] Algunos ejemplares cambiaron de estado durante el inventario y no se tocaron")
+    except pyodbc.Error as e:
+        print(f"[ERROR] Error de base de datos: {e}")
+        sys.exit(1)
+    finally:
+        conn.close()
+
+    for archivo in guardar_reporte(args.salida, hallazgos, conteos):
+        print(f"[GUARDADO] {archivo}")
+
+
+if __name__ == "__main__":
+    main()
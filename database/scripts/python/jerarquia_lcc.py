@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Jerarquía LCC de los libros (tabla JerarquiaLCC)
+- Clase: primera letra de la signatura (Q = Ciencia)
+- Subclase: LCCSeccion normalizada (QA)
+- Sección: rango numérico de la subclase según el esquema LCC
+  (QA75-76.95 Computación); si la subclase no está en RANGOS_LCC se
+  agrupa por centenas (HB 100-199)
+
+La interpretación de LCCSeccion/LCCNumero se hace una sola vez aquí, al
+cargar el catálogo, y el reporte de circulación por materia solo agrupa.
+
+Uso:
+    python jerarquia_lcc.py        # recalcular la tabla (solo escribe cambios)
+
+Requiere la tabla creada con scripts/sql/crear_tabla_jerarquia_lcc.sql
+"""
+
+import re
+import sys
+
+# Clases principales de la Library of Congress Classification
+NOMBRES_CLASES = {
+    'A': 'Obras generales',
+    'B': 'Filosofía, psicología y religión',
+    'C': 'Ciencias auxiliares de la historia',
+    'D': 'Historia universal',
+    'E': 'Historia de América',
+    'F': 'Historia de América',
+    'G': 'Geografía y antropología',
+    'H': 'Ciencias sociales',
+    'J': 'Ciencia política',
+    'K': 'Derecho',
+    'L': 'Educación',
+    'M': 'Música',
+    'N': 'Bellas artes',
+    'P': 'Lengua y literatura',
+    'Q': 'Ciencia',
+    'R': 'Medicina',
+    'S': 'Agricultura',
+    'T': 'Tecnología',
+    'U': 'Ciencia militar',
+    'V': 'Ciencia naval',
+    'Z': 'Bibliografía y bibliotecología',
+}
+
+# Secciones de las subclases con más títulos en el catálogo: (desde, hasta, nombre).
+# Se toma el primer rango que contiene el número, así los rangos
+# específicos van antes que los generales que los contienen.
+RANGOS_LCC = {
+    'QA': (
+        (75, 76.95, 'Computación'),
+        (1, 99, 'Matemáticas generales'),
+        (101, 145, 'Aritmética elemental'),
+        (150, 272.5, 'Álgebra'),
+        (273, 299.4, 'Probabilidad, estadística y análisis numérico'),
+        (300, 433, 'Análisis'),
+        (440, 699, 'Geometría'),
+        (801, 939, 'Mecánica analítica'),
+    ),
+    'QC': (
+        (1, 75, 'Física general'),
+        (81, 119, 'Pesos y medidas'),
+        (120, 168.85, 'Mecánica'),
+        (170, 197, 'Física atómica'),
+        (221, 246, 'Acústica'),
+        (251, 338.5, 'Calor'),
+        (350, 467, 'Óptica'),
+        (474, 496.9, 'Radiación'),
+        (501, 766, 'Electricidad y magnetismo'),
+        (770, 798, 'Física nuclear'),
+        (801, 999, 'Geofísica y meteorología'),
+    ),
+    'TK': (
+        (7885, 7895, 'Hardware de computadoras'),
+        (1, 1000, 'Ingeniería eléctrica general'),
+        (1001, 1841, 'Producción de energía eléctrica'),
+        (2000, 2891, 'Máquinas eléctricas'),
+        (3001, 3521, 'Distribución de energía'),
+        (4001, 4102, 'Aplicaciones de la electricidad'),
+        (5101, 6720, 'Telecomunicaciones'),
+        (7800, 8360, 'Electrónica'),
+        (9001, 9401, 'Ingeniería nuclear'),
+    ),
+    'T': (
+        (55.4, 60.8, 'Ingeniería industrial y gestión'),
+        (1, 55.3, 'Tecnología general'),
+        (61, 173, 'Educación técnica'),
+        (174, 178, 'Pronósticos tecnológicos'),
+        (351, 385, 'Dibujo técnico y gráficos por computadora'),
+    ),
+    'HF': (
+        (5410, 5417.5, 'Marketing'),
+        (5601, 5689, 'Contabilidad'),
+        (5001, 6182, 'Administración de empresas'),
+        (1, 4050, 'Comercio'),
+    ),
+    'HD': (
+        (28, 70, 'Gestión industrial'),
+        (101, 1395, 'Economía de la tierra'),
+        (1401, 2210, 'Economía agrícola'),
+        (2321, 4730, 'Industria'),
+        (4801, 8943, 'Trabajo'),
+        (9000, 9999, 'Industrias específicas'),
+    ),
+}
+
+PATRON_NUMERO = re.compile(r'\d+(?:\.\d+)?')
+
+
+def numero_lcc(numero):
+    """Parte numérica inicial de LCCNumero ('76.73.J38' -> 76.73), None si no hay"""
+    if numero is None:
+        return None
+    coincidencia = PATRON_NUMERO.search(str(numero))
+    return float(coincidencia.group()) if coincidencia else None
+
+
+def formatear_numero(valor):
+    """76.0 -> '76', 76.95 -> '76.95'"""
+    return f"{valor:g}"
+
+
+def clasificar_lcc(seccion, numero):
+    """
+    LCCSeccion + LCCNumero -> (Clase, NombreClase, Subclase, Seccion, NumeroLCC)
+    Devuelve None si el libro no tiene una subclase válida
+    """
+    subclase = re.sub(r'[^A-Z]', '', str(seccion or '').upper())
+    if not subclase:
+        return None
+
+    clase = subclase[0]
+    nombre_clase = NOMBRES_CLASES.get(clase, 'Otras')
+    valor = numero_lcc(numero)
+
+    if valor is None:
+        return clase, nombre_clase, subclase, f"{subclase} (sin número)", None
+
+    for desde, hasta, nombre in RANGOS_LCC.get(subclase, ()):
+        if desde <= valor <= hasta:
+            etiqueta = f"{subclase}{formatear_numero(desde)}-{formatear_numero(hasta)} {nombre}"
+            return clase, nombre_clase, subclase, etiqueta, valor
+
+    base = int(valor) // 100 * 100
+    return clase, nombre_clase, subclase, f"{subclase} {base}-{base + 99}", valor
+
+
+def poblar_jerarquia_lcc(conn):
+    """
+    Recalcular JerarquiaLCC desde Libros; solo inserta, actualiza o borra las
+    filas que cambiaron. Devuelve (insertadas, actualizadas, eliminadas)
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT LibroID, LCCSeccion, LCCNumero FROM Libros")
+    calculadas = {}
+    for libro_id, seccion, numero in cursor.fetchall():
+        jerarquia = clasificar_lcc(seccion, numero)
+        if jerarquia:
+            calculadas[libro_id] = jerarquia
+
+    cursor.execute("SELECT LibroID, Clase, NombreClase, Subclase, Seccion, NumeroLCC FROM JerarquiaLCC")
+    existentes = {
+        row[0]: (row[1], row[2], row[3], row[4], float(row[5]) if row[5] is not None else None)
+        for row in cursor.fetchall()
+    }
+
+    nuevas = [(libro_id,) + j for libro_id, j in calculadas.items() if libro_id not in existentes]
+    cambiadas = [j + (libro_id,) for libro_id, j in calculadas.items()
+                 if libro_id in existentes and existentes[libro_id] != j]
+    sobrantes = [(libro_id,) for libro_id in existentes if libro_id not in calculadas]
+
+    if nuevas:
+        cursor.executemany("""
+            INSERT INTO JerarquiaLCC (LibroID, Clase, NombreClase, Subclase, Seccion, NumeroLCC)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, nuevas)
+    if cambiadas:
+        cursor.executemany("""
+            UPDATE JerarquiaLCC
+            SET Clase = ?, NombreClase = ?, Subclase = ?, Seccion = ?, NumeroLCC = ?,
+                FechaActualizacion = GETDATE()
+            WHERE LibroID = ?
+        """, cambiadas)
+    if sobrantes:
+        cursor.executemany("DELETE FROM JerarquiaLCC WHERE LibroID = ?", sobrantes)
+    conn.commit()
+    return len(nuevas), len(cambiadas), len(sobrantes)
+
+
+def main():
+    from generar_reportes import conectar_bd
+
+    print("="*60)
+    print("JERARQUIA LCC")
+    print("="*60)
+    conn = conectar_bd()
+    try:
+        insertadas, actualizadas, eliminadas = poblar_jerarquia_lcc(conn)
+        print(f"[OK] Jerarquía LCC: {insertadas} insertadas, {actualizadas} actualizadas, {eliminadas} eliminadas")
+    except Exception as e:
+        print(f"[ERROR] No se pudo actualizar JerarquiaLCC: {e}")
+        print("[INFO] Crea la tabla con scripts/sql/crear_tabla_jerarquia_lcc.sql")
+        sys.exit(1)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Motor de atrasos y multas por lotes
+- No cambia Prestamos.Estado: como en el backend, un préstamo está atrasado
+  cuando sigue 'Prestado' con FechaVencimiento vencida (devolución y
+  renovación solo aceptan Estado = 'Prestado'). Los préstamos que una versión
+  anterior del motor dejó en 'Atrasado' sin devolver vuelven a 'Prestado'
+- Crea o actualiza con un MERGE la multa por atraso (DiasAtraso, Monto) de
+  todos los préstamos atrasados y de los devueltos tarde que aún la tienen
+  pendiente (se congela en los días a la fecha de devolución) o que se
+  devolvieron en los últimos días sin pasar nunca por el motor
+- Es idempotente: volver a ejecutarlo el mismo día no cambia nada; al día
+  siguiente solo actualiza los días y montos que crecieron
+- Las multas pagadas no se tocan ni se duplican
+
+Política (configuracion.json del backend, se puede sobrescribir por línea de comandos):
+    multas.montoMultaPorDia, multas.multaMaxima, prestamos.diasGracia
+Un préstamo con hasta diasGracia días de atraso no genera multa; pasado ese
+plazo se cobran todos los días, con el tope de multaMaxima.
+
+Uso:
+    python motor_multas.py --simulacion     # qué cambiaría, sin guardar
+    python motor_multas.py                  # aplicar (programarlo p.ej. cada hora)
+    python motor_multas.py --monto-por-dia 1.50 --dias-gracia 0
+
+Índices recomendados: scripts/sql/crear_indices_motor_multas.sql
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+import pyodbc
+
+from generar_reportes import conectar_bd
+
+ARCHIVO_CONFIGURACION = os.path.join(
+    os.path.dirname(__file__), '..', '..', '..', 'backend', 'NeoLibro.WebAPI', 'configuracion.json'
+)
+
+# Valores por defecto del backend (ConfiguracionController)
+POLITICA_POR_DEFECTO = {
+    'monto_por_dia': Decimal('2.00'),
+    'multa_maxima': Decimal('50.00'),
+    'dias_gracia': 1,
+}
+
+# Devoluciones tardías recientes que se revisan aunque no tengan multa
+DIAS_DEVOLUCIONES = 7
+
+# Las multas por atraso se reconocen por el prefijo del motivo que usa también el backend
+PREFIJO_MOTIVO = 'Retraso en devolución'
+
+# Préstamos atrasados: se calcula igual que el backend (EstadoCalculado) y usa
+# IX_Prestamos_Estado_FechaVencimiento
+CONTAR_ATRASADOS = """
+    SELECT COUNT(*) FROM Prestamos
+    WHERE Estado = 'Prestado' AND FechaVencimiento < ?
+"""
+
+# Préstamos sin devolver que quedaron en 'Atrasado' (versiones anteriores del
+# motor); el backend no podría devolverlos ni renovarlos
+RESTAURAR_PRESTADOS = """
+    UPDATE Prestamos SET Estado = 'Prestado', FechaModificacion = GETDATE()
+    WHERE Estado = 'Atrasado' AND FechaDevolucion IS NULL
+"""
+
+CREAR_TEMPORAL = """
+    IF OBJECT_ID('tempdb..#MultasMotor') IS NOT NULL DROP TABLE #MultasMotor;
+    CREATE TABLE #MultasMotor (
+        Accion NVARCHAR(10) NOT NULL,
+        MultaID INT NOT NULL,
+        PrestamoID INT NOT NULL,
+        UsuarioID INT NOT NULL,
+        Monto DECIMAL(10, 2) NOT NULL,
+        DiasAtraso INT NOT NULL,
+        Motivo NVARCHAR(200) NULL
+    );
+"""
+
+# El filtro por motivo va en el ON: una multa de otro tipo del mismo préstamo no cuenta
+MERGE_MULTAS = f"""
+    WITH atrasos AS (
+        SELECT p.PrestamoID, r.UsuarioID,
+               DATEDIFF(DAY, p.FechaVencimiento, ISNULL(p.FechaDevolucion, ?)) AS Dias
+        FROM Prestamos p
+        INNER JOIN Reservas r ON p.ReservaID = r.ReservaID
+        WHERE (p.Estado = 'Prestado' AND p.FechaVencimiento < ?)
+           OR (p.Estado = 'Devuelto' AND p.FechaDevolucion > p.FechaVencimiento
+               AND (p.FechaDevolucion >= ? OR EXISTS (
+                   SELECT 1 FROM Multas x
+                   WHERE x.PrestamoID = p.PrestamoID AND x.Estado = 'Pendiente'
+                     AND x.Motivo LIKE N'{PREFIJO_MOTIVO}%')))
+    ),
+    calculo AS (
+        SELECT PrestamoID, UsuarioID, Dias,
+               CAST(CASE WHEN Dias <= ? THEN 0
+                         WHEN Dias * ? > ? THEN ?
+                         ELSE Dias * ? END AS DECIMAL(10, 2)) AS Monto,
+               N'{PREFIJO_MOTIVO} - ' + CAST(Dias AS NVARCHAR(10)) + N' día(s) de atraso' AS Motivo
+        FROM atrasos
+    )
+    MERGE Multas WITH (HOLDLOCK) AS m
+    USING calculo AS s
+        ON m.PrestamoID = s.PrestamoID AND m.Motivo LIKE N'{PREFIJO_MOTIVO}%'
+    WHEN MATCHED AND m.Estado = 'Pendiente' AND s.Monto > 0
+                 AND (ISNULL(m.DiasAtraso, -1) <> s.Dias OR m.Monto <> s.Monto) THEN
+        UPDATE SET DiasAtraso = s.Dias, Monto = s.Monto, Motivo = s.Motivo
+    WHEN NOT MATCHED BY TARGET AND s.Monto > 0 THEN
+        INSERT (PrestamoID, UsuarioID, Monto, Estado, Motivo, DiasAtraso)
+        VALUES (s.PrestamoID, s.UsuarioID, s.Monto, 'Pendiente', s.Motivo, s.Dias)
+    OUTPUT $action, inserted.MultaID, inserted.PrestamoID, inserted.UsuarioID,
+           inserted.Monto, inserted.DiasAtraso, inserted.Motivo
+    INTO #MultasMotor;
+"""
+
+# Mismo mensaje que MultaRepository.Crear
+NOTIFICAR_MULTAS_NUEVAS = """
+    INSERT INTO Notificaciones (ReservaID, UsuarioID, Tipo, Mensaje, FechaCreacion, Estado)
+    SELECT p.ReservaID, m.UsuarioID, 'MultaGenerada',
+           LEFT(N'Se te ha generado una multa de $' + CONVERT(NVARCHAR(20), m.Monto)
+                + N' por: ' + m.Motivo
+                + N' (' + CAST(m.DiasAtraso AS NVARCHAR(10)) + N' día(s) de atraso)'
+                + ISNULL(N' - Libro: ' + l.Titulo, N''), 500),
+           GETDATE(), 'Pendiente'
+    FROM #MultasMotor m
+    INNER JOIN Prestamos p ON m.PrestamoID = p.PrestamoID
+    LEFT JOIN Reservas r ON p.ReservaID = r.ReservaID
+    LEFT JOIN Libros l ON r.LibroID = l.LibroID
+    WHERE m.Accion = 'INSERT'
+"""
+
+
+def cargar_politica(archivo=ARCHIVO_CONFIGURACION):
+    """Leer la política de multas de configuracion.json (con valores por defecto)"""
+    politica = dict(POLITICA_POR_DEFECTO)
+    if not os.path.exists(archivo):
+        print(f"[WARN] No se encontró {archivo}; se usa la política por defecto")
+        return politica
+    with open(archivo, 'r', encoding='utf-8') as f:
+        configuracion = json.load(f, parse_float=Decimal)
+    multas = configuracion.get('multas', {})
+    prestamos = configuracion.get('prestamos', {})
+    if 'montoMultaPorDia' in multas:
+        politica['monto_por_dia'] = Decimal(multas['montoMultaPorDia'])
+    if 'multaMaxima' in multas:
+        politica['multa_maxima'] = Decimal(multas['multaMaxima'])
+    if 'diasGracia' in prestamos:
+        politica['dias_gracia'] = int(prestamos['diasGracia'])
+    return politica
+
+
+def ejecutar_motor(conn, politica, simulacion=False, dias_devoluciones=DIAS_DEVOLUCIONES):
+    """
+    Aplicar el motor en una transacción; devuelve un dict con los conteos.
+    En simulación se revierte todo al final.
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT GETDATE()")
+    ahora = cursor.fetchone()[0]
+    monto, maximo = politica['monto_por_dia'], politica['multa_maxima']
+
+    resultado = {}
+    try:
+        cursor.execute(RESTAURAR_PRESTADOS)
+        resultado['prestamos_restaurados'] = max(cursor.rowcount, 0)
+        cursor.execute(CONTAR_ATRASADOS, ahora)
+        resultado['prestamos_atrasados'] = cursor.fetchone()[0]
+
+        cursor.execute(CREAR_TEMPORAL)
+        cursor.execute(MERGE_MULTAS, ahora, ahora, ahora - timedelta(days=dias_devoluciones),
+                       politica['dias_gracia'], monto, maximo, maximo, monto)
+        cursor.execute("SELECT Accion, COUNT(*), ISNULL(SUM(Monto), 0) FROM #MultasMotor GROUP BY Accion")
+        acciones = {row[0]: (row[1], row[2]) for row in cursor.fetchall()}
+        resultado['multas_creadas'], resultado['monto_creado'] = acciones.get('INSERT', (0, Decimal(0)))
+        resultado['multas_actualizadas'], _ = acciones.get('UPDATE', (0, Decimal(0)))
+
+        cursor.execute(NOTIFICAR_MULTAS_NUEVAS)
+        resultado['notificaciones'] = max(cursor.rowcount, 0)
+
+        if simulacion:
+            conn.rollback()
+        else:
+            conn.commit()
+    except pyodbc.Error:
+        conn.rollback()
+        raise
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generar/actualizar las multas de los préstamos atrasados')
+    parser.add_argument('--simulacion', action='store_true', help='Mostrar los cambios y revertirlos')
+    parser.add_argument('--configuracion', default=ARCHIVO_CONFIGURACION, help='configuracion.json del backend')
+    parser.add_argument('--monto-por-dia', type=Decimal, default=None, help='Sobrescribe multas.montoMultaPorDia')
+    parser.add_argument('--maximo', type=Decimal, default=None, help='Sobrescribe multas.multaMaxima')
+    parser.add_argument('--dias-gracia', type=int, default=None, help='Sobrescribe prestamos.diasGracia')
+    parser.add_argument('--dias-devoluciones', type=int, default=DIAS_DEVOLUCIONES,
+                        help=f'Revisar devoluciones tardías de los últimos N días (por defecto {DIAS_DEVOLUCIONES})')
+    args = parser.parse_args()
+
+    politica = cargar_politica(args.configuracion)
+    for clave, valor in (('monto_por_dia', args.monto_por_dia), ('multa_maxima', args.maximo),
+                         ('dias_gracia', args.dias_gracia)):
+        if valor is not None:
+            politica[clave] = valor
+    if politica['monto_por_dia'] < 0 or politica['multa_maxima'] < 0 or politica['dias_gracia'] < 0:
+        parser.error("La política de multas no admite valores negativos")
+
+    print("="*60)
+    print("MOTOR DE ATRASOS Y MULTAS" + (" (SIMULACION)" if args.simulacion else ""))
+    print("="*60)
+    print(f"  Política: S/ {politica['monto_por_dia']:.2f} por día, tope S/ {politica['multa_maxima']:.2f}, "
+          f"{politica['dias_gracia']} día(s) de gracia")
+
+    conn = conectar_bd()
+    inicio = time.perf_counter()
+    try:
+        resultado = ejecutar_motor(conn, politica, args.simulacion, args.dias_devoluciones)
+    except pyodbc.Error as e:
+        print(f"[ERROR] Error de base de datos: {e}")
+        sys.exit(1)
+    finally:
+        conn.close()
+
+    print(f"\n  Préstamos atrasados:           {resultado['prestamos_atrasados']:,}")
+    if resultado['prestamos_restaurados']:
+        print(f"  Préstamos vueltos a prestado:  {resultado['prestamos_restaurados']:,}")
+    print(f"  Multas creadas:                {resultado['multas_creadas']:,} (S/ {resultado['monto_creado']:,.2f})")
+    print(f"  Multas actualizadas:           {resultado['multas_actualizadas']:,}")
+    print(f"  Notificaciones:                {resultado['notificaciones']:,}")
+    print(f"  Tiempo:                        {time.perf_counter() - inicio:.2f} s")
+    if args.simulacion:
+        print("\n[INFO] Simulación: no se guardó ningún cambio")
+    else:
+        print("\n[OK] Motor de multas completado")
+
+
+if __name__ == "__main__":
+    main()
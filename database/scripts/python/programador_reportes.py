@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Programador de reportes (modo demonio de generar_reportes)
+- Cada reporte se refresca con su propia cadencia
+  (p.ej. actividad_diaria cada 5 minutos, rendimiento cada hora)
+- Antes de recalcular una sección se consulta la versión de las tablas de
+  las que depende; si nada cambió, la sección no se vuelve a consultar,
+  salvo que tenga más de --edad-maxima segundos (red de seguridad para
+  cambios que las sondas de versión no alcancen a ver)
+- El JSON de salida se reescribe con escritura atómica (temporal + rename)
+  y solo cuando alguna sección cambió; cada reescritura se agrega también
+  al historial de snapshots (historial_reportes.py)
+- Un error en un reporte o al escribir el JSON se registra y el programa
+  sigue: esa sección conserva su último valor y se reintenta en su próximo
+  turno (un error de base de datos reabre la conexión)
+
+Uso:
+    python generar_reportes.py --programado
+    python generar_reportes.py --programado --cadencia actividad_diaria=60 --salida ../../data/reportes_biblioteca.json
+    python generar_reportes.py --programado --edad-maxima 1800
+"""
+
+import json
+import os
+import signal
+import sqlite3
+import sys
+import time
+import traceback
+from datetime import datetime
+
+import pyodbc
+
+from cache_reportes import DEPENDENCIAS_REPORTES, versiones_tablas, clave_reporte
+from historial_reportes import registrar_snapshot
+from generar_reportes import conectar_bd, guardar_json, REPORTES, opciones_por_defecto, parametros_reporte
+
+# Cadencia por defecto de cada reporte (segundos)
+CADENCIAS_POR_DEFECTO = {
+    'estadisticas_generales': 5 * 60,
+    'prestamos_por_mes': 60 * 60,
+    'libros_mas_prestados': 60 * 60,
+    'usuarios_mas_activos': 60 * 60,
+    'estadisticas_por_rol': 60 * 60,
+    'actividad_diaria': 5 * 60,
+    'rendimiento_biblioteca': 60 * 60,
+    'libros_mas_prestados_por_periodo': 60 * 60,
+    'usuarios_mas_activos_por_periodo': 60 * 60,
+    'distribuciones_prestamos': 60 * 60,
+    'circulacion_por_lcc': 60 * 60,
+}
+
+# Antigüedad máxima de una sección aunque su versión de datos no cambie (segundos)
+EDAD_MAXIMA_POR_DEFECTO = 60 * 60
+
+# Espera entre reintentos de conexión (segundos)
+ESPERA_RECONEXION = 30
+
+
+def parsear_cadencias(especificaciones):
+    """Convertir ['reporte=segundos', ...] en un dict de cadencias"""
+    cadencias = {nombre: segundos for nombre, segundos in CADENCIAS_POR_DEFECTO.items() if nombre in REPORTES}
+    for especificacion in especificaciones:
+        nombre, _, segundos = especificacion.partition('=')
+        if nombre not in cadencias:
+            raise ValueError(f"Reporte desconocido en --cadencia: {nombre}")
+        cadencias[nombre] = int(segundos)
+        if cadencias[nombre] <= 0:
+            raise ValueError(f"La cadencia de {nombre} debe ser mayor que cero")
+    return cadencias
+
+
+def cargar_snapshot(archivo):
+    """Cargar el último JSON generado para conservar las secciones que no toca refrescar"""
+    if not os.path.exists(archivo):
+        return {}
+    try:
+        with open(archivo, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+class ProgramadorReportes:
+    """Bucle que refresca cada sección del JSON según su cadencia"""
+
+    def __init__(self, archivo, cadencias, historial=True, conectar=conectar_bd,
+                 edad_maxima=EDAD_MAXIMA_POR_DEFECTO):
+        self.archivo = archivo
+        self.cadencias = cadencias
+        self.edad_maxima = edad_maxima
+        self.historial = historial
+        self.conectar = conectar
+        self.snapshot = cargar_snapshot(archivo)
+        self.claves = {}
+        self.calculado = {}
+        self.proxima = {nombre: 0.0 for nombre in cadencias}
+        self.sin_guardar = False
+        self.conn = None
+        self.detenido = False
+
+    def detener(self, *_):
+        print("\n[INFO] Deteniendo programador de reportes...")
+        self.detenido = True
+
+    def asegurar_conexion(self):
+        if self.conn is not None:
+            return True
+        try:
+            self.conn = self.conectar()
+            print("[OK] Conexion exitosa!")
+            return True
+        except SystemExit:
+            # conectar_bd termina el proceso cuando falla; en modo demonio se reintenta
+            print(f"[WARN] Reintentando conexión en {ESPERA_RECONEXION} s")
+            return False
+
+    def refrescar(self, pendientes):
+        """Refrescar los reportes vencidos; devuelve los nombres de las secciones que cambiaron"""
+        tablas = {t for nombre in pendientes for t in DEPENDENCIAS_REPORTES[nombre]}
+        versiones = versiones_tablas(self.conn, tablas)
+
+        cambiados = []
+        for nombre in pendientes:
+            funcion = REPORTES[nombre]['funcion']
+            # Los parámetros se evalúan en cada ejecución (año y fecha actuales)
+            parametros = parametros_reporte(nombre, opciones_por_defecto())
+            clave = clave_reporte(nombre, parametros, versiones)
+
+            vigente = time.monotonic() - self.calculado.get(nombre, float('-inf')) < self.edad_maxima
+            if self.claves.get(nombre) == clave and nombre in self.snapshot and vigente:
+                continue
+
+            inicio = time.perf_counter()
+            try:
+                self.snapshot[nombre] = funcion(self.conn, **parametros)
+            except (pyodbc.Error, sqlite3.Error):
+                raise
+            except Exception as e:
+                print(f"  [ERROR] {nombre}: {e}")
+                traceback.print_exc()
+                continue
+            self.claves[nombre] = clave
+            self.calculado[nombre] = time.monotonic()
+            cambiados.append(nombre)
+            print(f"  [{datetime.now():%H:%M:%S}] {nombre} recalculado ({time.perf_counter() - inicio:.2f} s)")
+
+        return cambiados
+
+    def ejecutar(self):
+        signal.signal(signal.SIGINT, self.detener)
+        signal.signal(signal.SIGTERM, self.detener)
+
+        print("="*60)
+        print("PROGRAMADOR DE REPORTES - BIBLIOTECA FISI")
+        print("="*60)
+        for nombre, segundos in self.cadencias.items():
+            print(f"  {nombre:25s} cada {segundos} s")
+        print(f"  Edad máxima de una sección: {self.edad_maxima} s")
+        print(f"  Salida: {self.archivo}\n")
+
+        while not self.detenido:
+            if not self.asegurar_conexion():
+                self.esperar(ESPERA_RECONEXION)
+                continue
+
+            ahora = time.monotonic()
+            pendientes = [nombre for nombre, t in self.proxima.items() if t <= ahora]
+
+            if pendientes:
+                try:
+                    cambiados = self.refrescar(pendientes)
+                except (pyodbc.Error, sqlite3.Error) as e:
+                    print(f"[ERROR] Error de base de datos: {e}")
+                    self.cerrar_conexion()
+                    continue
+                except Exception as e:
+                    print(f"[ERROR] Error inesperado: {e}")
+                    traceback.print_exc()
+                    cambiados = []
+
+                for nombre in pendientes:
+                    self.proxima[nombre] = ahora + self.cadencias[nombre]
+
+                if cambiados or self.sin_guardar:
+                    self.guardar(cambiados)
+
+            self.esperar(min(self.proxima.values()) - time.monotonic())
+
+        self.cerrar_conexion()
+
+    def guardar(self, cambiados):
+        """Escribir el JSON y el historial; si falla, se reintenta en el próximo ciclo"""
+        try:
+            self.snapshot['fecha_generacion'] = datetime.now().isoformat()
+            guardar_json(self.snapshot, self.archivo, silencioso=True)
+            if self.historial:
+                registrar_snapshot(self.snapshot)
+        except Exception as e:
+            print(f"  [ERROR] No se pudo guardar {self.archivo}: {e}")
+            traceback.print_exc()
+            self.sin_guardar = True
+            return
+        self.sin_guardar = False
+        print(f"  [GUARDADO] {', '.join(cambiados) or 'reintento'} -> {self.archivo}")
+
+    def esperar(self, segundos):
+        """Dormir en pasos cortos para responder rápido a las señales"""
+        limite = time.monotonic() + max(segundos, 0)
+        while not self.detenido and time.monotonic() < limite:
+            time.sleep(min(1.0, limite - time.monotonic()))
+
+    def cerrar_conexion(self):
+        if self.conn is not None:
+            try:
+                self.conn.close()
+            except (pyodbc.Error, sqlite3.Error):
+                pass
+            self.conn = None
+
+
+def ejecutar_programado(archivo='reportes_biblioteca.json', especificaciones_cadencia=(), historial=True,
+                        conectar=conectar_bd, edad_maxima=None):
+    """Punto de entrada del modo programado"""
+    if edad_maxima is None:
+        edad_maxima = EDAD_MAXIMA_POR_DEFECTO
+    try:
+        cadencias = parsear_cadencias(especificaciones_cadencia)
+        if edad_maxima <= 0:
+            raise ValueError("--edad-maxima debe ser mayor que cero")
+    except ValueError as e:
+        print(f"[ERROR] {e}")
+        sys.exit(1)
+    ProgramadorReportes(archivo, cadencias, historial, conectar, edad_maxima).ejecutar()
+
+
+if __name__ == "__main__":
+    ejecutar_programado()
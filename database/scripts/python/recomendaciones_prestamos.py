@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Recomendaciones por co-préstamo ("quienes prestaron este libro también prestaron")
+- Trae en bloque los pares (UsuarioID, LibroID) de Prestamos -> Reservas
+- Arma una matriz dispersa usuarios x libros (scipy.sparse, 1 = lo prestó)
+- Similitud coseno libro-libro: (Xᵀ·X)[i, j] / sqrt(lectores_i · lectores_j),
+  calculada por bloques de libros para no pasar del presupuesto de memoria
+- Guarda los K vecinos de cada libro en LibrosRelacionados y/o en
+  data/recomendaciones/libros_relacionados.json
+
+Los usuarios con más de --max-libros-usuario libros (cuentas de prueba o de
+la propia biblioteca) se descartan: relacionan todo con todo y son los que
+más agrandan el producto.
+
+Uso:
+    python recomendaciones_prestamos.py                   # K=10, tabla + JSON
+    python recomendaciones_prestamos.py --vecinos 20 --meses 24 --minimo 3
+    python recomendaciones_prestamos.py --formato json --memoria-mb 128
+
+Requiere scipy (pip install scipy) y scripts/sql/crear_tabla_libros_relacionados.sql
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+import pyodbc
+
+from analitica_prestamos import leer_columnas, np
+from generar_reportes import conectar_bd, escribir_atomico
+
+try:
+    from scipy import sparse
+except ImportError:
+    sparse = None
+
+DIRECTORIO_SALIDA = os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'recomendaciones')
+
+VECINOS = 10
+# Co-préstamos mínimos para considerar relacionados dos libros
+MINIMO_COPRESTAMOS = 2
+MAX_LIBROS_USUARIO = 300
+MEMORIA_MB = 256
+# Bytes aproximados por entrada del producto de un bloque (índice, valor, similitud y orden)
+BYTES_POR_ENTRADA = 32
+TAMANO_INSERCION = 5000
+
+
+def leer_pares(conn, meses=None):
+    """Arreglos (usuarios, libros) con un par por usuario y libro prestado"""
+    cursor = conn.cursor()
+    filtro, parametros = '', []
+    if meses:
+        filtro = 'WHERE p.FechaPrestamo >= ?'
+        parametros.append(datetime.now() - timedelta(days=meses * 30))
+    cursor.execute(f"""
+        SELECT DISTINCT r.UsuarioID, r.LibroID
+        FROM Prestamos p
+        INNER JOIN Reservas r ON p.ReservaID = r.ReservaID
+        {filtro}
+    """, *parametros)
+    return leer_columnas(cursor, (np.int32, np.int32))
+
+
+def construir_matriz(usuarios, libros, max_libros_usuario):
+    """Matriz CSR binaria usuarios x libros; devuelve (X, LibroIDs, usuarios descartados)"""
+    _, filas = np.unique(usuarios, return_inverse=True)
+    libro_ids, columnas = np.unique(libros, return_inverse=True)
+    datos = np.ones(len(filas), dtype=np.float32)
+    X = sparse.csr_matrix((datos, (filas, columnas)), shape=(filas.max() + 1, len(libro_ids)))
+    X.sum_duplicates()
+    X.data[:] = 1
+    grado = np.diff(X.indptr)
+    activos = grado <= max_libros_usuario
+    return X[activos], libro_ids, int((~activos).sum())
+
+
+def bloques_por_presupuesto(costos, presupuesto):
+    """Cortes [a, b) de libros consecutivos cuyo costo acumulado entra en el presupuesto"""
+    acumulado = np.cumsum(costos)
+    cortes = [0]
+    while cortes[-1] < len(costos):
+        base = acumulado[cortes[-1] - 1] if cortes[-1] else 0
+        fin = int(np.searchsorted(acumulado, base + presupuesto, side='right'))
+        # Un libro que solo ya supera el presupuesto va en un bloque propio
+        cortes.append(max(fin, cortes[-1] + 1))
+    return list(zip(cortes, cortes[1:]))
+
+
+def vecinos_bloque(Xt, X, lectores, inicio, fin, vecinos, minimo):
+    """Top-K de los libros [inicio, fin): arreglos (libro, vecino, posición, similitud, co-préstamos)"""
+    C = (Xt[inicio:fin] @ X).tocoo()
+    filas, columnas, conteos = C.row, C.col, C.data
+    validos = (columnas != filas + inicio) & (conteos >= minimo)
+    filas, columnas, conteos = filas[validos], columnas[validos], conteos[validos]
+    similitud = conteos / np.sqrt(lectores[filas + inicio] * lectores[columnas])
+
+    # Orden por libro y similitud descendente (a igualdad, más co-préstamos primero)
+    orden = np.lexsort((-conteos, -similitud, filas))
+    filas, columnas, conteos, similitud = filas[orden], columnas[orden], conteos[orden], similitud[orden]
+    posicion = np.arange(len(filas)) - np.searchsorted(filas, filas, side='left')
+    top = posicion < vecinos
+    return filas[top] + inicio, columnas[top], posicion[top] + 1, similitud[top], conteos[top].astype(np.int32)
+
+
+def calcular_vecinos(X, vecinos, minimo, memoria_mb):
+    """Concatenar los top-K de todos los bloques; devuelve (arreglos, cantidad de bloques)"""
+    Xt = X.T.tocsr()
+    lectores = np.asarray(X.sum(axis=0)).ravel()
+    # Cota de entradas del producto de cada libro: suma de los grados de sus lectores
+    grado = np.diff(X.indptr).astype(np.int64)
+    costos = Xt @ grado
+    presupuesto = max(1, memoria_mb * 2**20 // BYTES_POR_ENTRADA)
+    bloques = bloques_por_presupuesto(costos, presupuesto)
+
+    partes = [vecinos_bloque(Xt, X, lectores, a, b, vecinos, minimo) for a, b in bloques]
+    if not partes:
+        vacio = np.array([], dtype=np.int64)
+        return (vacio,) * 5, 0
+    return tuple(np.concatenate(columna) for columna in zip(*partes)), len(bloques)
+
+
+def guardar_tabla(conn, filas):
+    """Reemplazar LibrosRelacionados en una sola transacción"""
+    cursor = conn.cursor()
+    cursor.fast_executemany = True
+    try:
+        cursor.execute("DELETE FROM LibrosRelacionados")
+        for i in range(0, len(filas), TAMANO_INSERCION):
+            cursor.executemany("""
+                INSERT INTO LibrosRelacionados (LibroID, Posicion, LibroRelacionadoID, Similitud, Coprestamos)
+                VALUES (?, ?, ?, ?, ?)
+            """, filas[i:i + TAMANO_INSERCION])
+        conn.commit()
+    except pyodbc.Error:
+        conn.rollback()
+        raise
+
+
+def exportar_json(filas, parametros, archivo):
+    libros = {}
+    for libro_id, _, relacionado_id, similitud, coprestamos in filas:
+        libros.setdefault(str(libro_id), []).append([relacionado_id, similitud, coprestamos])
+    contenido = {
+        'generado': datetime.now().isoformat(timespec='seconds'),
+        'parametros': parametros,
+        'campos': ['libro_relacionado_id', 'similitud', 'coprestamos'],
+        'libros': libros,
+    }
+    escribir_atomico(archivo, json.dumps(contenido, ensure_ascii=False, separators=(',', ':')))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Calcular libros relacionados por co-préstamo')
+    parser.add_argument('--vecinos', type=int, default=VECINOS, help=f'Vecinos por libro (por defecto {VECINOS})')
+    parser.add_argument('--minimo', type=int, default=MINIMO_COPRESTAMOS,
+                        help=f'Co-préstamos mínimos (por defecto {MINIMO_COPRESTAMOS})')
+    parser.add_argument('--meses', type=int, default=None, help='Solo préstamos de los últimos N meses')
+    parser.add_argument('--max-libros-usuario', type=int, default=MAX_LIBROS_USUARIO,
+                        help=f'Descartar usuarios con más libros (por defecto {MAX_LIBROS_USUARIO})')
+    parser.add_argument('--memoria-mb', type=int, default=MEMORIA_MB,
+                        help=f'Presupuesto de memoria por bloque (por defecto {MEMORIA_MB} MB)')
+    parser.add_argument('--formato', choices=['tabla', 'json', 'ambos'], default='ambos')
+    parser.add_argument('--salida', default=DIRECTORIO_SALIDA, help='Directorio del JSON exportado')
+    args = parser.parse_args()
+    if not 1 <= args.vecinos <= 255:
+        parser.error("--vecinos debe estar entre 1 y 255")
+
+    if np is None or sparse is None:
+        print("[ERROR] Este script necesita numpy y scipy: pip install numpy scipy")
+        sys.exit(1)
+
+    print("="*60)
+    print("LIBROS RELACIONADOS POR CO-PRÉSTAMO")
+    print("="*60)
+
+    conn = conectar_bd()
+    try:
+        inicio = time.perf_counter()
+        usuarios, libros = leer_pares(conn, args.meses)
+        print(f"[INFO] {len(usuarios):,} pares usuario-libro leídos ({time.perf_counter() - inicio:.2f} s)")
+        if len(usuarios) == 0:
+            print("[WARN] No hay préstamos para calcular recomendaciones")
+            return
+
+        marca = time.perf_counter()
+        X, libro_ids, descartados = construir_matriz(usuarios, libros, args.max_libros_usuario)
+        print(f"[INFO] Matriz {X.shape[0]:,} usuarios x {X.shape[1]:,} libros, {X.nnz:,} préstamos "
+              f"({descartados} usuarios descartados, {time.perf_counter() - marca:.2f} s)")
+
+        marca = time.perf_counter()
+        (libro, vecino, posicion, similitud, coprestamos), bloques = calcular_vecinos(
+            X, args.vecinos, args.minimo, args.memoria_mb)
+        print(f"[INFO] {len(libro):,} relaciones para {len(np.unique(libro)):,} libros "
+              f"en {bloques} bloque(s) ({time.perf_counter() - marca:.2f} s)")
+
+        filas = list(zip(libro_ids[libro].tolist(), posicion.tolist(), libro_ids[vecino].tolist(),
+                         np.round(similitud, 5).tolist(), coprestamos.tolist()))
+        if args.formato in ('tabla', 'ambos'):
+            marca = time.perf_counter()
+            guardar_tabla(conn, filas)
+            print(f"[GUARDADO] LibrosRelacionados: {len(filas):,} filas ({time.perf_counter() - marca:.2f} s)")
+        if args.formato in ('json', 'ambos'):
+            os.makedirs(args.salida, exist_ok=True)
+            archivo = os.path.join(args.salida, 'libros_relacionados.json')
+            exportar_json(filas, {'vecinos': args.vecinos, 'minimo': args.minimo, 'meses': args.meses}, archivo)
+            print(f"[GUARDADO] {archivo}")
+        print(f"\n[OK] Recomendaciones calculadas en {time.perf_counter() - inicio:.2f} s")
+    except pyodbc.Error as e:
+        print(f"[ERROR] Error de base de datos: {e}")
+        print("[INFO] ¿Se ejecutó scripts/sql/crear_tabla_libros_relacionados.sql?")
+        sys.exit(1)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Réplica local (SQLite) de las tablas que usan los reportes
+- Copia Prestamos, Reservas, Multas, Usuarios, Libros, Ejemplares y
+  JerarquiaLCC a data/replica_reportes.sqlite para que los reportes no
+  compitan con el tráfico de circulación del servidor de producción
+- Cada tabla se compara por bloques de IDs con
+  CHECKSUM_AGG(BINARY_CHECKSUM(...)) y solo se vuelven a copiar los bloques
+  cuyo checksum cambió: así llegan las devoluciones y renovaciones (el
+  backend no escribe FechaModificacion) y también los borrados
+- ConexionReplica imita la interfaz de pyodbc y traduce el T-SQL de
+  generar_reportes a SQLite, así los reportes corren sin cambios (los que
+  usan ROLLUP miran conn.dialecto y suman los subtotales en Python)
+
+Uso:
+    python replica_local.py                   # sincronización incremental
+    python replica_local.py --completo        # reconstruir la réplica desde cero
+    python generar_reportes.py --backend local
+"""
+
+import argparse
+import os
+import re
+import sqlite3
+import sys
+import time
+from datetime import datetime, date
+from decimal import Decimal
+
+ARCHIVO_REPLICA = os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'replica_reportes.sqlite')
+
+# Filas por bloque de checksum
+TAMANO_BLOQUE = 5000
+
+# Tabla -> clave primaria y columnas copiadas (sin datos sensibles como ContrasenaHash)
+TABLAS_REPLICA = {
+    'Usuarios': {
+        'clave': 'UsuarioID',
+        'columnas': ('UsuarioID', 'CodigoUniversitario', 'Nombre', 'Rol', 'Estado', 'FechaRegistro'),
+    },
+    'Libros': {
+        'clave': 'LibroID',
+        'columnas': ('LibroID', 'ISBN', 'Titulo', 'Editorial', 'AnioPublicacion', 'Idioma', 'SignaturaLCC'),
+    },
+    'Ejemplares': {
+        'clave': 'EjemplarID',
+        'columnas': ('EjemplarID', 'LibroID', 'NumeroEjemplar', 'CodigoBarras', 'Estado', 'FechaAlta'),
+    },
+    'Reservas': {
+        'clave': 'ReservaID',
+        'columnas': ('ReservaID', 'UsuarioID', 'LibroID', 'EjemplarID', 'FechaReserva', 'Estado',
+                     'TipoReserva', 'FechaExpiracion', 'FechaLimiteRetiro'),
+    },
+    'Prestamos': {
+        'clave': 'PrestamoID',
+        'columnas': ('PrestamoID', 'ReservaID', 'FechaPrestamo', 'FechaVencimiento', 'FechaDevolucion',
+                     'Estado', 'Renovaciones', 'FechaCreacion', 'FechaModificacion'),
+    },
+    'Multas': {
+        'clave': 'MultaID',
+        'columnas': ('MultaID', 'PrestamoID', 'UsuarioID', 'Monto', 'Estado', 'DiasAtraso', 'Motivo', 'FechaCobro'),
+    },
+    'JerarquiaLCC': {
+        'clave': 'LibroID',
+        'columnas': ('LibroID', 'Clase', 'NombreClase', 'Subclase', 'Seccion', 'NumeroLCC', 'FechaActualizacion'),
+    },
+}
+
+# Índices locales para las consultas de los reportes
+INDICES_REPLICA = (
+    "CREATE INDEX IF NOT EXISTS IX_Prestamos_FechaPrestamo ON Prestamos (FechaPrestamo)",
+    "CREATE INDEX IF NOT EXISTS IX_Prestamos_ReservaID ON Prestamos (ReservaID)",
+    "CREATE INDEX IF NOT EXISTS IX_Reservas_LibroID ON Reservas (LibroID)",
+    "CREATE INDEX IF NOT EXISTS IX_Reservas_UsuarioID ON Reservas (UsuarioID)",
+    "CREATE INDEX IF NOT EXISTS IX_Multas_FechaCobro ON Multas (FechaCobro)",
+)
+
+
+def valor_sqlite(valor):
+    """Convertir un valor de pyodbc a un tipo nativo de SQLite"""
+    if isinstance(valor, datetime):
+        return valor.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(valor, date):
+        return valor.strftime('%Y-%m-%d')
+    if isinstance(valor, Decimal):
+        return float(valor)
+    if isinstance(valor, bool):
+        return int(valor)
+    return valor
+
+
+def abrir_replica(archivo=ARCHIVO_REPLICA):
+    """Abrir (o crear) el archivo de la réplica con su esquema"""
+    os.makedirs(os.path.dirname(os.path.abspath(archivo)), exist_ok=True)
+    local = sqlite3.connect(archivo)
+    # WAL: los reportes pueden leer mientras se sincroniza
+    local.execute("PRAGMA journal_mode=WAL")
+    for tabla, definicion in TABLAS_REPLICA.items():
+        columnas = ', '.join(
+            f"{c} INTEGER PRIMARY KEY" if c == definicion['clave'] else c
+            for c in definicion['columnas']
+        )
+        local.execute(f"CREATE TABLE IF NOT EXISTS {tabla} ({columnas})")
+    for indice in INDICES_REPLICA:
+        local.execute(indice)
+    local.execute("""
+        CREATE TABLE IF NOT EXISTS _ReplicaBloques (
+            Tabla TEXT NOT NULL,
+            Bloque INTEGER NOT NULL,
+            Checksum INTEGER,
+            Filas INTEGER NOT NULL,
+            PRIMARY KEY (Tabla, Bloque)
+        )
+    """)
+    local.execute("""
+        CREATE TABLE IF NOT EXISTS _ReplicaEstado (
+            Tabla TEXT PRIMARY KEY,
+            MarcaAgua TEXT,
+            FechaSincronizacion TEXT NOT NULL
+        )
+    """)
+    local.commit()
+    return local
+
+
+def insertar_filas(local, tabla, columnas, filas):
+    marcadores = ', '.join('?' for _ in columnas)
+    local.executemany(
+        f"INSERT OR REPLACE INTO {tabla} ({', '.join(columnas)}) VALUES ({marcadores})",
+        ([valor_sqlite(v) for v in fila] for fila in filas)
+    )
+
+
+def sincronizar_bloques(origen, local, tabla, definicion):
+    """Copiar solo los bloques de IDs cuyo checksum cambió en el origen"""
+    clave = definicion['clave']
+    columnas = definicion['columnas']
+
+    cursor = origen.cursor()
+    # El tamaño va en el texto: con dos parámetros SQL Server no reconoce que
+    # la expresión del SELECT es la del GROUP BY (error 8120)
+    cursor.execute(f"""
+        SELECT {clave} / {int(TAMANO_BLOQUE)} AS Bloque,
+               CHECKSUM_AGG(BINARY_CHECKSUM({', '.join(columnas)})), COUNT(*)
+        FROM {tabla}
+        GROUP BY {clave} / {int(TAMANO_BLOQUE)}
+    """)
+    remotos = {row[0]: (row[1], row[2]) for row in cursor.fetchall()}
+
+    locales = {
+        row[0]: (row[1], row[2])
+        for row in local.execute("SELECT Bloque, Checksum, Filas FROM _ReplicaBloques WHERE Tabla = ?", (tabla,))
+    }
+
+    # Sin bloques guardados (réplica nueva o tabla que antes se copiaba por marca
+    # de agua) no se sabe qué filas locales siguen en el origen
+    if not locales:
+        local.execute(f"DELETE FROM {tabla}")
+
+    copiadas = 0
+    for bloque in sorted(set(locales) - set(remotos)):
+        local.execute(f"DELETE FROM {tabla} WHERE {clave} / ? = ?", (TAMANO_BLOQUE, bloque))
+        local.execute("DELETE FROM _ReplicaBloques WHERE Tabla = ? AND Bloque = ?", (tabla, bloque))
+
+    for bloque, (checksum, filas) in sorted(remotos.items()):
+        if locales.get(bloque) == (checksum, filas):
+            continue
+        inicio, fin = bloque * TAMANO_BLOQUE, (bloque + 1) * TAMANO_BLOQUE
+        cursor.execute(f"SELECT {', '.join(columnas)} FROM {tabla} WHERE {clave} >= ? AND {clave} < ?", inicio, fin)
+        lote = cursor.fetchall()
+        local.execute(f"DELETE FROM {tabla} WHERE {clave} >= ? AND {clave} < ?", (inicio, fin))
+        insertar_filas(local, tabla, columnas, lote)
+        local.execute(
+            "INSERT OR REPLACE INTO _ReplicaBloques (Tabla, Bloque, Checksum, Filas) VALUES (?, ?, ?, ?)",
+            (tabla, bloque, checksum, filas)
+        )
+        copiadas += len(lote)
+
+    local.execute(
+        "INSERT OR REPLACE INTO _ReplicaEstado (Tabla, MarcaAgua, FechaSincronizacion) VALUES (?, NULL, ?)",
+        (tabla, datetime.now().isoformat())
+    )
+    return copiadas
+
+
+def sincronizar(origen, archivo=ARCHIVO_REPLICA, completo=False):
+    """Sincronizar la réplica; devuelve {tabla: filas copiadas}"""
+    if completo and os.path.exists(archivo):
+        for sufijo in ('', '-wal', '-shm'):
+            if os.path.exists(archivo + sufijo):
+                os.remove(archivo + sufijo)
+
+    local = abrir_replica(archivo)
+    resumen = {}
+    try:
+        for tabla, definicion in TABLAS_REPLICA.items():
+            inicio = time.perf_counter()
+            copiadas = sincronizar_bloques(origen, local, tabla, definicion)
+            # Una transacción por tabla: la réplica nunca queda con una tabla a medias
+            local.commit()
+            resumen[tabla] = copiadas
+            print(f"  {tabla:12s} {copiadas:8,} filas copiadas ({time.perf_counter() - inicio:.2f} s)")
+    except BaseException:
+        local.rollback()
+        raise
+    finally:
+        local.close()
+    return resumen
+
+
+# ============================================================
+# Conexión de solo lectura con traducción T-SQL -> SQLite
+# ============================================================
+
+TRADUCCIONES = (
+    (re.compile(r"SELECT\s+COLUMN_NAME\s+FROM\s+INFORMATION_SCHEMA\.COLUMNS\s+WHERE\s+TABLE_NAME\s*=\s*'(\w+)'", re.I),
+     r"SELECT name AS COLUMN_NAME FROM pragma_table_info('\1')"),
+    (re.compile(r"CAST\(\s*([\w.]+)\s+AS\s+DATE\s*\)", re.I), r"date(\1)"),
+    (re.compile(r"\bYEAR\(\s*([\w.]+)\s*\)", re.I), r"CAST(strftime('%Y', \1) AS INTEGER)"),
+    (re.compile(r"\bMONTH\(\s*([\w.]+)\s*\)", re.I), r"CAST(strftime('%m', \1) AS INTEGER)"),
+    (re.compile(r"\bGETDATE\(\s*\)", re.I), r"datetime('now', 'localtime')"),
+    (re.compile(r"\bISNULL\(", re.I), r"IFNULL("),
+)
+
+PATRON_TOP = re.compile(r"\bTOP\s*\(\s*\?\s*\)", re.I)
+
+
+def traducir_sql(sql, parametros):
+    """Traducir una consulta de los reportes al dialecto de SQLite"""
+    parametros = list(parametros)
+
+    # TOP (?) -> LIMIT ? al final, moviendo su parámetro a la última posición
+    coincidencia = PATRON_TOP.search(sql)
+    if coincidencia:
+        posicion = sql.count('?', 0, coincidencia.start())
+        limite = parametros.pop(posicion)
+        sql = sql[:coincidencia.start()] + sql[coincidencia.end():]
+        sql = sql.rstrip().rstrip(';') + "\n LIMIT ?"
+        parametros.append(limite)
+
+    for patron, reemplazo in TRADUCCIONES:
+        sql = patron.sub(reemplazo, sql)
+
+    return sql, [valor_sqlite(p) for p in parametros]
+
+
+class CursorReplica:
+    """Cursor con la misma firma que pyodbc (execute(sql, *params))"""
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    def execute(self, sql, *parametros):
+        sql, parametros = traducir_sql(sql, parametros)
+        self.cursor.execute(sql, parametros)
+        return self
+
+    def fetchone(self):
+        return self.cursor.fetchone()
+
+    def fetchall(self):
+        return self.cursor.fetchall()
+
+    def fetchmany(self, tamano):
+        return self.cursor.fetchmany(tamano)
+
+    def close(self):
+        self.cursor.close()
+
+
+class ConexionReplica:
+    """Conexión de solo lectura sobre la réplica local"""
+
+    # Los reportes que usan sintaxis sin traducción (ROLLUP) eligen otra consulta
+    dialecto = 'sqlite'
+
+    def __init__(self, archivo=ARCHIVO_REPLICA):
+        ruta = os.path.abspath(archivo)
+        self.conn = sqlite3.connect(f"file:{ruta}?mode=ro", uri=True)
+
+    def cursor(self):
+        return CursorReplica(self.conn.cursor())
+
+    def estado(self):
+        """Fecha de la última sincronización de cada tabla"""
+        return dict(self.conn.execute("SELECT Tabla, FechaSincronizacion FROM _ReplicaEstado"))
+
+    def close(self):
+        self.conn.close()
+
+
+def conectar_replica(archivo=ARCHIVO_REPLICA):
+    """Conectar a la réplica local (equivalente a conectar_bd para --backend local)"""
+    if not os.path.exists(archivo):
+        print(f"[ERROR] No existe la réplica local: {archivo}")
+        print("\n[INFO] Crea la réplica con:")
+        print("   python replica_local.py")
+        sys.exit(1)
+    return ConexionReplica(archivo)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sincronizar la réplica local de reportes')
+    parser.add_argument('--archivo', default=ARCHIVO_REPLICA, help='Archivo SQLite de la réplica')
+    parser.add_argument('--completo', action='store_true', help='Reconstruir la réplica desde cero')
+    args = parser.parse_args()
+
+    from generar_reportes import conectar_bd, SERVIDOR, BASE_DATOS
+
+    print("="*60)
+    print("REPLICA LOCAL DE REPORTES - BIBLIOTECA FISI")
+    print("="*60)
+    print(f"\nConectando a {SERVIDOR} - Base de datos: {BASE_DATOS}...")
+    origen = conectar_bd()
+    print("[OK] Conexion exitosa!\n")
+
+    try:
+        inicio = time.perf_counter()
+        resumen = sincronizar(origen, args.archivo, args.completo)
+        print(f"\n[OK] Réplica sincronizada: {sum(resumen.values()):,} filas "
+              f"en {time.perf_counter() - inicio:.1f} s -> {args.archivo}")
+    except Exception as e:
+        print(f"\n[ERROR] Error al sincronizar la réplica: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+    finally:
+        origen.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,393 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Servicio HTTP de reportes (asyncio, sin dependencias externas)
+- Expone las funciones de generar_reportes como JSON:
+    GET /reportes                          lista de reportes disponibles
+    GET /reportes/<reporte>?limite=5       JSON tal como lo genera generar_reportes
+    GET /api/Reportes/<reporte-kebab>      mismo formato (camelCase) que el
+                                           ReportesController de .NET
+    GET /salud                             estado del servicio y de la caché
+- Las consultas corren en un pool de hilos (una conexión por hilo)
+- Las respuestas se guardan en caché por reporte + parámetros durante --ttl
+- Peticiones idénticas simultáneas esperan a una sola consulta
+- ETag / If-None-Match: un dashboard que refresca sin cambios recibe 304
+- Requiere el header X-API-Key con una clave de alcance 'Reportes'
+  (ApiKeys.Alcance, scripts/sql/agregar_alcance_api_keys.sql): los reportes
+  son solo para administradores, como en ReportesController, y una clave de
+  la API pública no sirve
+
+Uso:
+    python servicio_reportes.py --puerto 8085
+    python servicio_reportes.py --backend local --ttl 300
+    python servicio_reportes.py --sin-api-key      # solo para desarrollo local
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import re
+import signal
+import sqlite3
+import sys
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import urlsplit, parse_qsl
+
+import pyodbc
+
+from generar_reportes import (REPORTES, PERIODOS_RANKING, conectar_backend, conectar_bd, opciones_por_defecto,
+                              parametros_reporte)
+
+TTL_POR_DEFECTO = 60
+HILOS_POR_DEFECTO = 4
+# Validez de una API Key ya comprobada en la base de datos (segundos)
+TTL_API_KEY = 5 * 60
+# Alcance de ApiKeys que da acceso a los reportes (equivale al rol Administrador)
+ALCANCE_REPORTES = 'Reportes'
+TAMANO_MAXIMO_CABECERAS = 16 * 1024
+
+# Alias aceptados en la query string -> parámetro de los reportes
+ALIAS_PARAMETROS = {
+    'año': 'año', 'anio': 'año', 'year': 'año',
+    'limite': 'limite', 'limit': 'limite',
+    'meses': 'meses', 'months': 'meses',
+    'fecha': 'fecha', 'date': 'fecha',
+    'periodo': 'periodo', 'period': 'periodo',
+}
+
+ESTADOS_HTTP = {
+    200: 'OK', 304: 'Not Modified', 400: 'Bad Request', 401: 'Unauthorized',
+    404: 'Not Found', 405: 'Method Not Allowed', 500: 'Internal Server Error',
+    503: 'Service Unavailable',
+}
+
+
+class ErrorHTTP(Exception):
+    def __init__(self, estado, mensaje):
+        super().__init__(mensaje)
+        self.estado = estado
+        self.mensaje = mensaje
+
+
+def convertir_parametro(nombre, valor):
+    """Validar y convertir un parámetro de la query string"""
+    try:
+        if nombre in ('año', 'limite', 'meses'):
+            numero = int(valor)
+            if numero <= 0:
+                raise ValueError
+            return numero
+        if nombre == 'fecha':
+            return datetime.strptime(valor, '%Y-%m-%d').date()
+        if nombre == 'periodo' and valor not in PERIODOS_RANKING:
+            raise ErrorHTTP(400, f"Valor inválido para periodo: {valor} (use {', '.join(PERIODOS_RANKING)})")
+    except ValueError:
+        raise ErrorHTTP(400, f"Valor inválido para {nombre}: {valor}")
+    return valor
+
+
+def a_camel(texto):
+    partes = texto.split('_')
+    return partes[0] + ''.join(p[:1].upper() + p[1:] for p in partes[1:])
+
+
+def a_formato_api(nombre, datos):
+    """Adaptar el JSON de generar_reportes al formato del ReportesController (.NET)"""
+    if nombre == 'prestamos_por_mes':
+        return [{'mes': mes, 'cantidad': cantidad} for mes, cantidad in datos.items()]
+
+    def convertir(valor):
+        if isinstance(valor, dict):
+            return {a_camel(k): convertir(v) for k, v in valor.items()}
+        if isinstance(valor, list):
+            return [convertir(v) for v in valor]
+        return valor
+
+    return convertir(datos)
+
+
+class ServicioReportes:
+    def __init__(self, backend='sqlserver', ttl=TTL_POR_DEFECTO, hilos=HILOS_POR_DEFECTO, exigir_api_key=True):
+        self.backend = backend
+        self.ttl = ttl
+        self.exigir_api_key = exigir_api_key
+        self.executor = ThreadPoolExecutor(max_workers=hilos, thread_name_prefix='reportes')
+        self.local = threading.local()
+
+        # (reporte, parámetros) -> (expira, cuerpo, etag)
+        self.cache = {}
+        # (reporte, parámetros) -> Future de la consulta en curso
+        self.en_curso = {}
+        # api key -> expira
+        self.api_keys = {}
+
+        self.aciertos = 0
+        self.consultas = 0
+        self.coalescidas = 0
+
+    # ------------------------------------------------------------
+    # Acceso a datos (hilos del pool)
+    # ------------------------------------------------------------
+
+    def conexion(self, atributo, conectar):
+        """Conexión propia de cada hilo (pyodbc no comparte conexiones entre hilos)"""
+        conn = getattr(self.local, atributo, None)
+        if conn is None:
+            try:
+                conn = conectar()
+            except SystemExit:
+                # conectar_bd termina el proceso cuando falla; aquí solo falla la petición
+                raise ErrorHTTP(503, "No se pudo conectar a la base de datos")
+            setattr(self.local, atributo, conn)
+        return conn
+
+    def descartar_conexion(self, atributo):
+        conn = getattr(self.local, atributo, None)
+        setattr(self.local, atributo, None)
+        if conn is not None:
+            try:
+                conn.close()
+            except (pyodbc.Error, sqlite3.Error):
+                pass
+
+    def ejecutar_reporte(self, nombre, parametros):
+        conn = self.conexion('conn', lambda: conectar_backend(self.backend, log=lambda *_: None))
+        try:
+            return REPORTES[nombre]['funcion'](conn, **parametros)
+        except (pyodbc.Error, sqlite3.Error):
+            # La próxima petición de este hilo abre una conexión nueva
+            self.descartar_conexion('conn')
+            raise
+
+    def validar_api_key_bd(self, api_key):
+        conn = self.conexion('conn_api_keys', conectar_bd)
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT COUNT(*) FROM ApiKeys WHERE ApiKey = ? AND Activa = 1 AND Alcance = ?",
+                           api_key, ALCANCE_REPORTES)
+            return cursor.fetchone()[0] > 0
+        except pyodbc.Error:
+            self.descartar_conexion('conn_api_keys')
+            raise
+
+    # ------------------------------------------------------------
+    # Caché y coalescencia (event loop)
+    # ------------------------------------------------------------
+
+    async def obtener(self, nombre, parametros, formato_api):
+        """Devolver (cuerpo, etag, segundos de validez) usando caché y coalescencia"""
+        clave = (nombre, formato_api, tuple(sorted((k, str(v)) for k, v in parametros.items())))
+        ahora = time.monotonic()
+
+        entrada = self.cache.get(clave)
+        if entrada is not None and entrada[0] > ahora:
+            self.aciertos += 1
+            return entrada[1], entrada[2], entrada[0] - ahora
+
+        pendiente = self.en_curso.get(clave)
+        if pendiente is not None:
+            self.coalescidas += 1
+            cuerpo, etag, expira = await asyncio.shield(pendiente)
+            return cuerpo, etag, expira - time.monotonic()
+
+        futuro = asyncio.get_running_loop().create_future()
+        self.en_curso[clave] = futuro
+        try:
+            self.consultas += 1
+            datos = await asyncio.get_running_loop().run_in_executor(
+                self.executor, self.ejecutar_reporte, nombre, parametros
+            )
+            if formato_api:
+                datos = a_formato_api(nombre, datos)
+            cuerpo = json.dumps(datos, ensure_ascii=False, default=str).encode('utf-8')
+            etag = '"' + hashlib.sha256(cuerpo).hexdigest()[:32] + '"'
+            expira = time.monotonic() + self.ttl
+            self.cache[clave] = (expira, cuerpo, etag)
+            futuro.set_result((cuerpo, etag, expira))
+            return cuerpo, etag, self.ttl
+        except BaseException as e:
+            futuro.set_exception(e)
+            # Evitar el aviso "exception was never retrieved" si nadie más esperaba
+            futuro.exception()
+            raise
+        finally:
+            del self.en_curso[clave]
+
+    async def verificar_api_key(self, cabeceras):
+        if not self.exigir_api_key:
+            return
+        api_key = cabeceras.get('x-api-key')
+        if not api_key:
+            raise ErrorHTTP(401, "API Key requerida. Incluye el header X-API-Key.")
+        if self.api_keys.get(api_key, 0) > time.monotonic():
+            return
+        valida = await asyncio.get_running_loop().run_in_executor(self.executor, self.validar_api_key_bd, api_key)
+        if not valida:
+            raise ErrorHTTP(401, "API Key inválida, inactiva o sin acceso a reportes.")
+        self.api_keys[api_key] = time.monotonic() + TTL_API_KEY
+
+    def purgar_cache(self):
+        ahora = time.monotonic()
+        for clave in [c for c, (expira, _, _) in self.cache.items() if expira <= ahora]:
+            del self.cache[clave]
+
+    # ------------------------------------------------------------
+    # HTTP
+    # ------------------------------------------------------------
+
+    async def resolver(self, metodo, ruta, cabeceras):
+        """Devolver (estado, cuerpo, cabeceras extra) de una petición"""
+        if metodo not in ('GET', 'HEAD'):
+            raise ErrorHTTP(405, "Solo se admiten GET y HEAD")
+
+        partes = urlsplit(ruta)
+        camino = partes.path.rstrip('/') or '/'
+
+        if camino == '/salud':
+            estado = {
+                'estado': 'ok',
+                'backend': self.backend,
+                'entradas_cache': len(self.cache),
+                'aciertos_cache': self.aciertos,
+                'consultas': self.consultas,
+                'peticiones_coalescidas': self.coalescidas,
+            }
+            return 200, json.dumps(estado).encode('utf-8'), {}
+
+        await self.verificar_api_key(cabeceras)
+
+        if camino == '/reportes':
+            lista = [{'reporte': nombre, 'parametros': list(d['parametros'])} for nombre, d in REPORTES.items()]
+            return 200, json.dumps(lista, ensure_ascii=False).encode('utf-8'), {}
+
+        coincidencia = re.fullmatch(r'/reportes/(\w+)', camino)
+        formato_api = False
+        if coincidencia is None:
+            coincidencia = re.fullmatch(r'/api/reportes/([\w-]+)', camino, re.I)
+            formato_api = True
+        if coincidencia is None:
+            raise ErrorHTTP(404, f"Ruta no encontrada: {camino}")
+
+        nombre = coincidencia.group(1).replace('-', '_')
+        if nombre not in REPORTES:
+            raise ErrorHTTP(404, f"Reporte desconocido: {nombre}")
+
+        opciones = opciones_por_defecto()
+        for clave, valor in parse_qsl(partes.query):
+            parametro = ALIAS_PARAMETROS.get(clave)
+            if parametro is not None:
+                opciones[parametro] = convertir_parametro(parametro, valor)
+        parametros = parametros_reporte(nombre, opciones)
+
+        cuerpo, etag, validez = await self.obtener(nombre, parametros, formato_api)
+        extra = {'ETag': etag, 'Cache-Control': f'private, max-age={max(int(validez), 0)}'}
+        if etag in [e.strip() for e in cabeceras.get('if-none-match', '').split(',')]:
+            return 304, b'', extra
+        return 200, cuerpo, extra
+
+    async def atender(self, reader, writer):
+        """Atender una conexión (HTTP/1.1 con keep-alive)"""
+        try:
+            while True:
+                try:
+                    cabecera = await reader.readuntil(b'\r\n\r\n')
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    break
+
+                lineas = cabecera.decode('iso-8859-1').split('\r\n')
+                try:
+                    metodo, ruta, version = lineas[0].split(' ', 2)
+                except ValueError:
+                    break
+                cabeceras = {}
+                for linea in lineas[1:]:
+                    if ':' in linea:
+                        clave, valor = linea.split(':', 1)
+                        cabeceras[clave.strip().lower()] = valor.strip()
+
+                inicio = time.perf_counter()
+                try:
+                    estado, cuerpo, extra = await self.resolver(metodo, ruta, cabeceras)
+                except ErrorHTTP as e:
+                    estado, cuerpo, extra = e.estado, json.dumps({'mensaje': e.mensaje}, ensure_ascii=False).encode('utf-8'), {}
+                except Exception as e:
+                    # El detalle (driver, SQL) queda en el log del servidor, no en la respuesta
+                    print(f"[ERROR] {metodo} {ruta}: {e}")
+                    traceback.print_exc()
+                    estado, cuerpo, extra = 500, json.dumps({'mensaje': 'Error al generar el reporte'}, ensure_ascii=False).encode('utf-8'), {}
+
+                mantener = version == 'HTTP/1.1' and cabeceras.get('connection', '').lower() != 'close'
+                respuesta = [f"HTTP/1.1 {estado} {ESTADOS_HTTP.get(estado, '')}"]
+                if estado != 304:
+                    respuesta.append("Content-Type: application/json; charset=utf-8")
+                respuesta.append(f"Content-Length: {len(cuerpo) if estado != 304 else 0}")
+                respuesta.append(f"Connection: {'keep-alive' if mantener else 'close'}")
+                respuesta.extend(f"{k}: {v}" for k, v in extra.items())
+                writer.write(('\r\n'.join(respuesta) + '\r\n\r\n').encode('iso-8859-1'))
+                if metodo != 'HEAD' and estado != 304:
+                    writer.write(cuerpo)
+                await writer.drain()
+
+                print(f"  [{datetime.now():%H:%M:%S}] {metodo} {ruta} -> {estado} ({(time.perf_counter() - inicio) * 1000:.1f} ms)")
+                if not mantener:
+                    break
+        finally:
+            writer.close()
+
+    async def purgar_periodicamente(self):
+        while True:
+            await asyncio.sleep(max(self.ttl, 1))
+            self.purgar_cache()
+
+    async def ejecutar(self, host, puerto):
+        servidor = await asyncio.start_server(self.atender, host, puerto, limit=TAMANO_MAXIMO_CABECERAS)
+        detener = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for senal in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(senal, detener.set)
+            except (NotImplementedError, RuntimeError):
+                # Windows: Ctrl+C se recibe como KeyboardInterrupt
+                pass
+
+        print("="*60)
+        print("SERVICIO DE REPORTES - BIBLIOTECA FISI")
+        print("="*60)
+        print(f"  Escuchando en http://{host}:{puerto}  (backend: {self.backend}, ttl: {self.ttl} s)")
+        if not self.exigir_api_key:
+            print("  [WARN] API Key desactivada: no exponer este puerto fuera de la máquina")
+        print()
+
+        purga = asyncio.create_task(self.purgar_periodicamente())
+        async with servidor:
+            await detener.wait()
+        purga.cancel()
+        self.executor.shutdown(wait=False)
+        print("\n[INFO] Servicio detenido")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Servicio HTTP de reportes - Biblioteca FISI')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--puerto', type=int, default=8085)
+    parser.add_argument('--backend', choices=['sqlserver', 'local'], default='sqlserver')
+    parser.add_argument('--ttl', type=int, default=TTL_POR_DEFECTO, help='Segundos de caché por respuesta')
+    parser.add_argument('--hilos', type=int, default=HILOS_POR_DEFECTO, help='Hilos (y conexiones) para consultas')
+    parser.add_argument('--sin-api-key', action='store_true', help='No exigir X-API-Key (solo desarrollo)')
+    args = parser.parse_args()
+
+    servicio = ServicioReportes(args.backend, args.ttl, args.hilos, exigir_api_key=not args.sin_api_key)
+    try:
+        asyncio.run(servicio.ejecutar(args.host, args.puerto))
+    except KeyboardInterrupt:
+        print("\n[INFO] Servicio detenido")
+        sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Snapshot binario de solo lectura del catálogo (mmap)
+- Libros, Autores, Categorias, LibroAutores, LibroCategorias y Ejemplares
+  en un solo archivo: cada columna es un arreglo contiguo (columnar)
+- Los textos van una sola vez a un montón de cadenas compartido; las
+  columnas de texto guardan el número de cadena (0 = NULL)
+- Enteros NULL = -2147483648, fechas NULL = NaT, bits NULL = 255
+- Índices: las tablas principales van ordenadas por ID (búsqueda binaria);
+  las tablas hijas van agrupadas por LibroID y Libros guarda dónde empieza
+  el grupo de cada libro (@LibroAutores, @LibroCategorias, @Ejemplares);
+  Ejemplares guarda además sus EjemplarID ya ordenados y la fila de cada
+  uno (@EjemplarIDOrdenado, @EjemplarID) para buscar por ID sobre el mmap
+- Abrirlo solo lee la cabecera y el directorio de columnas: los arreglos
+  son vistas sobre el mmap, y varios procesos comparten la misma copia en
+  la caché de páginas del sistema operativo
+- Versionado: la cabecera lleva la huella (SHA-256) del contenido; si el
+  catálogo no cambió, el archivo no se reescribe. Se reemplaza de forma
+  atómica: quien lo tenga abierto sigue leyendo la versión anterior hasta
+  que reabra (vigente() avisa cuándo)
+
+Uso:
+    python snapshot_catalogo.py                 # exportar
+    python snapshot_catalogo.py --info          # tablas, filas y versión
+    python snapshot_catalogo.py --libro 42      # leer un libro del snapshot
+
+Desde otro script:
+    from snapshot_catalogo import SnapshotCatalogo
+    with SnapshotCatalogo() as catalogo:
+        catalogo.libro(42)   # {'LibroID': 42, 'Titulo': ..., 'autores': [...], 'ejemplares': [...]}
+"""
+
+import argparse
+import hashlib
+import mmap
+import os
+import struct
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import pyodbc
+
+ARCHIVO_SNAPSHOT = os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'snapshot', 'catalogo.snap')
+
+MAGIA = b'SNAP'
+FORMATO = 2
+# magia, formato, columnas, cadenas, generado (epoch), huella, inicio del montón, datos del montón, bytes del montón
+CABECERA = struct.Struct('<4sHHIq16sQQQ')
+# tabla, columna, tipo, cantidad, posición
+ENTRADA_DIRECTORIO = struct.Struct('<24s24sc3xIQ')
+ALINEACION = 8
+
+NULO_ENTERO = -2**31
+NULO_BIT = 255
+
+TIPOS = {
+    b'i': np.dtype('<i4'),     # entero
+    b'b': np.dtype('u1'),      # bit
+    b's': np.dtype('<u4'),     # número de cadena en el montón
+    b'd': np.dtype('<M8[s]'),  # fecha y hora
+    b'u': np.dtype('<u4'),     # índice interno
+}
+
+# (consulta, tipos de las columnas); la primera columna es el ID o la clave de agrupación
+TABLAS = {
+    'Libros': ("""
+        SELECT LibroID, ISBN, Titulo, Editorial, AnioPublicacion, Idioma, Paginas,
+               LCCSeccion, LCCNumero, LCCCutter, SignaturaLCC
+        FROM Libros ORDER BY LibroID
+    """, 'isssisissss'),
+    'Autores': ("SELECT AutorID, Nombre, Biografia, ORCID FROM Autores ORDER BY AutorID", 'isss'),
+    'Categorias': ("SELECT CategoriaID, Nombre FROM Categorias ORDER BY CategoriaID", 'is'),
+    'LibroAutores': ("""
+        SELECT LibroID, AutorID, EsAutorPrincipal, OrdenAutor
+        FROM LibroAutores ORDER BY LibroID, ISNULL(OrdenAutor, 999), AutorID
+    """, 'iibi'),
+    'LibroCategorias': ("""
+        SELECT LibroID, CategoriaID, EsCategoriaPrincipal
+        FROM LibroCategorias ORDER BY LibroID, CategoriaID
+    """, 'iib'),
+    'Ejemplares': ("""
+        SELECT LibroID, EjemplarID, NumeroEjemplar, CodigoBarras, Ubicacion, Estado, FechaAlta, Observaciones
+        FROM Ejemplares ORDER BY LibroID, NumeroEjemplar, EjemplarID
+    """, 'iiisssds'),
+}
+# Tablas agrupadas por LibroID (su primera columna)
+TABLAS_POR_LIBRO = ('LibroAutores', 'LibroCategorias', 'Ejemplares')
+
+
+class MontonCadenas:
+    """Cadenas sin repetir; la 0 es NULL"""
+
+    def __init__(self):
+        self.ids = {}
+        self.cadenas = [b'']
+
+    def agregar(self, texto):
+        if texto is None:
+            return 0
+        numero = self.ids.get(texto)
+        if numero is None:
+            numero = self.ids[texto] = len(self.cadenas)
+            self.cadenas.append(str(texto).encode('utf-8'))
+        return numero
+
+
+def convertir(valores, tipo, monton):
+    """Lista de valores de una columna -> arreglo numpy del tipo indicado"""
+    if tipo == b's':
+        return np.array([monton.agregar(v) for v in valores], dtype=TIPOS[tipo])
+    if tipo == b'i':
+        return np.array([NULO_ENTERO if v is None else v for v in valores], dtype=TIPOS[tipo])
+    if tipo == b'b':
+        return np.array([NULO_BIT if v is None else int(v) for v in valores], dtype=TIPOS[tipo])
+    if tipo == b'd':
+        return np.array([np.datetime64('NaT') if v is None else np.datetime64(v, 's') for v in valores], dtype=TIPOS[tipo])
+    return np.asarray(valores, dtype=TIPOS[tipo])
+
+
+def leer_tablas(conn):
+    """[(tabla, columna, tipo, arreglo)] de todas las tablas, más el montón de cadenas"""
+    cursor = conn.cursor()
+    monton = MontonCadenas()
+    columnas = []
+    for tabla, (consulta, tipos) in TABLAS.items():
+        cursor.execute(consulta)
+        nombres = [d[0] for d in cursor.description]
+        filas = cursor.fetchall()
+        for i, (nombre, tipo) in enumerate(zip(nombres, tipos)):
+            tipo = tipo.encode('ascii')
+            columnas.append((tabla, nombre, tipo, convertir([f[i] for f in filas], tipo, monton)))
+
+    arreglos = {(t, c): a for t, c, _, a in columnas}
+    libro_ids = arreglos[('Libros', 'LibroID')]
+    for tabla in TABLAS_POR_LIBRO:
+        hijos = arreglos[(tabla, 'LibroID')]
+        inicio = np.searchsorted(hijos, libro_ids, side='left')
+        columnas.append(('Libros', f'@{tabla}', b'u', np.append(inicio, len(hijos)).astype(TIPOS[b'u'])))
+    # Ejemplares va por LibroID: EjemplarID ordenados y la fila de cada uno, para buscar por ID
+    ejemplar_ids = arreglos[('Ejemplares', 'EjemplarID')]
+    orden = np.argsort(ejemplar_ids, kind='stable')
+    columnas.append(('Ejemplares', '@EjemplarIDOrdenado', b'i', ejemplar_ids[orden]))
+    columnas.append(('Ejemplares', '@EjemplarID', b'u', orden.astype(TIPOS[b'u'])))
+    return columnas, monton
+
+
+def armar_snapshot(columnas, monton, generado):
+    """Contenido binario del snapshot y su huella"""
+    posicion = CABECERA.size + ENTRADA_DIRECTORIO.size * len(columnas)
+    partes, directorio = [], []
+
+    def reservar(datos):
+        nonlocal posicion
+        relleno = -posicion % ALINEACION
+        partes.append(b'\0' * relleno + datos)
+        posicion += relleno
+        inicio = posicion
+        posicion += len(datos)
+        return inicio
+
+    for tabla, columna, tipo, arreglo in columnas:
+        inicio = reservar(arreglo.tobytes())
+        directorio.append(ENTRADA_DIRECTORIO.pack(tabla.encode('ascii'), columna.encode('ascii'), tipo, len(arreglo), inicio))
+    inicio_cadenas = np.zeros(len(monton.cadenas) + 1, dtype='<u8')
+    np.cumsum([len(c) for c in monton.cadenas], out=inicio_cadenas[1:])
+    posicion_inicio = reservar(inicio_cadenas.tobytes())
+    datos_cadenas = b''.join(monton.cadenas)
+    posicion_datos = reservar(datos_cadenas)
+
+    cuerpo = b''.join(directorio) + b''.join(partes)
+    huella = hashlib.sha256(cuerpo).digest()[:16]
+    cabecera = CABECERA.pack(MAGIA, FORMATO, len(columnas), len(monton.cadenas), generado, huella,
+                             posicion_inicio, posicion_datos, len(datos_cadenas))
+    return cabecera + cuerpo, huella
+
+
+def leer_cabecera(archivo):
+    with open(archivo, 'rb') as f:
+        datos = f.read(CABECERA.size)
+    if len(datos) < CABECERA.size:
+        return None
+    cabecera = CABECERA.unpack(datos)
+    return cabecera if cabecera[0] == MAGIA and cabecera[1] == FORMATO else None
+
+
+def exportar_snapshot(conn, archivo=ARCHIVO_SNAPSHOT):
+    """Exportar el catálogo; devuelve (escrito, huella hex, bytes). No reescribe si no cambió."""
+    from generar_reportes import escribir_atomico
+
+    columnas, monton = leer_tablas(conn)
+    contenido, huella = armar_snapshot(columnas, monton, int(time.time()))
+    anterior = leer_cabecera(archivo) if os.path.exists(archivo) else None
+    if anterior is not None and anterior[5] == huella:
+        return False, huella.hex(), os.path.getsize(archivo)
+    os.makedirs(os.path.dirname(os.path.abspath(archivo)), exist_ok=True)
+    escribir_atomico(archivo, contenido)
+    return True, huella.hex(), len(contenido)
+
+
+class SnapshotCatalogo:
+    """Lector del snapshot: arreglos numpy sobre el mmap, sin copiar ni parsear"""
+
+    def __init__(self, archivo=ARCHIVO_SNAPSHOT):
+        self.archivo = archivo
+        with open(archivo, 'rb') as f:
+            self.mapa = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        cabecera = CABECERA.unpack_from(self.mapa)
+        if cabecera[0] != MAGIA or cabecera[1] != FORMATO:
+            self.mapa.close()
+            raise ValueError(f"{archivo} no es un snapshot del catálogo (formato {FORMATO})")
+        _, _, n_columnas, n_cadenas, generado, self.huella, inicio, datos, bytes_cadenas = cabecera
+        self.generado = datetime.fromtimestamp(generado)
+        self.directorio = {}
+        for i in range(n_columnas):
+            tabla, columna, tipo, cantidad, posicion = ENTRADA_DIRECTORIO.unpack_from(
+                self.mapa, CABECERA.size + i * ENTRADA_DIRECTORIO.size)
+            self.directorio[(tabla.rstrip(b'\0').decode('ascii'), columna.rstrip(b'\0').decode('ascii'))] = (tipo, cantidad, posicion)
+        self.inicio_cadenas = np.frombuffer(self.mapa, dtype='<u8', count=n_cadenas + 1, offset=inicio)
+        self.posicion_cadenas = datos
+        self.vistas = {}
+
+    @property
+    def version(self):
+        return self.huella.hex()
+
+    def vigente(self):
+        """False si el archivo en disco ya es otra versión (conviene reabrir)"""
+        cabecera = leer_cabecera(self.archivo) if os.path.exists(self.archivo) else None
+        return cabecera is not None and cabecera[5] == self.huella
+
+    def tablas(self):
+        """{tabla: filas}"""
+        tablas = {}
+        for (tabla, _), (_, cantidad, _) in self.directorio.items():
+            tablas.setdefault(tabla, cantidad)
+        return tablas
+
+    def columnas(self, tabla):
+        return [c for (t, c) in self.directorio if t == tabla and not c.startswith('@')]
+
+    def columna(self, tabla, nombre):
+        vista = self.vistas.get((tabla, nombre))
+        if vista is None:
+            tipo, cantidad, posicion = self.directorio[(tabla, nombre)]
+            vista = self.vistas[(tabla, nombre)] = np.frombuffer(self.mapa, dtype=TIPOS[tipo], count=cantidad, offset=posicion)
+        return vista
+
+    def cadena(self, numero):
+        if numero == 0:
+            return None
+        inicio = self.posicion_cadenas + int(self.inicio_cadenas[numero])
+        fin = self.posicion_cadenas + int(self.inicio_cadenas[numero + 1])
+        return self.mapa[inicio:fin].decode('utf-8')
+
+    def valor(self, tabla, columna, fila):
+        tipo = self.directorio[(tabla, columna)][0]
+        crudo = self.columna(tabla, columna)[fila]
+        if tipo == b's':
+            return self.cadena(int(crudo))
+        if tipo == b'i':
+            return None if crudo == NULO_ENTERO else int(crudo)
+        if tipo == b'b':
+            return None if crudo == NULO_BIT else bool(crudo)
+        if tipo == b'd':
+            return None if np.isnat(crudo) else crudo.astype(datetime)
+        return int(crudo)
+
+    def fila(self, tabla, fila):
+        return {c: self.valor(tabla, c, fila) for c in self.columnas(tabla)}
+
+    def buscar(self, tabla, id_buscado):
+        """Fila con ese ID (primera columna, o EjemplarID), o None"""
+        if tabla == 'Ejemplares':
+            # Búsqueda binaria directa sobre la vista del mmap (sin copiar los IDs)
+            ids = self.columna(tabla, '@EjemplarIDOrdenado')
+            posicion = int(np.searchsorted(ids, id_buscado))
+            if posicion < len(ids) and ids[posicion] == id_buscado:
+                return int(self.columna(tabla, '@EjemplarID')[posicion])
+            return None
+        ids = self.columna(tabla, self.columnas(tabla)[0])
+        posicion = int(np.searchsorted(ids, id_buscado))
+        return posicion if posicion < len(ids) and ids[posicion] == id_buscado else None
+
+    def filas_de_libro(self, tabla, fila_libro):
+        """range de filas de una tabla hija que pertenecen al libro"""
+        inicio = self.columna('Libros', f'@{tabla}')
+        return range(int(inicio[fila_libro]), int(inicio[fila_libro + 1]))
+
+    def libro(self, libro_id):
+        """Libro con sus autores, categorías y ejemplares, o None"""
+        fila = self.buscar('Libros', libro_id)
+        if fila is None:
+            return None
+        libro = self.fila('Libros', fila)
+        libro['autores'] = []
+        for i in self.filas_de_libro('LibroAutores', fila):
+            autor = self.buscar('Autores', self.valor('LibroAutores', 'AutorID', i))
+            if autor is not None:
+                libro['autores'].append(self.valor('Autores', 'Nombre', autor))
+        libro['categorias'] = []
+        for i in self.filas_de_libro('LibroCategorias', fila):
+            categoria = self.buscar('Categorias', self.valor('LibroCategorias', 'CategoriaID', i))
+            if categoria is not None:
+                libro['categorias'].append(self.valor('Categorias', 'Nombre', categoria))
+        libro['ejemplares'] = [self.fila('Ejemplares', i) for i in self.filas_de_libro('Ejemplares', fila)]
+        return libro
+
+    def cerrar(self):
+        # Las vistas de numpy apuntan al mmap: se sueltan antes de cerrarlo
+        self.vistas.clear()
+        self.inicio_cadenas = None
+        self.mapa.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.cerrar()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Exportar o consultar el snapshot binario del catálogo')
+    parser.add_argument('--archivo', default=ARCHIVO_SNAPSHOT, help='Archivo del snapshot')
+    parser.add_argument('--info', action='store_true', help='Mostrar tablas, filas y versión')
+    parser.add_argument('--libro', type=int, default=None, help='Mostrar un libro leído del snapshot')
+    args = parser.parse_args()
+
+    if args.info or args.libro is not None:
+        if not os.path.exists(args.archivo):
+            print(f"[ERROR] No existe {args.archivo}; expórtalo con: python snapshot_catalogo.py")
+            sys.exit(1)
+        inicio = time.perf_counter()
+        with SnapshotCatalogo(args.archivo) as catalogo:
+            print(f"[INFO] Snapshot {catalogo.version} del {catalogo.generado:%d/%m/%Y %H:%M} "
+                  f"abierto en {(time.perf_counter() - inicio) * 1000:.3f} ms")
+            if args.info:
+                for tabla, filas in catalogo.tablas().items():
+                    print(f"  {tabla:<16} {filas:>8,} filas")
+            if args.libro is not None:
+                libro = catalogo.libro(args.libro)
+                if libro is None:
+                    print(f"[WARN] El libro {args.libro} no está en el snapshot")
+                else:
+                    for clave, valor in libro.items():
+                        print(f"  {clave}: {valor}")
+        return
+
+    print("="*60)
+    print("SNAPSHOT DEL CATÁLOGO")
+    print("="*60)
+    from generar_reportes import conectar_bd
+
+    conn = conectar_bd()
+    try:
+        inicio = time.perf_counter()
+        escrito, version, tamano = exportar_snapshot(conn, args.archivo)
+    except pyodbc.Error as e:
+        print(f"[ERROR] Error de base de datos: {e}")
+        sys.exit(1)
+    finally:
+        conn.close()
+
+    if escrito:
+        print(f"[GUARDADO] {args.archivo} (versión {version}, {tamano:,} bytes, {time.perf_counter() - inicio:.2f} s)")
+    else:
+        print(f"[INFO] El catálogo no cambió; el snapshot {version} sigue vigente")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Prueba de integración del motor de multas contra SQL Server
+- Un préstamo vencido que pasa por el motor sigue en Estado = 'Prestado' y
+  el backend lo puede renovar y devolver (mismos UPDATE que PrestamoRepository)
+- Todo corre en una transacción que se revierte al final; si no hay
+  pyodbc o no se puede conectar a BibliotecaFISI, la prueba se omite
+
+Uso:
+    python -m unittest test_motor_multas -v
+"""
+
+import unittest
+from decimal import Decimal
+
+try:
+    import pyodbc
+    from generar_reportes import conectar_bd
+    from motor_multas import PREFIJO_MOTIVO, ejecutar_motor
+except ImportError:
+    pyodbc = None
+
+POLITICA = {'monto_por_dia': Decimal('2.00'), 'multa_maxima': Decimal('50.00'), 'dias_gracia': 1}
+
+# PrestamoRepository.RenovarPrestamo
+RENOVAR_BACKEND = """
+    UPDATE Prestamos
+    SET FechaVencimiento = DATEADD(day, ?, FechaVencimiento),
+        Renovaciones = Renovaciones + 1
+    WHERE PrestamoID = ? AND Estado = 'Prestado'
+"""
+
+# PrestamoRepository.ProcesarDevolucion (consulta previa + UPDATE)
+BUSCAR_PARA_DEVOLVER = """
+    SELECT r.EjemplarID
+    FROM Prestamos p
+    INNER JOIN Reservas r ON p.ReservaID = r.ReservaID
+    WHERE p.PrestamoID = ? AND p.Estado = 'Prestado'
+"""
+DEVOLVER_BACKEND = """
+    UPDATE Prestamos
+    SET Estado = 'Devuelto', FechaDevolucion = GETDATE(), Observaciones = NULL
+    WHERE PrestamoID = ?
+"""
+
+
+class TransaccionExterna:
+    """Conexión cuyo commit/rollback no cierra la transacción de la prueba"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def cursor(self):
+        return self.conn.cursor()
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+
+@unittest.skipIf(pyodbc is None, "pyodbc no está instalado")
+class PruebaMotorMultas(unittest.TestCase):
+
+    def setUp(self):
+        try:
+            self.conn = conectar_bd()
+        except SystemExit:
+            self.skipTest("No se pudo conectar a SQL Server")
+        self.conn.autocommit = False
+        self.cursor = self.conn.cursor()
+        self.cursor.execute("""
+            SELECT TOP 1 p.PrestamoID FROM Prestamos p
+            INNER JOIN Reservas r ON p.ReservaID = r.ReservaID
+            ORDER BY p.PrestamoID DESC
+        """)
+        row = self.cursor.fetchone()
+        if row is None:
+            self.conn.close()
+            self.skipTest("No hay préstamos en la base de datos")
+        self.prestamo_id = row[0]
+
+    def tearDown(self):
+        self.conn.rollback()
+        self.conn.close()
+
+    def dejar_vencido(self, estado):
+        self.cursor.execute("""
+            UPDATE Prestamos
+            SET Estado = ?, FechaDevolucion = NULL, FechaVencimiento = DATEADD(day, -10, GETDATE())
+            WHERE PrestamoID = ?
+        """, estado, self.prestamo_id)
+
+    def estado(self):
+        self.cursor.execute("SELECT Estado FROM Prestamos WHERE PrestamoID = ?", self.prestamo_id)
+        return self.cursor.fetchone()[0]
+
+    def comprobar_renovable_y_devolvible(self):
+        self.cursor.execute(RENOVAR_BACKEND, 7, self.prestamo_id)
+        self.assertEqual(self.cursor.rowcount, 1)
+        self.cursor.execute(BUSCAR_PARA_DEVOLVER, self.prestamo_id)
+        self.assertIsNotNone(self.cursor.fetchone())
+        self.cursor.execute(DEVOLVER_BACKEND, self.prestamo_id)
+        self.assertEqual(self.cursor.rowcount, 1)
+
+    def test_prestamo_vencido_sigue_prestado(self):
+        self.dejar_vencido('Prestado')
+        resultado = ejecutar_motor(TransaccionExterna(self.conn), POLITICA)
+
+        self.assertGreaterEqual(resultado['prestamos_atrasados'], 1)
+        self.assertEqual(self.estado(), 'Prestado')
+        self.cursor.execute(f"""
+            SELECT COUNT(*) FROM Multas
+            WHERE PrestamoID = ? AND Motivo LIKE N'{PREFIJO_MOTIVO}%'
+        """, self.prestamo_id)
+        self.assertEqual(self.cursor.fetchone()[0], 1)
+        self.comprobar_renovable_y_devolvible()
+
+    def test_restaura_marcados_como_atrasados(self):
+        # Préstamo que una versión anterior del motor dejó en 'Atrasado'
+        self.dejar_vencido('Atrasado')
+        resultado = ejecutar_motor(TransaccionExterna(self.conn), POLITICA)
+
+        self.assertGreaterEqual(resultado['prestamos_restaurados'], 1)
+        self.assertEqual(self.estado(), 'Prestado')
+        self.comprobar_renovable_y_devolvible()
+
+    def test_segunda_ejecucion_no_cambia_nada(self):
+        self.dejar_vencido('Prestado')
+        ejecutar_motor(TransaccionExterna(self.conn), POLITICA)
+        resultado = ejecutar_motor(TransaccionExterna(self.conn), POLITICA)
+
+        self.assertEqual(resultado['prestamos_restaurados'], 0)
+        self.assertEqual(resultado['multas_creadas'], 0)
+        self.assertEqual(resultado['multas_actualizadas'], 0)
+        self.assertEqual(self.estado(), 'Prestado')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,28 @@
+-- ============================================
+-- Alcance de las API Keys
+-- - ApiKeys.Alcance: 'Publica' (API pública, valor por defecto de las claves
+--   existentes) o 'Reportes' (servicio_reportes.py, equivale al rol
+--   Administrador que exige ReportesController)
+-- - Una clave de la API pública no da acceso a los reportes
+-- ============================================
+USE BibliotecaFISI;
+GO
+
+IF NOT EXISTS (SELECT * FROM sys.columns WHERE object_id = OBJECT_ID(N'[dbo].[ApiKeys]') AND name = 'Alcance')
+BEGIN
+    ALTER TABLE [dbo].[ApiKeys] ADD [Alcance] NVARCHAR(20) NOT NULL
+        CONSTRAINT [DF_ApiKeys_Alcance] DEFAULT 'Publica'
+        CONSTRAINT [CK_ApiKeys_Alcance] CHECK ([Alcance] IN ('Publica', 'Reportes'));
+    PRINT 'Columna Alcance agregada a la tabla ApiKeys.';
+END
+ELSE
+BEGIN
+    PRINT 'La columna Alcance ya existe en la tabla ApiKeys.';
+END
+GO
+
+-- Para habilitar una clave en el servicio de reportes (solo administradores):
+-- UPDATE ApiKeys SET Alcance = 'Reportes' WHERE ApiKey = '<clave>';
+
+PRINT 'Script completado exitosamente.';
+GO
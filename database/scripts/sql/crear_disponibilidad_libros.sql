@@ -0,0 +1,79 @@
+-- ============================================
+-- Disponibilidad precalculada por libro
+-- - Ejemplares.VersionFila (rowversion): marca cada alta o cambio de estado
+-- - DisponibilidadLibros: totales por libro que mantiene
+--   scripts/python/disponibilidad_libros.py, en lugar de agrupar todos los
+--   Ejemplares en cada lectura de VistaDisponibilidadLibros
+-- - MarcasAgua: última VersionFila procesada por cada proceso de mantenimiento,
+--   con el último EjemplarID visto y la huella de los ejemplares hasta ese ID
+--   (detecta borrados y cambios de libro, que rowversion no registra)
+-- ============================================
+USE BibliotecaFISI;
+GO
+
+IF NOT EXISTS (SELECT * FROM sys.columns WHERE object_id = OBJECT_ID(N'[dbo].[Ejemplares]') AND name = 'VersionFila')
+BEGIN
+    ALTER TABLE [dbo].[Ejemplares] ADD [VersionFila] ROWVERSION;
+    PRINT 'Columna VersionFila agregada a la tabla Ejemplares.';
+END
+ELSE
+BEGIN
+    PRINT 'La columna VersionFila ya existe en la tabla Ejemplares.';
+END
+GO
+
+-- Búsqueda de los ejemplares cambiados desde la marca de agua
+IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'IX_Ejemplares_VersionFila' AND object_id = OBJECT_ID(N'[dbo].[Ejemplares]'))
+BEGIN
+    CREATE INDEX IX_Ejemplares_VersionFila ON [dbo].[Ejemplares]([VersionFila]) INCLUDE ([LibroID]);
+    PRINT 'Índice IX_Ejemplares_VersionFila creado correctamente.';
+END
+GO
+
+IF NOT EXISTS (SELECT * FROM sys.tables WHERE name = 'DisponibilidadLibros')
+BEGIN
+    CREATE TABLE [dbo].[DisponibilidadLibros] (
+        [LibroID] INT NOT NULL PRIMARY KEY,
+        [TotalEjemplares] INT NOT NULL,
+        [EjemplaresDisponibles] INT NOT NULL,
+        [FechaActualizacion] DATETIME NOT NULL DEFAULT GETDATE(),
+        FOREIGN KEY ([LibroID]) REFERENCES [dbo].[Libros]([LibroID]) ON DELETE CASCADE
+    );
+
+    PRINT 'Tabla DisponibilidadLibros creada correctamente.';
+END
+ELSE
+BEGIN
+    PRINT 'La tabla DisponibilidadLibros ya existe.';
+END
+GO
+
+IF NOT EXISTS (SELECT * FROM sys.tables WHERE name = 'MarcasAgua')
+BEGIN
+    CREATE TABLE [dbo].[MarcasAgua] (
+        [Proceso] VARCHAR(50) NOT NULL PRIMARY KEY,
+        [Version] BINARY(8) NULL,
+        [Filas] INT NULL,
+        [UltimoID] INT NULL,
+        [Huella] INT NULL,
+        [FechaActualizacion] DATETIME NOT NULL DEFAULT GETDATE()
+    );
+
+    PRINT 'Tabla MarcasAgua creada correctamente.';
+END
+ELSE
+BEGIN
+    PRINT 'La tabla MarcasAgua ya existe.';
+END
+GO
+
+IF NOT EXISTS (SELECT * FROM sys.columns WHERE object_id = OBJECT_ID(N'[dbo].[MarcasAgua]') AND name = 'Huella')
+BEGIN
+    ALTER TABLE [dbo].[MarcasAgua] ADD [UltimoID] INT NULL, [Huella] INT NULL;
+    PRINT 'Columnas UltimoID y Huella agregadas a la tabla MarcasAgua.';
+END
+ELSE
+BEGIN
+    PRINT 'Las columnas UltimoID y Huella ya existen en la tabla MarcasAgua.';
+END
+GO
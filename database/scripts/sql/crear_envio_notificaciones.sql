@@ -0,0 +1,46 @@
+-- ============================================
+-- Columnas de envío para Notificaciones
+-- (scripts/python/despachador_notificaciones.py)
+-- Estado sigue siendo el de lectura en la aplicación (Pendiente/Leida);
+-- EstadoEnvio lleva la entrega por correo:
+--   Pendiente -> Enviando (reclamada por un worker) -> Enviada / Fallida
+-- ProximoIntento: fin del plazo de un worker en 'Enviando' o espera antes de
+-- reintentar una 'Pendiente' que falló
+-- ============================================
+USE BibliotecaFISI;
+GO
+
+IF NOT EXISTS (SELECT * FROM sys.columns WHERE name = 'EstadoEnvio' AND object_id = OBJECT_ID(N'[dbo].[Notificaciones]'))
+BEGIN
+    ALTER TABLE [dbo].[Notificaciones] ADD
+        [EstadoEnvio] [nvarchar](20) NOT NULL CONSTRAINT [DF_Notificaciones_EstadoEnvio] DEFAULT ('Pendiente'),
+        [IntentosEnvio] [int] NOT NULL CONSTRAINT [DF_Notificaciones_IntentosEnvio] DEFAULT (0),
+        [ProximoIntento] [datetime2](7) NULL,
+        [FechaEnvio] [datetime2](7) NULL,
+        [ErrorEnvio] [nvarchar](200) NULL;
+
+    -- Las notificaciones anteriores ya se vieron en la aplicación: no se envían por correo
+    EXEC(N'UPDATE [dbo].[Notificaciones] SET [EstadoEnvio] = ''Omitida''');
+
+    PRINT 'Columnas de envío de Notificaciones creadas correctamente.';
+END
+ELSE
+BEGIN
+    PRINT 'Las columnas de envío de Notificaciones ya existen.';
+END
+GO
+
+-- Solo contiene la cola de envío, no el historial de enviadas
+IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'IX_Notificaciones_ColaEnvio' AND object_id = OBJECT_ID(N'[dbo].[Notificaciones]'))
+BEGIN
+    CREATE NONCLUSTERED INDEX [IX_Notificaciones_ColaEnvio] ON [dbo].[Notificaciones]([NotificacionID])
+    INCLUDE ([EstadoEnvio], [ProximoIntento])
+    WHERE [EstadoEnvio] IN ('Pendiente', 'Enviando');
+
+    PRINT 'Índice IX_Notificaciones_ColaEnvio creado correctamente.';
+END
+ELSE
+BEGIN
+    PRINT 'El índice IX_Notificaciones_ColaEnvio ya existe.';
+END
+GO
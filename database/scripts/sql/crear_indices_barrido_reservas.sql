@@ -0,0 +1,53 @@
+-- ============================================
+-- Índices para el barrido de reservas vencidas
+-- (scripts/python/barrido_reservas.py)
+-- Índices filtrados: solo contienen las reservas que todavía pueden vencer,
+-- así la búsqueda de vencidas no recorre el historial de reservas cerradas
+-- ============================================
+USE BibliotecaFISI;
+GO
+
+-- Reservas con ejemplar asignado esperando el retiro (FechaLimiteRetiro)
+IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'IX_Reservas_FechaLimiteRetiro_Pendientes' AND object_id = OBJECT_ID(N'[dbo].[Reservas]'))
+BEGIN
+    CREATE NONCLUSTERED INDEX [IX_Reservas_FechaLimiteRetiro_Pendientes] ON [dbo].[Reservas]([FechaLimiteRetiro])
+    INCLUDE ([LibroID], [UsuarioID], [EjemplarID], [Estado], [TipoReserva])
+    WHERE [Estado] IN ('PorAprobar', 'Aprobada', 'Notificada') AND [FechaLimiteRetiro] IS NOT NULL;
+
+    PRINT 'Índice IX_Reservas_FechaLimiteRetiro_Pendientes creado correctamente.';
+END
+ELSE
+BEGIN
+    PRINT 'El índice IX_Reservas_FechaLimiteRetiro_Pendientes ya existe.';
+END
+GO
+
+-- Reservas en cola de espera (FechaExpiracion)
+IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'IX_Reservas_FechaExpiracion_Cola' AND object_id = OBJECT_ID(N'[dbo].[Reservas]'))
+BEGIN
+    CREATE NONCLUSTERED INDEX [IX_Reservas_FechaExpiracion_Cola] ON [dbo].[Reservas]([FechaExpiracion])
+    INCLUDE ([LibroID], [UsuarioID], [EjemplarID], [TipoReserva])
+    WHERE [Estado] = 'ColaEspera' AND [FechaExpiracion] IS NOT NULL;
+
+    PRINT 'Índice IX_Reservas_FechaExpiracion_Cola creado correctamente.';
+END
+ELSE
+BEGIN
+    PRINT 'El índice IX_Reservas_FechaExpiracion_Cola ya existe.';
+END
+GO
+
+-- Orden de la cola de cada libro (PrioridadCola, FechaReserva)
+IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'IX_Reservas_Cola_Libro' AND object_id = OBJECT_ID(N'[dbo].[Reservas]'))
+BEGIN
+    CREATE NONCLUSTERED INDEX [IX_Reservas_Cola_Libro] ON [dbo].[Reservas]([LibroID], [PrioridadCola], [FechaReserva])
+    INCLUDE ([UsuarioID])
+    WHERE [Estado] = 'ColaEspera' AND [TipoReserva] = 'ColaEspera';
+
+    PRINT 'Índice IX_Reservas_Cola_Libro creado correctamente.';
+END
+ELSE
+BEGIN
+    PRINT 'El índice IX_Reservas_Cola_Libro ya existe.';
+END
+GO
@@ -0,0 +1,35 @@
+-- ============================================
+-- Índices para el motor de atrasos y multas
+-- (scripts/python/motor_multas.py)
+-- Los préstamos atrasados se calculan (Estado = 'Prestado' AND
+-- FechaVencimiento < GETDATE()); el primer índice los resuelve con un seek
+-- en los reportes y en el motor
+-- ============================================
+USE BibliotecaFISI;
+GO
+
+IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'IX_Prestamos_Estado_FechaVencimiento' AND object_id = OBJECT_ID(N'[dbo].[Prestamos]'))
+BEGIN
+    CREATE NONCLUSTERED INDEX [IX_Prestamos_Estado_FechaVencimiento] ON [dbo].[Prestamos]([Estado], [FechaVencimiento])
+    INCLUDE ([ReservaID], [FechaPrestamo], [FechaDevolucion]);
+
+    PRINT 'Índice IX_Prestamos_Estado_FechaVencimiento creado correctamente.';
+END
+ELSE
+BEGIN
+    PRINT 'El índice IX_Prestamos_Estado_FechaVencimiento ya existe.';
+END
+GO
+
+IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'IX_Multas_PrestamoID' AND object_id = OBJECT_ID(N'[dbo].[Multas]'))
+BEGIN
+    CREATE NONCLUSTERED INDEX [IX_Multas_PrestamoID] ON [dbo].[Multas]([PrestamoID])
+    INCLUDE ([Estado], [Monto], [DiasAtraso], [Motivo]);
+
+    PRINT 'Índice IX_Multas_PrestamoID creado correctamente.';
+END
+ELSE
+BEGIN
+    PRINT 'El índice IX_Multas_PrestamoID ya existe.';
+END
+GO
@@ -0,0 +1,34 @@
+-- ============================================
+-- Jerarquía LCC precalculada por libro
+-- Clase (Q) > Subclase (QA) > Sección (QA75-76.95 Computación)
+-- La llena cargar_datos_completos.py (o jerarquia_lcc.py) a partir de
+-- LCCSeccion y LCCNumero; el reporte de circulación por materia agrupa
+-- sobre estas columnas sin volver a interpretar la signatura en SQL
+-- ============================================
+USE BibliotecaFISI;
+GO
+
+IF NOT EXISTS (SELECT * FROM sys.tables WHERE name = 'JerarquiaLCC')
+BEGIN
+    CREATE TABLE [dbo].[JerarquiaLCC] (
+        [LibroID] INT NOT NULL PRIMARY KEY,
+        [Clase] CHAR(1) NOT NULL,
+        [NombreClase] NVARCHAR(100) NOT NULL,
+        [Subclase] VARCHAR(10) NOT NULL,
+        [Seccion] NVARCHAR(100) NOT NULL,
+        [NumeroLCC] DECIMAL(10, 4) NULL,
+        [FechaActualizacion] DATETIME NOT NULL DEFAULT GETDATE(),
+        FOREIGN KEY ([LibroID]) REFERENCES [dbo].[Libros]([LibroID]) ON DELETE CASCADE
+    );
+
+    -- Índice para el GROUP BY ROLLUP (Clase, Subclase, Seccion)
+    CREATE INDEX IX_JerarquiaLCC_Clase_Subclase_Seccion
+        ON [dbo].[JerarquiaLCC]([Clase], [Subclase], [Seccion]) INCLUDE ([NombreClase]);
+
+    PRINT 'Tabla JerarquiaLCC creada correctamente.';
+END
+ELSE
+BEGIN
+    PRINT 'La tabla JerarquiaLCC ya existe.';
+END
+GO
@@ -0,0 +1,31 @@
+-- ============================================
+-- Tabla LibrosRelacionados: "quienes prestaron este libro también prestaron"
+-- La llena scripts/python/recomendaciones_prestamos.py con los K vecinos más
+-- similares de cada libro (co-préstamos entre usuarios)
+-- Recomendaciones sigue siendo solo para las recomendaciones de profesores
+-- ============================================
+USE BibliotecaFISI;
+GO
+
+IF NOT EXISTS (SELECT * FROM sys.tables WHERE name = 'LibrosRelacionados')
+BEGIN
+    CREATE TABLE [dbo].[LibrosRelacionados] (
+        [LibroID] [int] NOT NULL,
+        [Posicion] [tinyint] NOT NULL,
+        [LibroRelacionadoID] [int] NOT NULL,
+        [Similitud] [decimal](6, 5) NOT NULL,
+        [Coprestamos] [int] NOT NULL,
+        [FechaCalculo] [datetime] NOT NULL DEFAULT GETDATE(),
+        -- Los vecinos de un libro quedan contiguos y ya ordenados
+        CONSTRAINT [PK_LibrosRelacionados] PRIMARY KEY CLUSTERED ([LibroID], [Posicion]),
+        CONSTRAINT [FK_LibrosRelacionados_Libros] FOREIGN KEY ([LibroID])
+            REFERENCES [dbo].[Libros]([LibroID]) ON DELETE CASCADE
+    );
+
+    PRINT 'Tabla LibrosRelacionados creada correctamente.';
+END
+ELSE
+BEGIN
+    PRINT 'La tabla LibrosRelacionados ya existe.';
+END
+GO
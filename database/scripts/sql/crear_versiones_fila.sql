@@ -0,0 +1,103 @@
+-- ============================================
+-- Versión de fila (rowversion) en las tablas que consultan los reportes
+-- - Usuarios, Libros, Reservas, Prestamos y Multas reciben VersionFila, que
+--   SQL Server cambia en cada INSERT o UPDATE (devoluciones y renovaciones
+--   incluidas, aunque el backend no escriba FechaModificacion)
+-- - Con el índice sobre VersionFila, COUNT(*) y MAX(VersionFila) se resuelven
+--   sobre un índice angosto: es la sonda de versión de cache_reportes.py
+--   y la marca de agua de exportar_historial.py
+-- - Ejemplares.VersionFila se crea en crear_disponibilidad_libros.sql
+-- Agregar la columna reescribe cada fila: ejecutarlo fuera del horario de atención
+-- ============================================
+USE BibliotecaFISI;
+GO
+
+IF NOT EXISTS (SELECT * FROM sys.columns WHERE object_id = OBJECT_ID(N'[dbo].[Usuarios]') AND name = 'VersionFila')
+BEGIN
+    ALTER TABLE [dbo].[Usuarios] ADD [VersionFila] ROWVERSION;
+    PRINT 'Columna VersionFila agregada a la tabla Usuarios.';
+END
+ELSE
+BEGIN
+    PRINT 'La columna VersionFila ya existe en la tabla Usuarios.';
+END
+GO
+
+IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'IX_Usuarios_VersionFila' AND object_id = OBJECT_ID(N'[dbo].[Usuarios]'))
+BEGIN
+    CREATE INDEX IX_Usuarios_VersionFila ON [dbo].[Usuarios]([VersionFila]);
+    PRINT 'Índice IX_Usuarios_VersionFila creado correctamente.';
+END
+GO
+
+IF NOT EXISTS (SELECT * FROM sys.columns WHERE object_id = OBJECT_ID(N'[dbo].[Libros]') AND name = 'VersionFila')
+BEGIN
+    ALTER TABLE [dbo].[Libros] ADD [VersionFila] ROWVERSION;
+    PRINT 'Columna VersionFila agregada a la tabla Libros.';
+END
+ELSE
+BEGIN
+    PRINT 'La columna VersionFila ya existe en la tabla Libros.';
+END
+GO
+
+IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'IX_Libros_VersionFila' AND object_id = OBJECT_ID(N'[dbo].[Libros]'))
+BEGIN
+    CREATE INDEX IX_Libros_VersionFila ON [dbo].[Libros]([VersionFila]);
+    PRINT 'Índice IX_Libros_VersionFila creado correctamente.';
+END
+GO
+
+IF NOT EXISTS (SELECT * FROM sys.columns WHERE object_id = OBJECT_ID(N'[dbo].[Reservas]') AND name = 'VersionFila')
+BEGIN
+    ALTER TABLE [dbo].[Reservas] ADD [VersionFila] ROWVERSION;
+    PRINT 'Columna VersionFila agregada a la tabla Reservas.';
+END
+ELSE
+BEGIN
+    PRINT 'La columna VersionFila ya existe en la tabla Reservas.';
+END
+GO
+
+IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'IX_Reservas_VersionFila' AND object_id = OBJECT_ID(N'[dbo].[Reservas]'))
+BEGIN
+    CREATE INDEX IX_Reservas_VersionFila ON [dbo].[Reservas]([VersionFila]);
+    PRINT 'Índice IX_Reservas_VersionFila creado correctamente.';
+END
+GO
+
+IF NOT EXISTS (SELECT * FROM sys.columns WHERE object_id = OBJECT_ID(N'[dbo].[Prestamos]') AND name = 'VersionFila')
+BEGIN
+    ALTER TABLE [dbo].[Prestamos] ADD [VersionFila] ROWVERSION;
+    PRINT 'Columna VersionFila agregada a la tabla Prestamos.';
+END
+ELSE
+BEGIN
+    PRINT 'La columna VersionFila ya existe en la tabla Prestamos.';
+END
+GO
+
+IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'IX_Prestamos_VersionFila' AND object_id = OBJECT_ID(N'[dbo].[Prestamos]'))
+BEGIN
+    CREATE INDEX IX_Prestamos_VersionFila ON [dbo].[Prestamos]([VersionFila]);
+    PRINT 'Índice IX_Prestamos_VersionFila creado correctamente.';
+END
+GO
+
+IF NOT EXISTS (SELECT * FROM sys.columns WHERE object_id = OBJECT_ID(N'[dbo].[Multas]') AND name = 'VersionFila')
+BEGIN
+    ALTER TABLE [dbo].[Multas] ADD [VersionFila] ROWVERSION;
+    PRINT 'Columna VersionFila agregada a la tabla Multas.';
+END
+ELSE
+BEGIN
+    PRINT 'La columna VersionFila ya existe en la tabla Multas.';
+END
+GO
+
+IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'IX_Multas_VersionFila' AND object_id = OBJECT_ID(N'[dbo].[Multas]'))
+BEGIN
+    CREATE INDEX IX_Multas_VersionFila ON [dbo].[Multas]([VersionFila]);
+    PRINT 'Índice IX_Multas_VersionFila creado correctamente.';
+END
+GO
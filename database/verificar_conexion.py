@@ -2,159 +2,272 @@
 # -*- coding: utf-8 -*-
 """
 Script para verificar la conexión a SQL Server y detectar instancias disponibles
+- Prueba todos los candidatos a la vez (hilos) con un límite total de tiempo;
+  los servidores que lista `sqlcmd -L` se agregan a la prueba al aparecer
+- Mide por candidato: tiempo de conexión, ida y vuelta de SELECT 1 (mediana)
+  y una lectura pequeña (filas/s), y ordena los que responden del más rápido
+  al más lento
+
+Uso:
+    python verificar_conexion.py
+    python verificar_conexion.py --limite 5 --servidor "miservidor\\INSTANCIA"
 """
 
-import pyodbc
+import argparse
+import queue
+import statistics
 import subprocess
 import sys
+import threading
+import time
+
+import pyodbc
+
+BASE_DATOS = 'BibliotecaFISI'
+
+# Lista de posibles configuraciones de servidor
+SERVIDORES = [
+    ('localhost', 'Instancia por defecto'),
+    ('localhost\\SQLEXPRESS', 'SQL Server Express'),
+    ('localhost\\MSSQLSERVER', 'SQL Server (instancia nombrada)'),
+    ('.\\SQLEXPRESS', 'SQL Server Express (notación corta)'),
+    ('.', 'Instancia local (notación corta)'),
+]
+
+# Límite total de la verificación y de cada conexión (segundos)
+LIMITE_TOTAL = 8
+TIMEOUT_CONEXION = 3
+REPETICIONES_PING = 5
+FILAS_LECTURA = 2000
 
-def listar_servidores_sql():
-    """Listar servidores SQL disponibles usando sqlcmd"""
-    print("=== DETECTANDO SERVIDORES SQL SERVER ===\n")
-    
+# Lectura de prueba: el catálogo si la base existe, si no una vista de sistema
+LECTURA_CATALOGO = f"SELECT TOP ({FILAS_LECTURA}) LibroID, Titulo, SignaturaLCC FROM Libros"
+LECTURA_SISTEMA = f"SELECT TOP ({FILAS_LECTURA}) name, object_id, column_id FROM sys.all_columns"
+
+
+def conectar(servidor, base_datos='master'):
+    conn = pyodbc.connect(
+        'DRIVER={ODBC Driver 17 for SQL Server};'
+        f'SERVER={servidor};'
+        f'DATABASE={base_datos};'
+        'Trusted_Connection=yes;'
+        f'Connection Timeout={TIMEOUT_CONEXION};'
+    )
+    conn.timeout = TIMEOUT_CONEXION
+    return conn
+
+
+def medir_candidato(servidor, descripcion, repeticiones=REPETICIONES_PING):
+    """Conexión, SELECT 1 y lectura de prueba; devuelve un dict con los tiempos (ms) o el error"""
+    resultado = {'servidor': servidor, 'descripcion': descripcion, 'ok': False, 'base_datos': None}
+    inicio = time.perf_counter()
     try:
-        # Intentar usar sqlcmd para listar servidores
-        result = subprocess.run(
-            ['sqlcmd', '-L'],
-            capture_output=True,
-            text=True,
-            timeout=10
-        )
-        
-        if result.returncode == 0 and result.stdout:
-            print("Servidores SQL Server detectados:")
-            print(result.stdout)
-        else:
-            print("No se pudo detectar servidores con sqlcmd")
-            print("(Esto puede ser normal si sqlcmd no está en el PATH)")
-    except FileNotFoundError:
-        print("sqlcmd no encontrado. Instalando herramientas de SQL Server puede ayudar.")
-    except Exception as e:
-        print(f"Error al intentar listar servidores: {e}")
-    
-    print("\n" + "="*50 + "\n")
-
-def probar_conexion(servidor, base_datos='master'):
-    """Probar conexión a un servidor específico"""
+        conn = conectar(servidor)
+    except pyodbc.Error as e:
+        resultado['error'] = str(e)
+        resultado['conexion_ms'] = (time.perf_counter() - inicio) * 1000
+        return resultado
+    resultado['conexion_ms'] = (time.perf_counter() - inicio) * 1000
     try:
-        conn = pyodbc.connect(
-            'DRIVER={ODBC Driver 17 for SQL Server};'
-            f'SERVER={servidor};'
-            f'DATABASE={base_datos};'
-            'Trusted_Connection=yes;'
-            'Connection Timeout=3;'
-        )
         cursor = conn.cursor()
-        cursor.execute("SELECT @@VERSION")
-        version = cursor.fetchone()[0]
+        cursor.execute("SELECT @@SERVERNAME, @@VERSION")
+        resultado['instancia'], resultado['version'] = cursor.fetchone()
+        tiempos = []
+        for _ in range(repeticiones):
+            t = time.perf_counter()
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+            tiempos.append((time.perf_counter() - t) * 1000)
+        resultado['ping_ms'] = statistics.median(tiempos)
+        resultado['ok'] = True
+
+        cursor.execute("SELECT HAS_DBACCESS(?)", BASE_DATOS)
+        acceso = cursor.fetchone()[0]
+        resultado['base_datos'] = 'accesible' if acceso == 1 else ('sin permisos' if acceso == 0 else 'no existe')
+        consulta = LECTURA_SISTEMA
+        if acceso == 1:
+            cursor.execute(f"USE [{BASE_DATOS}]")
+            consulta = LECTURA_CATALOGO
+        t = time.perf_counter()
+        try:
+            cursor.execute(consulta)
+        except pyodbc.Error:
+            # Base creada pero sin el catálogo cargado
+            cursor.execute(f"USE master; {LECTURA_SISTEMA}")
+        filas = len(cursor.fetchall())
+        segundos = time.perf_counter() - t
+        resultado['lectura_ms'] = segundos * 1000
+        resultado['filas_por_segundo'] = filas / segundos if segundos > 0 else None
+    except pyodbc.Error as e:
+        resultado['error'] = str(e)
+    finally:
         conn.close()
-        return True, version
-    except Exception as e:
-        return False, str(e)
-
-def verificar_conexiones():
-    """Verificar conexiones a diferentes configuraciones de servidor"""
-    print("=== PROBANDO CONEXIONES ===\n")
-    
-    # Lista de posibles configuraciones de servidor
-    servidores = [
-        ('localhost', 'Instancia por defecto'),
-        ('localhost\\SQLEXPRESS', 'SQL Server Express'),
-        ('localhost\\MSSQLSERVER', 'SQL Server (instancia nombrada)'),
-        ('.\\SQLEXPRESS', 'SQL Server Express (notación corta)'),
-        ('.', 'Instancia local (notación corta)'),
-    ]
-    
-    conexiones_exitosas = []
-    
-    for servidor, descripcion in servidores:
-        print(f"Probando: {servidor} ({descripcion})...")
-        exito, resultado = probar_conexion(servidor)
-        
-        if exito:
-            print(f"  ✅ CONEXIÓN EXITOSA")
-            print(f"  Versión: {resultado[:80]}...")
-            conexiones_exitosas.append((servidor, descripcion))
-        else:
-            print(f"  ❌ FALLO: {resultado[:100]}")
-        print()
-    
-    # Probar con base de datos específica
-    if conexiones_exitosas:
-        print("\n=== PROBANDO BASE DE DATOS 'BibliotecaFISI' ===\n")
-        for servidor, descripcion in conexiones_exitosas:
-            print(f"Probando base de datos 'BibliotecaFISI' en {servidor}...")
-            exito, resultado = probar_conexion(servidor, 'BibliotecaFISI')
-            
-            if exito:
-                print(f"  ✅ Base de datos 'BibliotecaFISI' encontrada y accesible")
-            else:
-                if "cannot open database" in resultado.lower():
-                    print(f"  ⚠️  Base de datos 'BibliotecaFISI' no existe")
-                    print(f"     Necesitas ejecutar el script SQL para crearla primero")
-                else:
-                    print(f"  ❌ Error: {resultado[:100]}")
-            print()
-    
-    return conexiones_exitosas
-
-def verificar_servicios_windows():
-    """Verificar servicios de SQL Server en Windows"""
-    print("=== VERIFICANDO SERVICIOS DE SQL SERVER ===\n")
-    
+    return resultado
+
+
+def listar_servidores_sql(timeout=10):
+    """Nombres que devuelve `sqlcmd -L` (lista vacía si no está disponible)"""
+    try:
+        result = subprocess.run(['sqlcmd', '-L'], capture_output=True, text=True, timeout=timeout)
+    except (FileNotFoundError, subprocess.TimeoutExpired, OSError):
+        return []
+    if result.returncode != 0:
+        return []
+    return [linea.strip() for linea in result.stdout.splitlines()
+            if linea.strip() and not linea.strip().lower().startswith('servers')]
+
+
+def verificar_servicios_windows(timeout=10):
+    """Servicios de SQL Server en Windows (texto de PowerShell o None)"""
     try:
         result = subprocess.run(
             ['powershell', '-Command', "Get-Service -Name '*SQL*' | Format-Table -AutoSize"],
             capture_output=True,
             text=True,
-            timeout=10
+            timeout=timeout
         )
-        
-        if result.returncode == 0 and result.stdout:
-            print(result.stdout)
+    except (FileNotFoundError, subprocess.TimeoutExpired, OSError):
+        return None
+    return result.stdout if result.returncode == 0 and result.stdout else None
+
+
+def verificar_conexiones(servidores, limite=LIMITE_TOTAL, repeticiones=REPETICIONES_PING):
+    """
+    Probar todos los candidatos en paralelo sin pasar de `limite` segundos.
+    Devuelve (resultados ordenados del más rápido al más lento, servicios, nombres de sqlcmd)
+    """
+    fin = time.perf_counter() + limite
+    respuestas = queue.Queue()
+
+    def lanzar(tipo, funcion, *argumentos):
+        # Hilos daemon: una conexión colgada no retiene el script al terminar
+        def ejecutar():
+            respuestas.put((tipo, argumentos, funcion(*argumentos)))
+        threading.Thread(target=ejecutar, daemon=True).start()
+
+    pendientes = {}
+    for servidor, descripcion in servidores:
+        pendientes[servidor.lower()] = (servidor, descripcion)
+        lanzar('prueba', medir_candidato, servidor, descripcion, repeticiones)
+    lanzar('sqlcmd', listar_servidores_sql, limite)
+    lanzar('servicios', verificar_servicios_windows, limite)
+    conocidos = set(pendientes)
+
+    resultados, servicios, listados = [], None, []
+    faltan = len(pendientes) + 2
+    while faltan:
+        restante = fin - time.perf_counter()
+        if restante <= 0:
+            break
+        try:
+            tipo, argumentos, valor = respuestas.get(timeout=restante)
+        except queue.Empty:
+            break
+        faltan -= 1
+        if tipo == 'prueba':
+            pendientes.pop(argumentos[0].lower(), None)
+            resultados.append(valor)
+        elif tipo == 'servicios':
+            servicios = valor
         else:
-            print("No se encontraron servicios de SQL Server")
-    except Exception as e:
-        print(f"Error al verificar servicios: {e}")
-    
-    print("\n" + "="*50 + "\n")
+            listados = valor
+            for nombre in listados:
+                if nombre.lower() not in conocidos:
+                    conocidos.add(nombre.lower())
+                    pendientes[nombre.lower()] = (nombre, 'Detectado con sqlcmd -L')
+                    lanzar('prueba', medir_candidato, nombre, 'Detectado con sqlcmd -L', repeticiones)
+                    faltan += 1
+
+    for servidor, descripcion in pendientes.values():
+        resultados.append({'servidor': servidor, 'descripcion': descripcion, 'ok': False, 'base_datos': None,
+                           'error': f'Sin respuesta antes del límite de {limite:g} s'})
+
+    resultados.sort(key=lambda r: (not r['ok'], r['base_datos'] != 'accesible',
+                                   r.get('ping_ms', 0) + r.get('conexion_ms', 0)))
+    return resultados, servicios, listados
+
+
+def formato_ms(valor):
+    return f"{valor:8.1f}" if valor is not None else f"{'-':>8}"
+
 
 def main():
     """Función principal"""
+    parser = argparse.ArgumentParser(description='Verificar la conexión a SQL Server')
+    parser.add_argument('--limite', type=float, default=LIMITE_TOTAL,
+                        help=f'Segundos máximos para toda la verificación (por defecto {LIMITE_TOTAL})')
+    parser.add_argument('--servidor', action='append', default=[], help='Servidor adicional a probar (repetible)')
+    parser.add_argument('--repeticiones', type=int, default=REPETICIONES_PING, help='Repeticiones de SELECT 1')
+    args = parser.parse_args()
+
     print("="*50)
     print("VERIFICACIÓN DE CONEXIÓN A SQL SERVER")
     print("="*50 + "\n")
-    
-    # Verificar servicios
-    verificar_servicios_windows()
-    
-    # Listar servidores (si es posible)
-    listar_servidores_sql()
-    
-    # Probar conexiones
-    conexiones_exitosas = verificar_conexiones()
-    
+
+    servidores = SERVIDORES + [(s, 'Indicado con --servidor') for s in args.servidor]
+    print(f"Probando {len(servidores)} candidato(s) en paralelo (límite {args.limite:g} s)...\n")
+    inicio = time.perf_counter()
+    resultados, servicios, listados = verificar_conexiones(servidores, args.limite, args.repeticiones)
+    transcurrido = time.perf_counter() - inicio
+
+    print("=== SERVICIOS DE SQL SERVER ===\n")
+    print(servicios if servicios else "No se encontraron servicios de SQL Server (o PowerShell no está disponible)")
+    print("\n=== SERVIDORES DETECTADOS CON sqlcmd -L ===\n")
+    if listados:
+        for nombre in listados:
+            print(f"   - {nombre}")
+    else:
+        print("No se pudo detectar servidores con sqlcmd")
+        print("(Esto puede ser normal si sqlcmd no está en el PATH)")
+
+    print("\n=== CANDIDATOS (del más rápido al más lento) ===\n")
+    print(f"{'#':>2}  {'Servidor':<26} {'Instancia':<22} {'Conexión':>8} {'SELECT 1':>8} {'Lectura':>8} "
+          f"{'Filas/s':>10}  {BASE_DATOS}")
+    for posicion, r in enumerate(resultados, 1):
+        if r['ok']:
+            filas = f"{r['filas_por_segundo']:10,.0f}" if r.get('filas_por_segundo') else f"{'-':>10}"
+            print(f"{posicion:>2}  {r['servidor']:<26} {str(r.get('instancia') or '-')[:22]:<22} "
+                  f"{formato_ms(r['conexion_ms'])} {formato_ms(r.get('ping_ms'))} {formato_ms(r.get('lectura_ms'))} "
+                  f"{filas}  {r['base_datos']}")
+        else:
+            print(f"{posicion:>2}  {r['servidor']:<26} ❌ {r.get('error', '')[:90]}")
+    print("\n(tiempos en ms; SELECT 1 es la mediana de las repeticiones)")
+
     # Resumen
+    exitosas = [r for r in resultados if r['ok']]
     print("\n" + "="*50)
     print("RESUMEN")
     print("="*50)
-    
-    if conexiones_exitosas:
-        print(f"\n✅ Se encontraron {len(conexiones_exitosas)} conexión(es) exitosa(s):")
-        for servidor, descripcion in conexiones_exitosas:
-            print(f"   - {servidor} ({descripcion})")
-        print("\n💡 Puedes usar cualquiera de estos servidores en los scripts de carga de datos.")
+    print(f"\nVerificación completada en {transcurrido:.1f} s")
+
+    if exitosas:
+        print(f"\n✅ Se encontraron {len(exitosas)} conexión(es) exitosa(s):")
+        for r in exitosas:
+            print(f"   - {r['servidor']} ({r['descripcion']})")
+        mejor = exitosas[0]
+        if mejor['base_datos'] == 'accesible':
+            print(f"\n💡 Más rápido con '{BASE_DATOS}' accesible: {mejor['servidor']}")
+            print("   Puedes usarlo en los scripts de carga de datos.")
+        else:
+            print(f"\n⚠️  Base de datos '{BASE_DATOS}' no accesible en ningún servidor ({mejor['base_datos']})")
+            print("     Necesitas ejecutar el script SQL para crearla primero")
+        instancias = {}
+        for r in exitosas:
+            instancias.setdefault(r.get('instancia'), []).append(r['servidor'])
+        for instancia, nombres in instancias.items():
+            if len(nombres) > 1:
+                print(f"   ({', '.join(nombres)} son la misma instancia: {instancia})")
     else:
         print("\n❌ No se pudo establecer ninguna conexión exitosa.")
         print("\nPasos recomendados:")
         print("1. Verifica que SQL Server esté instalado")
         print("2. Verifica que el servicio de SQL Server esté ejecutándose")
         print("3. Verifica que tengas permisos de autenticación de Windows")
-        print("4. Si usas una instancia con nombre personalizado, agrega 'localhost\\NOMBRE_INSTANCIA' a la lista de servidores")
-    
+        print("4. Si usas una instancia con nombre personalizado, pruébala con --servidor 'localhost\\NOMBRE_INSTANCIA'")
+
     print("\n" + "="*50)
+    sys.exit(0 if exitosas else 1)
+
 
 if __name__ == "__main__":
     main()
-
-